@@ -0,0 +1,5 @@
+"""Offline micro-benchmarks for the support library.
+
+Each ``bench_*`` module can be run on its own, e.g.
+``python -m benchmarks.bench_serialize``, and prints one JSON document per case.
+"""
@@ -0,0 +1,29 @@
+"""Runs benchmark suites, all of them by default.
+
+    python -m benchmarks [suite ...] > results.jsonl
+
+Every result is one JSON line on stdout, tagged with its suite and the Python
+version, so results from different runs can be collected and compared.
+"""
+import importlib
+import sys
+from typing import List
+
+SUITES = (
+    "entrypoints",
+    "parse_request",
+    "serialize",
+    "client_pool",
+    "priming",
+)
+
+
+def main(argv: List[str]) -> None:
+    for suite in argv or SUITES:
+        if suite not in SUITES:
+            sys.exit(f"Unknown suite {suite!r}, expected one of {', '.join(SUITES)}")
+        importlib.import_module(f".bench_{suite}", __package__).main()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,61 @@
+"""Warm-invocation client acquisition: fresh sessions, shared loader, client pool."""
+from boto3.session import Session  # type: ignore
+from cloudformation_cli_python_lib.boto3_proxy import (
+    _get_boto_session,
+    loader_cache_stats,
+)
+from cloudformation_cli_python_lib.utils import Credentials
+
+import itertools
+
+from .harness import measure, report
+
+REGION = "us-east-1"
+SERVICES = ("logs", "cloudwatch", "s3")
+_COUNTER = itertools.count()
+
+
+def fresh_credentials() -> Credentials:
+    # CloudFormation sends new temporary credentials on (almost) every invocation
+    n = next(_COUNTER)
+    return Credentials(f"AKID{n:016d}", f"secret-{n}", f"token-{n}")
+
+
+def unpooled_invocation() -> None:
+    credentials = fresh_credentials()
+    session = Session(
+        aws_access_key_id=credentials.accessKeyId,
+        aws_secret_access_key=credentials.secretAccessKey,
+        aws_session_token=credentials.sessionToken,
+        region_name=REGION,
+    )
+    for service in SERVICES:
+        session.client(service)
+
+
+def shared_loader_invocation() -> None:
+    # fresh clients every time, but on sessions sharing the parsed models
+    proxy = _get_boto_session(fresh_credentials(), REGION)
+    assert proxy
+    for service in SERVICES:
+        proxy.session.client(service)
+
+
+def pooled_invocation() -> None:
+    proxy = _get_boto_session(fresh_credentials(), REGION)
+    assert proxy
+    for service in SERVICES:
+        proxy.client(service)
+
+
+def main() -> None:
+    results = [
+        measure("session_clients[warm]", unpooled_invocation, iterations=30),
+        measure("shared_loader[warm]", shared_loader_invocation, iterations=30),
+        measure("client_pool[warm]", pooled_invocation, iterations=30),
+    ]
+    report("client_pool", [*results, {"name": "loader_cache", **loader_cache_stats()}])
+
+
+if __name__ == "__main__":
+    main()
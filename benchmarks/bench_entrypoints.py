@@ -0,0 +1,407 @@
+# pylint: disable=invalid-name
+"""Resource and Hook entrypoints end to end, with CloudWatch and Logs faked.
+
+Every AWS call still goes through botocore (parameter validation, request
+serialization, signing, response parsing), but is answered locally instead of
+going over the network, so the suite runs offline. Each scenario also reports
+how many calls of each kind one invocation makes.
+"""
+from dataclasses import dataclass
+
+from cloudformation_cli_python_lib import (
+    Action,
+    Hook,
+    HookInvocationPoint,
+    HookStatus,
+    OperationStatus,
+    ProgressEvent,
+    Resource,
+    boto3_proxy,
+)
+from cloudformation_cli_python_lib.interface import BaseModel
+from cloudformation_cli_python_lib.log_delivery import ProviderLogHandler
+from cloudformation_cli_python_lib.recast import recast_object
+from cloudformation_cli_python_lib.utils import deserialize_list
+
+import itertools
+import json
+import logging
+import os
+import sys
+from botocore.awsrequest import AWSResponse  # type: ignore
+from collections import Counter
+from contextlib import contextmanager
+from functools import partial
+from inspect import getmembers, isclass
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+from unittest.mock import patch
+
+from .harness import measure, report
+
+LOG = logging.getLogger(__name__)
+
+TYPE_NAME = "AWS::Test::Bench"
+HOOK_TYPE_NAME = "AWS::Test::BenchHook"
+STACK_ID = (
+    "arn:aws:cloudformation:us-east-1:123456789012:stack/SampleStack/"
+    "e722ae60-fe62-11e8-9a0e-0ae8cc519968"
+)
+# (tags, rules) in the resource properties
+SIZES = {"small": (1, 0), "medium": (10, 10), "large": (50, 200)}
+_COUNTER = itertools.count()
+
+
+@dataclass
+class Condition(BaseModel):
+    Field: Optional[str]
+    Values: Optional[Sequence[str]]
+
+    @classmethod
+    def _deserialize(cls, json_data):  # type: ignore
+        if not json_data:
+            return None
+        return cls(Field=json_data.get("Field"), Values=json_data.get("Values"))
+
+
+_Condition = Condition
+
+
+@dataclass
+class Rule(BaseModel):
+    RuleName: Optional[str]
+    Priority: Optional[int]
+    Conditions: Optional[Sequence["_Condition"]]
+
+    @classmethod
+    def _deserialize(cls, json_data):  # type: ignore
+        if not json_data:
+            return None
+        return cls(
+            RuleName=json_data.get("RuleName"),
+            Priority=json_data.get("Priority"),
+            Conditions=deserialize_list(json_data.get("Conditions"), Condition),
+        )
+
+
+_Rule = Rule
+
+
+@dataclass
+class Tag(BaseModel):
+    Key: Optional[str]
+    Value: Optional[str]
+
+    @classmethod
+    def _deserialize(cls, json_data):  # type: ignore
+        if not json_data:
+            return None
+        return cls(Key=json_data.get("Key"), Value=json_data.get("Value"))
+
+
+_Tag = Tag
+
+
+@dataclass
+class ResourceModel(BaseModel):
+    Arn: Optional[str]
+    Name: Optional[str]
+    Size: Optional[int]
+    Enabled: Optional[bool]
+    Tags: Optional[Sequence["_Tag"]]
+    Rules: Optional[Sequence["_Rule"]]
+
+    @classmethod
+    def _deserialize(cls, json_data):  # type: ignore
+        # as generated by the plugin
+        if not json_data:
+            return None
+        dataclasses = {n: o for n, o in getmembers(sys.modules[__name__]) if isclass(o)}
+        recast_object(cls, json_data, dataclasses)
+        return cls(
+            Arn=json_data.get("Arn"),
+            Name=json_data.get("Name"),
+            Size=json_data.get("Size"),
+            Enabled=json_data.get("Enabled"),
+            Tags=deserialize_list(json_data.get("Tags"), Tag),
+            Rules=deserialize_list(json_data.get("Rules"), Rule),
+        )
+
+
+@dataclass
+class TypeConfigurationModel(BaseModel):
+    MaxRules: Optional[int]
+
+    @classmethod
+    def _deserialize(cls, json_data):  # type: ignore
+        if not json_data:
+            return None
+        dataclasses = {n: o for n, o in getmembers(sys.modules[__name__]) if isclass(o)}
+        recast_object(cls, json_data, dataclasses)
+        return cls(MaxRules=json_data.get("MaxRules"))
+
+
+def make_properties(tags: int, rules: int) -> Dict[str, Any]:
+    # CloudFormation sends every scalar as a string
+    return {
+        "Arn": "arn:aws:service:us-east-1:123456789012:thing/bench",
+        "Name": "bench",
+        "Size": "3",
+        "Enabled": "true",
+        "Tags": [{"Key": f"key{t}", "Value": "v" * 32} for t in range(tags)],
+        "Rules": [
+            {
+                "RuleName": f"rule-{r}",
+                "Priority": str(r),
+                "Conditions": [{"Field": "path", "Values": ["/a", "/b"]}],
+            }
+            for r in range(rules)
+        ],
+    }
+
+
+def fresh_credentials(kind: str) -> Dict[str, str]:
+    # fresh temporary credentials per invocation, like CloudFormation sends
+    n = next(_COUNTER)
+    return {
+        "accessKeyId": f"AKID{kind.upper()}{n:010d}",
+        "secretAccessKey": f"{kind}-secret-{n}",
+        "sessionToken": f"{kind}-token-{n}",
+    }
+
+
+def resource_event(properties: Mapping[str, Any]) -> Dict[str, Any]:
+    return {
+        "awsAccountId": "123456789012",
+        "bearerToken": "123456",
+        "region": "us-east-1",
+        "action": "CREATE",
+        "responseEndpoint": None,
+        "resourceType": TYPE_NAME,
+        "resourceTypeVersion": "1.0",
+        "callbackContext": {},
+        "requestData": {
+            "callerCredentials": fresh_credentials("caller"),
+            "providerCredentials": fresh_credentials("provider"),
+            "providerLogGroupName": "providerLoggingGroupName",
+            "logicalResourceId": "myResource",
+            "resourceProperties": json.loads(json.dumps(properties)),
+            "previousResourceProperties": None,
+            "systemTags": {"aws:cloudformation:stack-id": "SampleStack"},
+            "previousSystemTags": {},
+            "stackTags": {"tag1": "abc"},
+            "previousStackTags": {},
+            "typeConfiguration": {"MaxRules": "500"},
+        },
+        "stackId": STACK_ID,
+        "snapshotRequested": None,
+    }
+
+
+def resource_test_event(properties: Mapping[str, Any]) -> Dict[str, Any]:
+    return {
+        "credentials": fresh_credentials("caller"),
+        "action": "CREATE",
+        "region": "us-east-1",
+        "request": {
+            "clientRequestToken": "ecba020e-b2e6-4742-a7d0-8a06ae7c4b2b",
+            "desiredResourceState": json.loads(json.dumps(properties)),
+            "logicalResourceIdentifier": "myResource",
+        },
+    }
+
+
+def hook_event(properties: Mapping[str, Any]) -> Dict[str, Any]:
+    return {
+        "awsAccountId": "123456789012",
+        "clientRequestToken": "4b90a7e4-b790-456b-a937-0cfdfa211dfe",
+        "region": "us-east-1",
+        "actionInvocationPoint": "CREATE_PRE_PROVISION",
+        "hookTypeName": HOOK_TYPE_NAME,
+        "hookTypeVersion": "1.0",
+        "requestContext": {"invocation": 1, "callbackContext": {}},
+        "requestData": {
+            # hooks get their credentials as JSON strings
+            "callerCredentials": json.dumps(fresh_credentials("caller")),
+            "providerCredentials": json.dumps(fresh_credentials("provider")),
+            "providerLogGroupName": "providerLoggingGroupName",
+            "targetName": TYPE_NAME,
+            "targetType": "RESOURCE",
+            "targetLogicalId": "myResource",
+            "hookEncryptionKeyArn": None,
+            "hookEncryptionKeyRole": None,
+            "targetModel": {
+                "resourceProperties": json.loads(json.dumps(properties)),
+                "previousResourceProperties": None,
+            },
+        },
+        "stackId": STACK_ID,
+        "hookModel": {"MaxRules": "500"},
+    }
+
+
+def hook_test_event(properties: Mapping[str, Any]) -> Dict[str, Any]:
+    return {
+        "credentials": fresh_credentials("caller"),
+        "actionInvocationPoint": "CREATE_PRE_PROVISION",
+        "region": "us-east-1",
+        "request": {
+            "clientRequestToken": "ecba020e-b2e6-4742-a7d0-8a06ae7c4b2b",
+            "targetName": TYPE_NAME,
+            "targetType": "RESOURCE",
+            "targetLogicalId": "myResource",
+            "targetModel": {
+                "resourceProperties": json.loads(json.dumps(properties)),
+                "previousResourceProperties": None,
+            },
+        },
+        "typeConfiguration": {"MaxRules": "500"},
+    }
+
+
+resource = Resource(TYPE_NAME, ResourceModel, TypeConfigurationModel)
+hook = Hook(HOOK_TYPE_NAME, TypeConfigurationModel)
+
+
+@resource.handler(Action.CREATE)
+def create(_session, request, _callback_context):  # type: ignore
+    model = request.desiredResourceState
+    LOG.info("Creating %s with %d rules", model.Name, len(model.Rules or ()))
+    return ProgressEvent(status=OperationStatus.SUCCESS, resourceModel=model)
+
+
+@hook.handler(HookInvocationPoint.CREATE_PRE_PROVISION)
+def pre_create(_session, request, _callback_context, type_configuration):  # type: ignore
+    properties = request.hookContext.targetModel["resourceProperties"]
+    rules = len(properties.get("Rules") or ())
+    LOG.info("Checking %s rules", rules)
+    if rules > type_configuration.MaxRules:
+        return ProgressEvent(status=OperationStatus.FAILED, message="Too many rules")
+    return ProgressEvent(status=OperationStatus.SUCCESS)
+
+
+CASES: List[Tuple[str, Callable[[Any, Any], Any], Callable[..., Dict[str, Any]]]] = [
+    ("resource", resource, resource_event),
+    ("resource_test_entrypoint", resource.test_entrypoint, resource_test_event),
+    ("hook", hook, hook_event),
+    ("hook_test_entrypoint", hook.test_entrypoint, hook_test_event),
+]
+
+
+class LambdaContext:
+    @staticmethod
+    def get_remaining_time_in_millis() -> int:
+        return 900000
+
+
+class _Body:
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+
+    def stream(self, **_kwargs: Any) -> Iterator[bytes]:
+        yield self._body
+
+
+class FakeAWS:
+    """Answers CloudWatch and CloudWatch Logs requests locally."""
+
+    # anything else gets an empty body
+    RESPONSES = {"PutLogEvents": b'{"nextSequenceToken": "49590338271490256608"}'}
+
+    def __init__(self) -> None:
+        self.calls: MutableMapping[str, int] = Counter()
+
+    def send(self, request: Any, event_name: str, **_kwargs: Any) -> AWSResponse:
+        operation = event_name.rsplit(".", 1)[-1]
+        self.calls[operation] += 1
+        body = self.RESPONSES.get(operation, b"")
+        return AWSResponse(request.url, 200, {}, _Body(body))
+
+    @contextmanager
+    def installed(self) -> Iterator[None]:
+        # clients copy the session's event handlers, so pooled clients keep
+        # the fake for as long as they are reused
+        create_session = boto3_proxy._create_session  # pylint: disable=protected-access
+
+        def _create_session(*args: Any) -> Any:
+            session = create_session(*args)
+            session.events.register("before-send", self.send)
+            return session
+
+        with patch.object(boto3_proxy, "_create_session", _create_session):
+            yield
+        boto3_proxy.CLIENT_POOL.clear()
+
+
+def scenario(
+    entrypoint: Callable[[Any, Any], Any], make_event: Callable[[], Dict[str, Any]]
+) -> Tuple[Callable[[], Any], Callable[[], None]]:
+    """The call to time, and its setup building the (untimed) event."""
+    events: List[Dict[str, Any]] = []
+
+    def setup() -> None:
+        events.append(make_event())
+
+    def call() -> Any:
+        return entrypoint(events.pop(), LambdaContext())
+
+    return call, setup
+
+
+def remove_log_delivery() -> None:
+    # so that each scenario only delivers the logs its own entrypoint would
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, ProviderLogHandler):
+            root.removeHandler(handler)
+
+
+def run(
+    fake: FakeAWS,
+    name: str,
+    entrypoint: Callable[[Any, Any], Any],
+    make_event: Callable[[], Dict[str, Any]],
+) -> Dict[str, Any]:
+    remove_log_delivery()
+    call, setup = scenario(entrypoint, make_event)
+    result = measure(name, call, iterations=100, setup=setup)
+
+    fake.calls.clear()
+    setup()
+    response = call()
+    status = response.get("status") or response.get("hookStatus")
+    assert status in (OperationStatus.SUCCESS.value, HookStatus.SUCCESS.value), response
+    size = len(json.dumps(make_event())) / 1024.0
+    return {**result, "event_kib": size, "aws_calls": dict(sorted(fake.calls.items()))}
+
+
+def main() -> None:
+    # Lambda sets the region, and the provider session relies on it
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    # stands in for the handler the Lambda runtime installs on the root logger.
+    # INFO, so that the handlers' and the runtime's log lines are delivered
+    logging.getLogger().addHandler(logging.NullHandler())
+    logging.getLogger().setLevel(logging.INFO)
+    fake = FakeAWS()
+    results = []
+    with fake.installed():
+        for size, (tags, rules) in SIZES.items():
+            properties = make_properties(tags, rules)
+            for case, entrypoint, build in CASES:
+                name = f"{case}[{size}]"
+                results.append(run(fake, name, entrypoint, partial(build, properties)))
+    report("entrypoints", results)
+
+
+if __name__ == "__main__":
+    main()
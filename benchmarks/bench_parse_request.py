@@ -0,0 +1,73 @@
+"""Request parsing: eagerly built sessions vs lazy session proxies."""
+from cloudformation_cli_python_lib.resource import Resource
+
+import itertools
+from typing import Any, Dict
+
+from .harness import measure, report
+
+_COUNTER = itertools.count()
+
+
+def make_event() -> Dict[str, Any]:
+    # fresh temporary credentials per invocation, like CloudFormation sends
+    n = next(_COUNTER)
+    return {
+        "awsAccountId": "123456789012",
+        "bearerToken": "123456",
+        "region": "us-east-1",
+        "action": "UPDATE",
+        "responseEndpoint": None,
+        "resourceType": "AWS::Test::TestModel",
+        "resourceTypeVersion": "1.0",
+        "callbackContext": {},
+        "requestData": {
+            "callerCredentials": {
+                "accessKeyId": f"AKIDCALLER{n:010d}",
+                "secretAccessKey": f"caller-secret-{n}",
+                "sessionToken": f"caller-token-{n}",
+            },
+            "providerCredentials": {
+                "accessKeyId": f"AKIDPROVIDER{n:08d}",
+                "secretAccessKey": f"provider-secret-{n}",
+                "sessionToken": f"provider-token-{n}",
+            },
+            "providerLogGroupName": "providerLoggingGroupName",
+            "logicalResourceId": "myBucket",
+            "resourceProperties": {"BucketName": "bucket", "Tags": []},
+            "previousResourceProperties": {"BucketName": "bucket"},
+            "systemTags": {"aws:cloudformation:stack-id": "SampleStack"},
+            "previousSystemTags": {},
+            "stackTags": {"tag1": "abc"},
+            "previousStackTags": {"tag1": "def"},
+            "typeConfiguration": None,
+        },
+        "stackId": "arn:aws:cloudformation:us-east-1:123456789012:stack/SampleStack/e"
+        "722ae60-fe62-11e8-9a0e-0ae8cc519968",
+        "snapshotRequested": None,
+    }
+
+
+def lazy_parse() -> None:
+    Resource._parse_request(make_event())  # pylint: disable=protected-access
+
+
+def eager_parse() -> None:
+    # what parsing cost when both sessions were built up front
+    sessions, *_ = Resource._parse_request(  # pylint: disable=protected-access
+        make_event()
+    )
+    for proxy in sessions:
+        assert proxy and proxy.session
+
+
+def main() -> None:
+    results = [
+        measure("parse_request[eager_sessions]", eager_parse, iterations=200),
+        measure("parse_request[lazy_sessions]", lazy_parse, iterations=200),
+    ]
+    report("parse_request", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""First invocation of a fresh process: cold vs primed ahead of time."""
+import json
+import subprocess
+import sys
+from typing import List
+
+from .harness import report, summarize
+
+PROCESSES = 10
+
+# runs in a fresh interpreter; prints how long the first invocation took
+_FIRST_INVOCATION = """
+import json, sys, time
+from dataclasses import dataclass
+from typing import Optional
+from cloudformation_cli_python_lib import Action, ProgressEvent, Resource
+from cloudformation_cli_python_lib.interface import BaseModel, OperationStatus
+from cloudformation_cli_python_lib.recast import recast_object
+
+
+@dataclass
+class ResourceModel(BaseModel):
+    Name: Optional[str]
+    Size: Optional[int]
+
+    @classmethod
+    def _deserialize(cls, json_data):
+        if not json_data:
+            return None
+        recast_object(cls, json_data, {})
+        return cls(Name=json_data.get("Name"), Size=json_data.get("Size"))
+
+
+resource = Resource(
+    "AWS::Test::Bench", ResourceModel, services=["s3", "sqs"], regions=["us-east-1"]
+)
+
+
+@resource.handler(Action.CREATE)
+def create(session, request, callback_context):
+    session.client("s3")
+    session.client("sqs")
+    return ProgressEvent(
+        status=OperationStatus.SUCCESS, resourceModel=request.desiredResourceState
+    )
+
+
+if sys.argv[1] == "primed":
+    resource.prime()
+event = {
+    "credentials": {
+        "accessKeyId": "AKID", "secretAccessKey": "secret", "sessionToken": "token"
+    },
+    "action": "CREATE",
+    "region": "us-east-1",
+    "request": {
+        "clientRequestToken": "ecba020e-b2e6-4742-a7d0-8a06ae7c4b2b",
+        "desiredResourceState": {"Name": "bench", "Size": "3"},
+        "logicalResourceIdentifier": "Bench",
+    },
+}
+start = time.perf_counter()
+resource.test_entrypoint(event, None)
+print(json.dumps((time.perf_counter() - start) * 1000.0))
+"""
+
+
+def first_invocation(mode: str) -> float:
+    result = subprocess.run(  # nosec
+        [sys.executable, "-c", _FIRST_INVOCATION, mode],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return float(json.loads(result.stdout))
+
+
+def main() -> None:
+    results = []
+    for mode in ("cold", "primed"):
+        samples: List[float] = [first_invocation(mode) for _ in range(PROCESSES)]
+        results.append(summarize(f"first_invocation[{mode}]", samples))
+    report("priming", results)
+
+
+if __name__ == "__main__":
+    main()
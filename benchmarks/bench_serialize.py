@@ -0,0 +1,97 @@
+# pylint: disable=invalid-name
+"""Response serialization: json.dumps/json.loads round trip vs single pass."""
+from dataclasses import dataclass
+
+from cloudformation_cli_python_lib.interface import (
+    BaseModel,
+    OperationStatus,
+    ProgressEvent,
+)
+from cloudformation_cli_python_lib.utils import (
+    KitchenSinkEncoder,
+    kitchen_sink_serialize,
+)
+
+import json
+from datetime import datetime
+from typing import Any, List, Mapping, Optional
+
+from .harness import measure, report
+
+
+@dataclass
+class Rule(BaseModel):
+    RuleName: Optional[str]
+    Priority: Optional[int]
+    Conditions: Optional[List[Mapping[str, Any]]]
+    CreatedAt: Optional[datetime]
+
+    @classmethod
+    def _deserialize(cls, json_data):  # type: ignore
+        raise NotImplementedError()
+
+
+@dataclass
+class ListedResource(BaseModel):
+    Arn: Optional[str]
+    Tags: Optional[List[Mapping[str, str]]]
+    Rules: Optional[List[Rule]]
+
+    @classmethod
+    def _deserialize(cls, json_data):  # type: ignore
+        raise NotImplementedError()
+
+
+def make_list_event(models: int) -> ProgressEvent:
+    created = datetime(2024, 1, 1, 12, 0, 0)
+    return ProgressEvent(
+        status=OperationStatus.SUCCESS,
+        nextToken="next-page",
+        resourceModels=[
+            ListedResource(
+                Arn=f"arn:aws:service:us-east-1:123456789012:thing/{i:08d}",
+                Tags=[{"Key": f"key{t}", "Value": "v" * 32} for t in range(5)],
+                Rules=[
+                    Rule(
+                        RuleName=f"rule-{i}-{r}",
+                        Priority=r,
+                        Conditions=[{"Field": "path", "Values": ["/a", "/b"]}],
+                        CreatedAt=created,
+                    )
+                    for r in range(4)
+                ],
+            )
+            for i in range(models)
+        ],
+    )
+
+
+def json_round_trip(event: ProgressEvent) -> Any:
+    # what the entrypoints did before: _serialize, then dumps/loads the result
+    serialized = event._serialize()  # pylint: disable=protected-access
+    return json.loads(json.dumps(serialized, cls=KitchenSinkEncoder))
+
+
+def main() -> None:
+    results = []
+    for models in (100, 1000, 5000):
+        event = make_list_event(models)
+        size_mb = len(json.dumps(event, cls=KitchenSinkEncoder)) / 1024.0 / 1024.0
+        assert kitchen_sink_serialize(event) == json_round_trip(event)
+        iterations = max(5, 5000 // models)
+        for name, func in (
+            ("json_round_trip", json_round_trip),
+            ("kitchen_sink_serialize", kitchen_sink_serialize),
+        ):
+            result = measure(
+                f"{name}[{models} models]",
+                lambda func=func, event=event: func(event),
+                iterations=iterations,
+            )
+            result["payload_mb"] = round(size_mb, 2)
+            results.append(result)
+    report("serialize", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(percent / 100.0 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def measure(
+    name: str,
+    func: Callable[[], Any],
+    iterations: int = 50,
+    warmup: int = 3,
+    setup: Optional[Callable[[], Any]] = None,
+) -> Dict[str, Any]:
+    """Times ``func`` and records the peak memory allocated by one call.
+
+    ``setup`` runs (untimed) before every call, for cases that need fresh state.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+
+    samples = []
+    gc.collect()
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000.0)
+
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {**summarize(name, samples), "peak_alloc_kib": peak / 1024.0}
+
+
+def summarize(name: str, samples: List[float]) -> Dict[str, Any]:
+    """Summary statistics of timings (in milliseconds) taken elsewhere."""
+    return {
+        "name": name,
+        "iterations": len(samples),
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": _percentile(samples, 50),
+        "p90_ms": _percentile(samples, 90),
+        "p99_ms": _percentile(samples, 99),
+        "max_ms": max(samples),
+    }
+
+
+def report(suite: str, results: List[Mapping[str, Any]]) -> None:
+    python = platform.python_version()
+    for result in results:
+        print(json.dumps({"suite": suite, "python": python, **result}, sort_keys=True))
+    sys.stdout.flush()
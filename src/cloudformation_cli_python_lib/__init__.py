@@ -1,7 +1,7 @@
 import logging
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, List
 
-from .boto3_proxy import SessionProxy  # noqa: F401
-from .hook import Hook  # noqa: F401
 from .interface import (  # noqa: F401
     Action,
     BaseHookHandlerRequest,
@@ -11,9 +11,53 @@ from .interface import (  # noqa: F401
     HookInvocationPoint,
     HookProgressEvent,
     HookStatus,
+    MetricsDestination,
     OperationStatus,
     ProgressEvent,
 )
-from .resource import Resource  # noqa: F401
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .boto3_proxy import SessionProxy  # noqa: F401
+    from .hook import Hook  # noqa: F401
+    from .resource import Resource  # noqa: F401
+
+# loaded on first access, so a cold start only pays for what the handler uses
+_LAZY_ATTRIBUTES = {
+    "Hook": ".hook",
+    "Resource": ".resource",
+    "SessionProxy": ".boto3_proxy",
+}
+
+__all__ = [
+    "Action",
+    "BaseHookHandlerRequest",
+    "BaseResourceHandlerRequest",
+    "HandlerErrorCode",
+    "Hook",
+    "HookContext",
+    "HookInvocationPoint",
+    "HookProgressEvent",
+    "HookStatus",
+    "MetricsDestination",
+    "OperationStatus",
+    "ProgressEvent",
+    "Resource",
+    "SessionProxy",
+]
+
+
+def __getattr__(name: str) -> Any:
+    try:
+        module_name = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
+
 
 logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -1,27 +1,381 @@
-# boto3 doesn't have stub files
-from boto3.session import Session  # type: ignore
-
-from typing import Optional
+# pylint: disable=import-outside-toplevel
+import logging
+import os
+import threading
+import weakref
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    cast,
+)
 
 from .utils import Credentials
 
+if TYPE_CHECKING:  # pragma: no cover
+    # boto3 doesn't have stub files
+    from boto3.session import Session  # type: ignore
 
-class SessionProxy:
-    def __init__(self, session: Session):
-        self.client = session.client
-        self.resource = session.resource
-        self.session = session
+    from botocore.config import Config  # type: ignore
+    from botocore.loaders import Loader  # type: ignore
 
+LOG = logging.getLogger(__name__)
 
-def _get_boto_session(
-    credentials: Optional[Credentials], region: Optional[str] = None
-) -> Optional[SessionProxy]:
-    if not credentials:
+# boto3 and botocore take a large share of a cold start, so they are only
+# imported once a session or client is actually needed
+
+# positional parameters of boto3.session.Session.client, after service_name
+_CLIENT_ARGS = (
+    "region_name",
+    "api_version",
+    "use_ssl",
+    "verify",
+    "endpoint_url",
+    "aws_access_key_id",
+    "aws_secret_access_key",
+    "aws_session_token",
+    "config",
+    "aws_account_id",
+)
+# explicit credentials on a client call opt out of pooling
+_CREDENTIAL_ARGS = ("aws_access_key_id", "aws_secret_access_key", "aws_session_token")
+
+
+class _PooledClient:
+    def __init__(self, client: Any, credentials: Credentials, owner: Any) -> None:
+        self.client = client
+        self.credentials = credentials
+        self.owner = weakref.ref(owner)
+
+
+class ClientPool:
+    """A container-wide pool of boto3 clients.
+
+    CloudFormation hands every invocation fresh temporary credentials, so
+    caching sessions by credentials barely helps. Instead, clients are keyed by
+    service, region and configuration, and a client whose previous owner (a
+    :class:`SessionProxy`) is gone gets the new credentials rebound onto it.
+    It keeps its loaded service model and its connection pool, so warm
+    invocations skip client construction, endpoint resolution and TLS setup.
+
+    A client is never shared between two live proxies with different
+    credentials, so caller and provider sessions get separate clients.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._clients: Dict[Hashable, List[_PooledClient]] = {}
+
+    def client(
+        self,
+        owner: "SessionProxy",
+        credentials: Credentials,
+        service_name: str,
+        client_kwargs: Mapping[str, Any],
+    ) -> Any:
+        if any(client_kwargs.get(arg) for arg in _CREDENTIAL_ARGS):
+            return owner.session.client(service_name, **client_kwargs)
+
+        options = {k: v for k, v in client_kwargs.items() if v is not None}
+        region_name = options.pop("region_name", None) or owner.region_name
+        config = options.pop("config", None)
+        key = (service_name, region_name, _hashable(options), _config_key(config))
+        with self._lock:
+            entries = self._clients.setdefault(key, [])
+            entry = self._find_entry(entries, credentials)
+            if entry:
+                if entry.credentials != credentials:
+                    _rebind_credentials(entry.client, credentials)
+                    entry.credentials = credentials
+                entry.owner = weakref.ref(owner)
+                return entry.client
+
+        # build outside of the lock, client creation is the slow part. This is
+        # also the only place the owner's session has to exist
+        new_client = owner.session.client(service_name, **client_kwargs)
+        with self._lock:
+            self._clients.setdefault(key, []).append(
+                _PooledClient(new_client, credentials, owner)
+            )
+        return new_client
+
+    @staticmethod
+    def _find_entry(
+        entries: List[_PooledClient], credentials: Credentials
+    ) -> Optional[_PooledClient]:
+        idle = None
+        for entry in entries:
+            if entry.credentials == credentials:
+                return entry
+            if idle is None and entry.owner() is None:
+                idle = entry
+        return idle
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+
+    def reset_connections(self) -> None:
+        """Drops the open connections of every pooled client.
+
+        Connections are re-established on the next request. Needed after a
+        snapshot restore, where the sockets from before the snapshot are dead.
+        """
+        with self._lock:
+            clients = [
+                entry.client for entries in self._clients.values() for entry in entries
+            ]
+        for client in clients:
+            # pylint: disable=protected-access
+            client._endpoint.http_session.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._clients.values())
+
+
+def _rebind_credentials(client: Any, credentials: Credentials) -> None:
+    from botocore.credentials import Credentials as BotoCredentials  # type: ignore
+
+    # the request signer is where botocore reads credentials from on every call
+    # pylint: disable=protected-access
+    client._request_signer._credentials = BotoCredentials(
+        access_key=credentials.accessKeyId,
+        secret_key=credentials.secretAccessKey,
+        token=credentials.sessionToken,
+    )
+
+
+def _hashable(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, Hashable):
+        return value
+    return repr(value)
+
+
+def _config_key(config: Optional["Config"]) -> Hashable:
+    if config is None:
         return None
-    session = Session(
+    # pylint: disable=protected-access
+    return _hashable(config._user_provided_options)
+
+
+CLIENT_POOL = ClientPool()
+
+
+class _CountingCache(Dict[Hashable, Any]):
+    # botocore's instance_cache checks membership before every lookup, so
+    # counting there gives the hit/miss ratio of all cached loader methods
+    def __init__(self) -> None:
+        super().__init__()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key: object) -> bool:
+        found = super().__contains__(key)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+
+class _SearchPaths(List[str]):
+    # every boto3 session appends its resource data path to the loader,
+    # which would grow without bound on a shared loader
+    def append(self, path: str) -> None:
+        if path not in self:
+            super().append(path)
+
+
+class SharedLoader:
+    """Holds the botocore data loader shared by every session in the container.
+
+    Each botocore session normally creates its own loader, so the first client
+    for a service in every invocation re-reads and re-parses the service
+    model, paginators, waiters, endpoint rulesets and partition data from
+    disk. Sessions created by :func:`_get_boto_session` all use this loader
+    instead, so that data is parsed once per container. The loader itself is
+    created on first use.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loader: Optional["Loader"] = None
+        self._cache = _CountingCache()
+
+    def get(self) -> "Loader":
+        with self._lock:
+            if self._loader is None:
+                from botocore.loaders import Loader  # type: ignore
+
+                loader = Loader(extra_search_paths=_data_paths())
+                # pylint: disable=protected-access
+                loader._cache = self._cache
+                loader._search_paths = _SearchPaths(loader.search_paths)
+                self._loader = loader
+            return self._loader
+
+    def cache_stats(self) -> Dict[str, int]:
+        return {
+            "hits": self._cache.hits,
+            "misses": self._cache.misses,
+            "entries": len(self._cache),
+        }
+
+
+def _data_paths() -> List[str]:
+    # the same expansion botocore.loaders.create_loader applies
+    value = os.environ.get("AWS_DATA_PATH")
+    if not value:
+        return []
+    return [
+        os.path.expanduser(os.path.expandvars(path)) for path in value.split(os.pathsep)
+    ]
+
+
+SHARED_LOADER = SharedLoader()
+
+
+def loader_cache_stats() -> Dict[str, int]:
+    """Hits, misses and entries of the container-wide botocore loader cache."""
+    return SHARED_LOADER.cache_stats()
+
+
+def _create_session(credentials: Credentials, region: Optional[str]) -> "Session":
+    from boto3.session import Session  # type: ignore
+
+    from botocore.session import Session as BotocoreSession  # type: ignore
+
+    botocore_session = BotocoreSession()
+    botocore_session.register_component("data_loader", SHARED_LOADER.get())
+    return Session(
         aws_access_key_id=credentials.accessKeyId,
         aws_secret_access_key=credentials.secretAccessKey,
         aws_session_token=credentials.sessionToken,
         region_name=region,
+        botocore_session=botocore_session,
+    )
+
+
+class SessionProxy:
+    """A lazy facade over a boto3 session.
+
+    The proxy only holds the credentials and region; the boto3 session is built
+    the first time :attr:`session` or :meth:`resource` is used, or a client is
+    missing from the :data:`CLIENT_POOL`. Handlers that never call AWS, or
+    only do so on some code paths, never pay for it.
+
+    ``max_pool_connections`` becomes the default for every client created
+    through the proxy; a ``config`` passed by the caller wins.
+    """
+
+    def __init__(
+        self,
+        session: Optional["Session"] = None,
+        credentials: Optional[Credentials] = None,
+        region: Optional[str] = None,
+        max_pool_connections: Optional[int] = None,
+    ):
+        if session is None and credentials is None:
+            raise TypeError("SessionProxy needs a session or credentials")
+        self._session = session
+        self._credentials = credentials
+        self._region = region
+        self._max_pool_connections = max_pool_connections
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> "Session":
+        with self._lock:
+            if self._session is None:
+                credentials = cast(Credentials, self._credentials)
+                self._session = _create_session(credentials, self._region)
+            return self._session
+
+    @property
+    def region_name(self) -> Optional[str]:
+        # None means the session's default region, resolved on creation
+        return self._region
+
+    def resource(self, service_name: str, *args: Any, **kwargs: Any) -> Any:
+        return self.session.resource(service_name, *args, **kwargs)
+
+    def client(self, service_name: str, *args: Any, **kwargs: Any) -> Any:
+        client_kwargs = dict(zip(_CLIENT_ARGS, args), **kwargs)
+        if self._max_pool_connections is not None:
+            from botocore.config import Config  # type: ignore
+
+            default = Config(max_pool_connections=self._max_pool_connections)
+            config = client_kwargs.get("config")
+            client_kwargs["config"] = default.merge(config) if config else default
+        if self._credentials is None:
+            return self.session.client(service_name, **client_kwargs)
+        return CLIENT_POOL.client(self, self._credentials, service_name, client_kwargs)
+
+
+# clients built ahead of the first request are never used with these, the
+# first invocation rebinds its own credentials onto them. They must not be
+# empty, or botocore would go looking for credentials in the environment
+_PLACEHOLDER_CREDENTIALS = Credentials("priming", "priming", "priming")
+
+
+def prime_clients(
+    services: Iterable[str],
+    regions: Iterable[Optional[str]] = (None,),
+    max_pool_connections: Optional[int] = None,
+    config: Optional["Config"] = None,
+) -> int:
+    """Builds pooled clients ahead of the first invocation.
+
+    The clients are left idle in :data:`CLIENT_POOL`, so the first
+    ``session.client`` call for the same service, region, pool size and
+    ``config`` takes one over instead of loading the service model and
+    building a client. A
+    region of ``None`` stands for the session's default region. Failures are
+    logged, never raised, so this is safe to call at import time.
+
+    :return: the number of clients built or already pooled
+    """
+    owner = SessionProxy(
+        credentials=_PLACEHOLDER_CREDENTIALS,
+        max_pool_connections=max_pool_connections,
+    )
+    primed = 0
+    for region in regions:
+        for service in services:
+            try:
+                owner.client(service, region_name=region, config=config)
+            except Exception as e:  # pylint: disable=broad-except
+                # only the message: a log record holding on to the traceback
+                # would keep the owner alive, and its clients from going idle
+                LOG.warning(
+                    "Could not prime %s client for %s: %s", service, region, str(e)
+                )
+            else:
+                primed += 1
+    return primed
+
+
+def _get_boto_session(
+    credentials: Optional[Credentials],
+    region: Optional[str] = None,
+    max_pool_connections: Optional[int] = None,
+) -> Optional[SessionProxy]:
+    if not credentials:
+        return None
+    return SessionProxy(
+        credentials=credentials,
+        region=region,
+        max_pool_connections=max_pool_connections,
     )
-    return SessionProxy(session)
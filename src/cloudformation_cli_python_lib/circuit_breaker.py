@@ -0,0 +1,58 @@
+import logging
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+# consecutive failed calls after which the breaker opens, and for how many
+# seconds
+DEFAULT_BREAKER_FAILURES = 3
+DEFAULT_BREAKER_COOL_DOWN = 60.0
+
+
+class CircuitBreaker:
+    """Pauses calls to a service for ``cool_down`` seconds once ``max_failures``
+    of them in a row have failed, so a degraded endpoint does not cost every
+    invocation its timeouts.
+
+    Items not sent while it is open are counted in ``skipped``. After the
+    cool-down the next call goes through, and a single failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_failures: int = DEFAULT_BREAKER_FAILURES,
+        cool_down: float = DEFAULT_BREAKER_COOL_DOWN,
+    ) -> None:
+        self.name = name
+        self.max_failures = max_failures
+        self.cool_down = cool_down
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._open_until = 0.0
+        self.skipped = 0
+
+    def allow(self, items: int = 1) -> bool:
+        with self._lock:
+            if time.monotonic() < self._open_until:
+                self.skipped += items
+                return False
+            return True
+
+    def record(self, succeeded: bool) -> None:
+        with self._lock:
+            if succeeded:
+                self._failures = 0
+                return
+            self._failures += 1
+            failures = self._failures
+            if failures < self.max_failures:
+                return
+            self._open_until = time.monotonic() + self.cool_down
+        LOG.warning(
+            "%s failed %d times in a row, pausing it for %s seconds",
+            self.name.capitalize(),
+            failures,
+            self.cool_down,
+        )
@@ -0,0 +1,96 @@
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar
+
+from .deadline import DeadlineExceeded
+from .exceptions import InternalFailure, _HandlerError
+
+LOG = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# the same as botocore's default max_pool_connections
+DEFAULT_MAX_WORKERS = 10
+
+
+class HandlerExecutor:
+    """A bounded thread pool for handlers that fan out AWS calls.
+
+    The pool is created on first use and lives as long as the container.
+    The botocore connection pool of the handler's clients is sized to match
+    (``max_pool_connections``), so worker threads never queue for a connection.
+
+    Functions run on the pool must not themselves wait on the pool, or they
+    can deadlock once all workers are busy.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS) -> None:
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="handler"
+                )
+            return self._executor
+
+    def map(
+        self,
+        fn: Callable[[T], R],
+        items: Iterable[T],
+        max_workers: Optional[int] = None,
+    ) -> List[R]:
+        """Calls ``fn`` on every item concurrently, returning results in order.
+
+        At most ``max_workers`` calls (capped at the pool size) are in flight
+        at once. The first failure cancels the calls not yet started, waits
+        for those already running and is raised: handler errors as they are,
+        anything else as :class:`InternalFailure`.
+        """
+        limit = min(max_workers or self.max_workers, self.max_workers)
+        executor = self._get_executor()
+        pending: Dict["Future[R]", int] = {}
+        results: List[Any] = []
+        try:
+            for index, item in enumerate(items):
+                if len(pending) >= limit:
+                    _collect(pending, results)
+                results.append(None)
+                pending[executor.submit(fn, item)] = index
+            while pending:
+                _collect(pending, results)
+        except (_HandlerError, DeadlineExceeded):
+            raise
+        except Exception as e:  # pylint: disable=broad-except
+            LOG.exception("Exception caught in concurrent call")
+            raise InternalFailure(f"{e} ({type(e).__name__})") from e
+        finally:
+            # no call may outlive the invocation: Lambda would freeze it and
+            # resume it in the next one, whose credentials its clients may use
+            running = [future for future in pending if not future.cancel()]
+            for future in wait(running).done:
+                error = future.exception()
+                if error:
+                    LOG.error("Exception caught in concurrent call", exc_info=error)
+        return results
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+
+def _collect(pending: Dict["Future[R]", int], results: List[Any]) -> None:
+    done, _not_done = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        # popped first, so a failed call is raised here and not logged again
+        index = pending.pop(future)
+        results[index] = future.result()
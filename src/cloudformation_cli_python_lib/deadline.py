@@ -0,0 +1,103 @@
+import asyncio
+import math
+import time
+from typing import Any, Awaitable, MutableMapping, Optional, TypeVar
+
+from .interface import BaseModel, OperationStatus, ProgressEvent
+
+T = TypeVar("T")
+
+# time left for the runtime to publish metrics, flush logs and respond
+DEFAULT_SAFETY_MARGIN_SECONDS = 10.0
+# of which the time kept for responding, once metrics and logs are flushed
+RESPONSE_MARGIN_SECONDS = 1.0
+
+
+class DeadlineExceeded(Exception):
+    """Raised to checkpoint a handler before the invocation runs out of time.
+
+    The runtime turns it into an ``IN_PROGRESS`` event, so CloudFormation
+    re-invokes the handler with ``callback_context``. When no context is given,
+    the handler's own (possibly mutated) callback context is used.
+    """
+
+    def __init__(
+        self,
+        callback_context: Optional[MutableMapping[str, Any]] = None,
+        callback_delay_seconds: int = 0,
+    ):
+        super().__init__("Invocation deadline exceeded")
+        self.callback_context = callback_context
+        self.callback_delay_seconds = callback_delay_seconds
+
+    def to_progress_event(
+        self,
+        callback_context: MutableMapping[str, Any],
+        resource_model: Optional[BaseModel] = None,
+    ) -> ProgressEvent:
+        return ProgressEvent(
+            status=OperationStatus.IN_PROGRESS,
+            resourceModel=resource_model,
+            callbackContext=self.callback_context
+            if self.callback_context is not None
+            else callback_context,
+            callbackDelaySeconds=self.callback_delay_seconds,
+        )
+
+
+class Deadline:
+    """The time budget of the current invocation, available as
+    ``request.deadline``.
+
+    The deadline falls ``safety_margin`` seconds before Lambda would time out.
+    Long running handlers should call :meth:`check` between steps (or look at
+    :meth:`remaining`) and save their progress in the callback context;
+    ``async def`` handlers are cancelled when the deadline passes.
+    """
+
+    def __init__(
+        self, remaining_millis: Optional[int], safety_margin: float = 0.0
+    ) -> None:
+        if remaining_millis is None:
+            self._expires_at = math.inf
+        else:
+            budget = remaining_millis / 1000.0 - safety_margin
+            self._expires_at = time.monotonic() + budget
+
+    @classmethod
+    def from_context(
+        cls, context: Any, safety_margin: float = DEFAULT_SAFETY_MARGIN_SECONDS
+    ) -> "Deadline":
+        try:
+            remaining_millis = context.get_remaining_time_in_millis()
+        except AttributeError:
+            # no Lambda context, e.g. local testing
+            return cls(None)
+        return cls(remaining_millis, safety_margin)
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline, ``inf`` when there is none."""
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def check(
+        self,
+        callback_context: Optional[MutableMapping[str, Any]] = None,
+        callback_delay_seconds: int = 0,
+    ) -> None:
+        """Raises :class:`DeadlineExceeded` once the deadline has passed."""
+        if self.expired():
+            raise DeadlineExceeded(callback_context, callback_delay_seconds)
+
+    async def wait_for(self, awaitable: Awaitable[T]) -> T:
+        timeout = self.remaining()
+        try:
+            return await asyncio.wait_for(
+                awaitable, None if math.isinf(timeout) else timeout
+            )
+        except asyncio.TimeoutError as e:
+            if not self.expired():
+                raise  # the handler's own timeout
+            raise DeadlineExceeded() from e
@@ -0,0 +1,73 @@
+import datetime
+import json
+import sys
+from typing import Any, Callable, Dict, Hashable, List, Mapping
+
+# an Embedded Metric Format document defines at most 100 metrics
+MAX_EMF_METRICS = 100
+
+# writes Embedded Metric Format documents to a log
+EmfSink = Callable[[List[str]], None]
+
+
+def emf_documents(namespace: str, datums: List[Dict[str, Any]]) -> List[str]:
+    """Renders datums as CloudWatch Embedded Metric Format documents.
+
+    Datums sharing a timestamp and dimensions go into one document, in order;
+    a metric published more than once gets an array of values.
+    """
+    documents: List[Dict[str, Any]] = []
+    open_documents: Dict[Hashable, Dict[str, Any]] = {}
+    for datum in datums:
+        name = datum["MetricName"]
+        dimensions = {d["Name"]: d["Value"] for d in datum["Dimensions"]}
+        key = (datum["Timestamp"], tuple(dimensions.items()))
+        document = open_documents.get(key)
+        if document is None or (
+            name not in document and len(_emf_metrics(document)) >= MAX_EMF_METRICS
+        ):
+            document = _emf_document(namespace, datum["Timestamp"], dimensions)
+            open_documents[key] = document
+            documents.append(document)
+        if name not in document:
+            _emf_metrics(document).append({"Name": name, "Unit": datum["Unit"]})
+            document[name] = datum["Value"]
+        elif isinstance(document[name], list):
+            document[name].append(datum["Value"])
+        else:
+            document[name] = [document[name], datum["Value"]]
+    return [json.dumps(document) for document in documents]
+
+
+def _emf_document(
+    namespace: str, timestamp: str, dimensions: Mapping[str, str]
+) -> Dict[str, Any]:
+    parsed = datetime.datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is None:
+        # the runtime publishes naive UTC timestamps
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return {
+        "_aws": {
+            "Timestamp": round(parsed.timestamp() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": namespace,
+                    "Dimensions": [list(dimensions)],
+                    "Metrics": [],
+                }
+            ],
+        },
+        **dimensions,
+    }
+
+
+def _emf_metrics(document: Dict[str, Any]) -> List[Dict[str, str]]:
+    metrics: List[Dict[str, str]] = document["_aws"]["CloudWatchMetrics"][0]["Metrics"]
+    return metrics
+
+
+def write_emf_to_stdout(documents: List[str]) -> None:
+    # Lambda sends stdout to the function's log group, where CloudWatch
+    # extracts the metrics
+    sys.stdout.write("".join(f"{document}\n" for document in documents))
+    sys.stdout.flush()
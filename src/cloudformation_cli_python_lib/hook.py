@@ -1,74 +1,152 @@
-import json
 import logging
 import traceback
-from datetime import datetime
-from functools import wraps
-from typing import Any, Callable, MutableMapping, Optional, Tuple, Type, Union
+from functools import partial, wraps
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Iterable,
+    List,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 from .boto3_proxy import SessionProxy, _get_boto_session
+from .concurrency import DEFAULT_MAX_WORKERS, HandlerExecutor
+from .deadline import (
+    DEFAULT_SAFETY_MARGIN_SECONDS,
+    RESPONSE_MARGIN_SECONDS,
+    Deadline,
+    DeadlineExceeded,
+)
 from .exceptions import InternalFailure, InvalidRequest, _HandlerError
+from .instrumentation import InstrumentedEntrypoint
 from .interface import (
     BaseHookHandlerRequest,
     HandlerErrorCode,
     HookInvocationPoint,
     HookProgressEvent,
     HookStatus,
+    MetricsDestination,
     OperationStatus,
     ProgressEvent,
 )
 from .log_delivery import HookProviderLogHandler
-from .metrics import MetricsPublisherProxy
+from .metrics import (
+    InvocationMetrics,
+    MetricAggregator,
+    MetricsPublisherProxy,
+    defer_flush,
+    flush_deferred,
+)
+from .priming import after_restore, prime
+from .profiling import ProfilingConfig
+from .timing import start_phase_timer, take_phase_timer
 from .utils import (
     BaseModel,
     Credentials,
     HookInvocationRequest,
     HookTestEvent,
-    KitchenSinkEncoder,
     LambdaContext,
     UnmodelledHookRequest,
+    kitchen_sink_serialize,
+    resolve_awaitable,
 )
 
 LOG = logging.getLogger(__name__)
 
+T = TypeVar("T")
+R = TypeVar("R")
+
 HandlerSignature = Callable[
-    [Optional[SessionProxy], Any, MutableMapping[str, Any], Any], ProgressEvent
+    [Optional[SessionProxy], Any, MutableMapping[str, Any], Any],
+    Union[ProgressEvent, Awaitable[ProgressEvent]],
 ]
 
 
 def _ensure_serialize(
     entrypoint: Callable[
         [Any, MutableMapping[str, Any], Any],
-        Union[ProgressEvent, MutableMapping[str, Any]],
+        Union[ProgressEvent, HookProgressEvent, MutableMapping[str, Any]],
     ]
 ) -> Callable[[Any, MutableMapping[str, Any], Any], Any]:
     @wraps(entrypoint)
     def wrapper(self: Any, event: MutableMapping[str, Any], context: Any) -> Any:
+        take_phase_timer()
         try:
             response = entrypoint(self, event, context)
-            serialized = json.dumps(response, cls=KitchenSinkEncoder)
+            # the entrypoint may have started a timer for this invocation
+            timer = take_phase_timer()
+            with timer.phase("serialize"):
+                serialized = kitchen_sink_serialize(response)
+            timer.finish()
+            return serialized
         except Exception:  # pylint: disable=broad-except
             return Hook._create_progress_response(  # pylint: disable=protected-access
                 ProgressEvent.failed(HandlerErrorCode.InternalFailure),
                 None,
             )._serialize()
-        return json.loads(serialized)
+        finally:
+            # what was published and logged during the invocation goes out in
+            # as few requests as possible, leaving time to respond
+            deadline = Deadline.from_context(context, RESPONSE_MARGIN_SECONDS)
+            # logs first, as failures to deliver them are reported as metrics
+            HookProviderLogHandler.flush_existing(deadline)
+            flush_deferred(deadline)
+            # metrics written to the provider log by a sender thread
+            HookProviderLogHandler.drain_existing(deadline)
 
     return wrapper
 
 
-class Hook:
-    def __init__(
+class Hook(InstrumentedEntrypoint):  # pylint: disable=too-many-instance-attributes
+    _log_handler_cls = HookProviderLogHandler
+
+    def __init__(  # pylint: disable=too-many-arguments
         self,
         type_name: str,
         type_configuration_model_cls: Type[BaseModel],
         log_format: Optional[logging.Formatter] = None,
+        *,
+        deadline_safety_margin: float = DEFAULT_SAFETY_MARGIN_SECONDS,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        services: Sequence[str] = (),
+        regions: Sequence[Optional[str]] = (None,),
+        phase_timing: bool = True,
+        phase_metrics: bool = False,
+        profiling: Optional[ProfilingConfig] = None,
+        metrics_destination: MetricsDestination = MetricsDestination.PUT_METRIC_DATA,
+        background_metrics: bool = False,
+        metrics_aggregator: Optional[MetricAggregator] = None,
+        background_logs: bool = False,
     ) -> None:
+        super().__init__(
+            phase_timing=phase_timing,
+            phase_metrics=phase_metrics,
+            profiling=profiling,
+            metrics_destination=metrics_destination,
+            background_metrics=background_metrics,
+            metrics_aggregator=metrics_aggregator,
+            background_logs=background_logs,
+        )
         self.type_name = type_name
         self._type_configuration_model_cls: Type[
             BaseModel
         ] = type_configuration_model_cls
         self._handlers: MutableMapping[HookInvocationPoint, HandlerSignature] = {}
         self.log_format = log_format
+        # seconds before the Lambda timeout at which handlers are checkpointed
+        self.deadline_safety_margin = deadline_safety_margin
+        self._executor = HandlerExecutor(max_workers)
+        # the AWS services (and regions, None being the default one) the
+        # handlers call, for prime()
+        self.services = services
+        self.regions = regions
 
     def handler(
         self, invocation_point: HookInvocationPoint
@@ -79,6 +157,39 @@ class Hook:
 
         return _add_handler
 
+    def prime(self, target_models: Iterable[Type[BaseModel]] = ()) -> None:
+        """Warms up the container ahead of the first invocation.
+
+        Call it at module import, or register it as a before-snapshot hook,
+        to load the models and clients the first request would otherwise
+        have to. Register :meth:`after_restore` as the matching after-restore
+        hook.
+        """
+        prime(
+            models=(self._type_configuration_model_cls, *target_models),
+            services=self.services,
+            regions=self.regions,
+            max_pool_connections=self._executor.max_workers,
+            response=HookProgressEvent(hookStatus=HookStatus.SUCCESS),
+        )
+
+    @staticmethod
+    def after_restore() -> None:
+        after_restore()
+
+    def map_concurrently(
+        self,
+        fn: Callable[[T], R],
+        items: Iterable[T],
+        max_workers: Optional[int] = None,
+    ) -> List[R]:
+        """Calls ``fn`` on every item on the container's handler thread pool.
+
+        Results come back in the order of ``items``. See
+        :meth:`HandlerExecutor.map` for how failures are raised.
+        """
+        return self._executor.map(fn, items, max_workers)
+
     def _invoke_handler(  # pylint: disable=too-many-arguments
         self,
         session: Optional[SessionProxy],
@@ -95,7 +206,14 @@ class Hook:
                 f"No handler for {invocation_point.name}",
             )
 
-        return handler(session, request, callback_context, type_configuration)
+        try:
+            return resolve_awaitable(
+                handler(session, request, callback_context, type_configuration),
+                request.deadline,
+            )
+        except DeadlineExceeded as e:
+            LOG.info("Invocation deadline reached, checkpointing")
+            return e.to_progress_event(callback_context)
 
     def _parse_test_request(
         self, event_data: MutableMapping[str, Any]
@@ -113,7 +231,7 @@ class Hook:
                 **event.request
             ).to_modelled()
 
-            session = _get_boto_session(creds, event.region)
+            session = _get_boto_session(creds, event.region, self._executor.max_workers)
             invocation_point = HookInvocationPoint[event.actionInvocationPoint]
         except Exception as e:  # pylint: disable=broad-except
             LOG.exception("Invalid request")
@@ -133,20 +251,36 @@ class Hook:
 
     @_ensure_serialize
     def test_entrypoint(
-        self, event: MutableMapping[str, Any], _context: Any
+        self, event: MutableMapping[str, Any], context: Any
     ) -> ProgressEvent:
         msg = "Uninitialized"
+        # finished, and logged, by _ensure_serialize
+        timer = start_phase_timer(self.phase_timing)
         try:
-            (
-                session,
-                request,
-                invocation_point,
-                callback_context,
-                type_configuration,
-            ) = self._parse_test_request(event)
-            return self._invoke_handler(
-                session, request, invocation_point, callback_context, type_configuration
+            with timer.phase("parse_request"):
+                deadline = Deadline.from_context(context, self.deadline_safety_margin)
+                (
+                    session,
+                    request,
+                    invocation_point,
+                    callback_context,
+                    type_configuration,
+                ) = self._parse_test_request(event)
+            request.deadline = deadline
+            request.timer = timer
+            # no publishers: handlers' metrics are accepted and not sent
+            request.metrics = InvocationMetrics(
+                MetricsPublisherProxy(), invocation_point
             )
+            timer.annotate(typeName=self.type_name, action=invocation_point.name)
+            with timer.phase("handler"):
+                return self._invoke_handler(
+                    session,
+                    request,
+                    invocation_point,
+                    callback_context,
+                    type_configuration,
+                )
         except _HandlerError as e:
             LOG.exception("Handler error")
             return e.to_progress_event()
@@ -158,7 +292,7 @@ class Hook:
 
     @staticmethod
     def _parse_request(
-        event_data: MutableMapping[str, Any]
+        event_data: MutableMapping[str, Any], max_pool_connections: Optional[int] = None
     ) -> Tuple[
         Tuple[Optional[SessionProxy], Optional[SessionProxy]],
         HookInvocationPoint,
@@ -167,7 +301,10 @@ class Hook:
     ]:
         try:
             event = HookInvocationRequest.deserialize(event_data)
-            caller_sess = _get_boto_session(event.requestData.callerCredentials)
+            caller_sess = _get_boto_session(
+                event.requestData.callerCredentials,
+                max_pool_connections=max_pool_connections,
+            )
             provider_sess = _get_boto_session(event.requestData.providerCredentials)
             # credentials are used when rescheduling, so can't zero them out (for now)
             invocation_point = HookInvocationPoint[event.actionInvocationPoint]
@@ -210,7 +347,8 @@ class Hook:
     @_ensure_serialize  # noqa: C901
     def __call__(  # pylint: disable=too-many-locals  # noqa: C901
         self, event_data: MutableMapping[str, Any], context: LambdaContext
-    ) -> MutableMapping[str, Any]:
+    ) -> HookProgressEvent:
+        timer = start_phase_timer(self.phase_timing)
         logs_setup = False
 
         def print_or_log(message: str) -> None:
@@ -221,39 +359,52 @@ class Hook:
                 traceback.print_exc()
 
         try:
-            sessions, invocation_point, callback, event = self._parse_request(
-                event_data
-            )
+            with timer.phase("parse_request"):
+                deadline = Deadline.from_context(context, self.deadline_safety_margin)
+                sessions, invocation_point, callback, event = self._parse_request(
+                    event_data, self._executor.max_workers
+                )
             caller_sess, provider_sess = sessions
 
-            request, type_configuration = self._cast_hook_request(event)
+            with timer.phase("cast_request"):
+                request, type_configuration = self._cast_hook_request(event)
+            request.deadline = deadline
+            request.timer = timer
 
-            metrics = MetricsPublisherProxy()
+            metrics = self._metrics_proxy()
+            defer_flush(metrics)
             if event.requestData.providerLogGroupName and provider_sess:
-                HookProviderLogHandler.setup(event, provider_sess, self.log_format)
+                with timer.phase("log_setup"):
+                    HookProviderLogHandler.setup(
+                        event,
+                        provider_sess,
+                        self.log_format,
+                        background=self.background_logs,
+                        metrics=metrics,
+                    )
                 logs_setup = True
                 metrics.add_hook_metrics_publisher(
                     provider_sess, event.hookTypeName, event.awsAccountId
                 )
+            request.metrics = InvocationMetrics(metrics, invocation_point)
+            timer.annotate(typeName=self.type_name, action=invocation_point.name)
+            if self.phase_metrics:
+                timer.publish_to(request.metrics)
 
-            metrics.publish_invocation_metric(datetime.utcnow(), invocation_point)
-            start_time = datetime.utcnow()
-            error = None
-
-            try:
-                progress = self._invoke_handler(
-                    caller_sess, request, invocation_point, callback, type_configuration
-                )
-            except Exception as e:  # pylint: disable=broad-except
-                error = e
-
-            m_secs = (datetime.utcnow() - start_time).total_seconds() * 1000.0
-            metrics.publish_duration_metric(datetime.utcnow(), invocation_point, m_secs)
-            if error:
-                metrics.publish_exception_metric(
-                    datetime.utcnow(), invocation_point, error
-                )
-                raise error
+            progress = self._timed_invoke(
+                partial(
+                    self._invoke_handler,
+                    caller_sess,
+                    request,
+                    invocation_point,
+                    callback,
+                    type_configuration,
+                ),
+                metrics,
+                timer,
+                invocation_point,
+                type_configuration,
+            )
         except _HandlerError as e:
             print_or_log("Handler error")
             progress = e.to_progress_event()
@@ -266,9 +417,7 @@ class Hook:
 
         # use the raw event_data as a last-ditch attempt to call back if the
         # request is invalid
-        return self._create_progress_response(
-            progress, event_data
-        )._serialize()  # pylint: disable=protected-access
+        return self._create_progress_response(progress, event_data)
 
     @staticmethod
     def _create_progress_response(
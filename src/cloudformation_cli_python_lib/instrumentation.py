@@ -0,0 +1,99 @@
+import time
+from datetime import datetime
+from typing import Any, Callable, ClassVar, Optional, Type, Union
+
+from .boto3_proxy import loader_cache_stats
+from .emf import EmfSink, write_emf_to_stdout
+from .interface import Action, HookInvocationPoint, MetricsDestination, ProgressEvent
+from .log_delivery import ProviderLogHandler
+from .metrics import BackgroundFlusher, MetricAggregator, MetricsPublisherProxy
+from .profiling import ProfilingConfig
+from .timing import PhaseTimer
+
+
+class InstrumentedEntrypoint:  # pylint: disable=too-many-instance-attributes
+    """What :class:`Resource` and :class:`Hook` measure around their handlers:
+    phase timing, profiling, and the invocation's built-in metrics.
+    """
+
+    # where metrics written in Embedded Metric Format to the provider log go
+    _log_handler_cls: ClassVar[Type[ProviderLogHandler]] = ProviderLogHandler
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        phase_timing: bool,
+        phase_metrics: bool,
+        profiling: Optional[ProfilingConfig],
+        metrics_destination: MetricsDestination,
+        background_metrics: bool,
+        metrics_aggregator: Optional[MetricAggregator],
+        background_logs: bool,
+    ) -> None:
+        # one "Invocation timing" log line per invocation, optionally published
+        # as HandlerPhaseDuration metrics. With phase_timing off, request.timer
+        # is a no-op timer that never reads the clock
+        self.phase_timing = phase_timing
+        self.phase_metrics = phase_metrics
+        # sampled cProfile/tracemalloc reports of handler calls, configured
+        # from the environment unless given, and overridable per type through
+        # the type configuration
+        self.profiling = profiling or ProfilingConfig.from_environ()
+        # Embedded Metric Format takes the PutMetricData call off the invocation
+        self.metrics_destination = metrics_destination
+        # opt-in: PutMetricData calls are made by a thread as metrics are
+        # published, and waited for, until the deadline, before responding
+        self.background_metrics = background_metrics
+        self._metrics_flusher = BackgroundFlusher()
+        # opt-in: datums are aggregated into statistic sets across warm
+        # invocations, and sent when the aggregator says they are due
+        self.metrics_aggregator = metrics_aggregator
+        # opt-in: provider logs are sent by a thread as they are logged, and
+        # waited for, until the deadline, before responding
+        self.background_logs = background_logs
+
+    def _emf_sink(self) -> Optional[EmfSink]:
+        if self.metrics_destination == MetricsDestination.EMF_STDOUT:
+            return write_emf_to_stdout
+        if self.metrics_destination == MetricsDestination.EMF_PROVIDER_LOG:
+            return self._log_handler_cls.write_emf
+        return None
+
+    def _metrics_proxy(self) -> MetricsPublisherProxy:
+        emf_sink = self._emf_sink()
+        if self.metrics_aggregator and emf_sink is None:
+            return MetricsPublisherProxy(aggregator=self.metrics_aggregator)
+        if self.background_metrics and emf_sink is None:
+            return MetricsPublisherProxy(flusher=self._metrics_flusher)
+        return MetricsPublisherProxy(buffered=True, emf_sink=emf_sink)
+
+    def _timed_invoke(  # pylint: disable=too-many-arguments
+        self,
+        invoke: Callable[[], ProgressEvent],
+        metrics: MetricsPublisherProxy,
+        timer: PhaseTimer,
+        action: Union[Action, HookInvocationPoint],
+        type_configuration: Any,
+    ) -> ProgressEvent:
+        with timer.phase("metrics"):
+            metrics.publish_invocation_metric(datetime.utcnow(), action)
+        start_time = time.perf_counter()
+        error = None
+
+        profiling = self.profiling.with_type_configuration(type_configuration)
+        with timer.phase("handler"), profiling.profile(action.name):
+            try:
+                progress = invoke()
+            except Exception as e:  # pylint: disable=broad-except
+                error = e
+        m_secs = (time.perf_counter() - start_time) * 1000.0
+        with timer.phase("metrics"):
+            metrics.publish_duration_metric(datetime.utcnow(), action, m_secs)
+            if error:
+                metrics.publish_exception_metric(datetime.utcnow(), action, error)
+        if self.phase_timing:
+            # on the invocation timing line, so they show in production logs
+            timer.annotate(loaderCache=loader_cache_stats())
+        if error:
+            raise error
+        return progress
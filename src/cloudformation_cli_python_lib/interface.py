@@ -3,7 +3,12 @@ from dataclasses import dataclass
 
 import logging
 from enum import Enum, auto
-from typing import Any, List, Mapping, MutableMapping, Optional, Type
+from typing import TYPE_CHECKING, Any, List, Mapping, MutableMapping, Optional, Type
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .deadline import Deadline
+    from .metrics import InvocationMetrics
+    from .timing import PhaseTimer
 
 LOG = logging.getLogger(__name__)
 
@@ -40,6 +45,16 @@ class MetricTypes(str, _AutoName):
     HandlerException = auto()
     HandlerInvocationCount = auto()
     HandlerInvocationDuration = auto()
+    StabilizationPollCount = auto()
+    StabilizationLatency = auto()
+    HandlerPhaseDuration = auto()
+
+
+class MetricsDestination(str, _AutoName):
+    PUT_METRIC_DATA = auto()
+    # Embedded Metric Format, extracted by CloudWatch from the logs
+    EMF_STDOUT = auto()
+    EMF_PROVIDER_LOG = auto()
 
 
 class OperationStatus(str, _AutoName):
@@ -171,6 +186,9 @@ class BaseResourceHandlerRequest:
     region: Optional[str]
     awsPartition: Optional[str]
     stackId: Optional[str]
+    deadline: Optional["Deadline"] = None
+    metrics: Optional["InvocationMetrics"] = None
+    timer: Optional["PhaseTimer"] = None
 
 
 @dataclass
@@ -221,3 +239,6 @@ class HookContext:
 class BaseHookHandlerRequest:
     clientRequestToken: str
     hookContext: HookContext
+    deadline: Optional["Deadline"] = None
+    metrics: Optional["InvocationMetrics"] = None
+    timer: Optional["PhaseTimer"] = None
@@ -1,11 +1,101 @@
+import datetime
 import logging
+import math
+import sys
+import threading
 import time
 import uuid
-from typing import Any, Optional
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
 
 from .boto3_proxy import SessionProxy
+from .deadline import Deadline
+from .emf import write_emf_to_stdout
+from .metrics import MetricsPublisherProxy
+from .stabilization import BackoffPolicy
 from .utils import HandlerRequest, HookInvocationRequest
 
+_BEFORE_PUT_LOG_EVENTS = "before-call.cloudwatch-logs.PutLogEvents"
+_EMF_HEADER_HANDLER_ID = "cloudformation-cli-emf-header"
+
+# PutLogEvents limits: events per request, bytes per request and per event
+# (counting 26 bytes of overhead per event), and the time a request may span
+MAX_EVENTS_PER_BATCH = 10000
+MAX_BATCH_BYTES = 1048576
+MAX_EVENT_BYTES = 256 * 1024
+EVENT_OVERHEAD_BYTES = 26
+MAX_BATCH_SPAN_MILLIS = 24 * 60 * 60 * 1000
+# events waiting for the sender thread in background mode
+MAX_QUEUED_EVENTS = 10000
+# attempts at delivering a batch while CloudWatch Logs throttles requests or
+# is unavailable, and the jittered delays between them
+LOG_DELIVERY_BACKOFF = BackoffPolicy(initial_delay=0.2, max_delay=1.0, max_attempts=3)
+# delivery failures waiting to be reported as metrics
+MAX_PENDING_FAILURES = 100
+# seconds; the client's requests must fit in the invocation's deadline, so
+# they are not retried by botocore either, only by the handler
+LOGS_CONNECT_TIMEOUT = 1.0
+LOGS_READ_TIMEOUT = 5.0
+
+LogEvent = Dict[str, Any]
+
+
+def logs_client_config() -> Any:
+    """The botocore configuration of the CloudWatch Logs clients delivering
+    provider logs, also used to prime them.
+    """
+    # deferred so importing the library does not import botocore
+    # pylint: disable=import-outside-toplevel
+    from botocore.config import Config  # type: ignore
+
+    return Config(
+        connect_timeout=LOGS_CONNECT_TIMEOUT,
+        read_timeout=LOGS_READ_TIMEOUT,
+        retries={"max_attempts": 0},
+    )
+
+
+def _event_size(event: LogEvent) -> int:
+    return len(event["message"].encode("utf-8")) + EVENT_OVERHEAD_BYTES
+
+
+def _truncate(message: str) -> str:
+    encoded = message.encode("utf-8")
+    limit = MAX_EVENT_BYTES - EVENT_OVERHEAD_BYTES
+    if len(encoded) <= limit:
+        return message
+    return encoded[:limit].decode("utf-8", "ignore")
+
+
+def log_event_batches(
+    events: List[LogEvent],
+    max_events: int = MAX_EVENTS_PER_BATCH,
+    max_bytes: int = MAX_BATCH_BYTES,
+) -> Iterator[List[LogEvent]]:
+    """Sorts events chronologically and splits them into batches that fit one
+    request each.
+    """
+    batch: List[LogEvent] = []
+    size = 0
+    for event in sorted(events, key=lambda event: event["timestamp"]):
+        event_size = _event_size(event)
+        if batch and (
+            len(batch) >= max_events
+            or size + event_size > max_bytes
+            or event["timestamp"] - batch[0]["timestamp"] >= MAX_BATCH_SPAN_MILLIS
+        ):
+            yield batch
+            batch, size = [], 0
+        batch.append(event)
+        size += event_size
+    if batch:
+        yield batch
+
+
+def _add_emf_header(params: Any, **_kwargs: Any) -> None:
+    # tells CloudWatch Logs to extract metrics from the events
+    params["headers"]["x-amzn-logs-format"] = "json/emf"
+
 
 class ProviderFilter(logging.Filter):
     def __init__(self, provider: str):
@@ -16,15 +106,59 @@ class ProviderFilter(logging.Filter):
         return not record.name.startswith(self.provider)
 
 
-class ProviderLogHandler(logging.Handler):
-    def __init__(
-        self, group: str, stream: str, session: SessionProxy, *args: Any, **kwargs: Any
+class ProviderLogHandler(  # pylint: disable=too-many-instance-attributes
+    logging.Handler
+):
+    """Delivers log records to the provider log group.
+
+    Records are buffered and sent in batches: whenever a full request's worth
+    is buffered, and at the end of each invocation, within its deadline.
+
+    With ``background``, records are still formatted as they are logged, but
+    sent by a thread of its own, so the invocation never waits on CloudWatch
+    Logs but for the final :meth:`flush`. They wait in a queue of at most
+    ``max_queued`` events; when it is full the oldest are dropped, and counted
+    in ``dropped``. Embedded Metric Format documents are sent by the same
+    thread, and waited for with :meth:`drain_existing`.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        group: str,
+        stream: str,
+        session: SessionProxy,
+        *args: Any,
+        background: bool = False,
+        max_queued: int = MAX_QUEUED_EVENTS,
+        **kwargs: Any,
     ):
         super().__init__(*args, **kwargs)
         self.group = group
         self.stream = stream.replace(":", "__")
-        self.client = session.client("logs")
-        self.sequence_token = ""  # nosec
+        self.client = session.client("logs", config=logs_client_config())
+        # where delivery failures are reported, refreshed by every invocation.
+        # They are held until the next flush, so that those of the sender
+        # thread, or of the metrics flush itself, go out with the next
+        # invocation's metrics rather than into a proxy already flushed
+        self.metrics: Optional[MetricsPublisherProxy] = None
+        self._failures: Deque[Tuple[datetime.datetime, Exception]] = deque(
+            maxlen=MAX_PENDING_FAILURES
+        )
+        self._events: List[LogEvent] = []
+        self._buffered_bytes = 0
+        self.background = background
+        self._queue: Deque[LogEvent] = deque(maxlen=max_queued)
+        # EMF documents, one request's worth per put_emf() call
+        self._emf_queue: Deque[List[LogEvent]] = deque()
+        self._condition = threading.Condition()
+        self._sending = False
+        self._thread: Optional[threading.Thread] = None
+        # PutLogEvents calls are made one at a time, as the EMF header is
+        # registered on the client for the duration of one
+        self._send_lock = threading.RLock()
+        self._stream_creation: Optional[threading.Thread] = None
+        self.dropped = 0
+        self._reported_dropped = 0
 
     @classmethod
     def _get_existing_logger(cls) -> Optional["ProviderLogHandler"]:
@@ -39,6 +173,8 @@ class ProviderLogHandler(logging.Handler):
         request: HandlerRequest,
         provider_sess: Optional[SessionProxy],
         log_format: Optional[logging.Formatter] = None,
+        background: bool = False,
+        metrics: Optional[MetricsPublisherProxy] = None,
     ) -> None:
         log_group = request.requestData.providerLogGroupName
         if request.stackId and request.requestData.logicalResourceId:
@@ -51,14 +187,22 @@ class ProviderLogHandler(logging.Handler):
             if log_handler:
                 # This is a re-used lambda container, log handler is already setup, so
                 # we just refresh the client with new creds
-                log_handler.client = provider_sess.client("logs")
+                log_handler.client = provider_sess.client(
+                    "logs", config=logs_client_config()
+                )
+                log_handler.metrics = metrics
                 return
 
             # filter provider messages from platform
             provider = request.resourceType.replace("::", "_").lower()
             log_handler = cls(
-                group=log_group, stream=stream_name, session=provider_sess
+                group=log_group,
+                stream=stream_name,
+                session=provider_sess,
+                background=background,
             )
+            log_handler.metrics = metrics
+            log_handler.create_stream_eagerly()
 
             if log_format:
                 log_handler.setFormatter(log_format)
@@ -81,35 +225,262 @@ class ProviderLogHandler(logging.Handler):
         except self.client.exceptions.ResourceAlreadyExistsException:
             pass
 
-    def _put_log_event(self, msg: logging.LogRecord) -> None:
-        kwargs = {
-            "logGroupName": self.group,
-            "logStreamName": self.stream,
-            "logEvents": [
-                {"timestamp": round(time.time() * 1000), "message": self.format(msg)}
-            ],
-        }
-        if self.sequence_token:
-            kwargs["sequenceToken"] = self.sequence_token
+    def create_stream_eagerly(self) -> None:
+        """Creates the log group and stream from a thread of its own, so they
+        most likely exist by the time the first records are sent, which then
+        does not have to find out that they do not.
+        """
+        self._stream_creation = threading.Thread(
+            target=self._create_stream, name="log-stream-creation", daemon=True
+        )
+        self._stream_creation.start()
+
+    def _create_stream(self) -> None:
         try:
-            self.sequence_token = self.client.put_log_events(**kwargs)[
-                "nextSequenceToken"
-            ]
-        except (
-            self.client.exceptions.DataAlreadyAcceptedException,
-            self.client.exceptions.InvalidSequenceTokenException,
-        ) as e:
-            self.sequence_token = str(e).rsplit(" ", maxsplit=1)[-1]
-            self._put_log_event(msg)
+            try:
+                self._create_log_stream()
+            except self.client.exceptions.ResourceNotFoundException:
+                self._create_log_group()
+                self._create_log_stream()
+        except Exception as e:  # pylint: disable=broad-except
+            # sending the records creates them if need be
+            print(f"Could not create the provider log stream: {e}", file=sys.stderr)
 
-    def emit(self, record: logging.LogRecord) -> None:
+    def _put_events(self, events: List[LogEvent]) -> None:
+        self.client.put_log_events(
+            logGroupName=self.group, logStreamName=self.stream, logEvents=events
+        )
+
+    def _deliver(self, events: List[LogEvent], deadline: Optional[Deadline]) -> None:
+        if self._stream_creation:
+            # at most until the deadline; if the stream is not there yet, the
+            # request below finds out
+            timeout = deadline.remaining() if deadline else None
+            self._stream_creation.join(None if timeout is None else max(timeout, 0.0))
         try:
-            self._put_log_event(record)
+            self._put_events(events)
         except self.client.exceptions.ResourceNotFoundException as e:
+            # the stream could not be created eagerly, or was deleted since
             if "log group does not exist" in str(e):
                 self._create_log_group()
             self._create_log_stream()
-            self._put_log_event(record)
+            self._put_events(events)
+
+    def _send(
+        self, events: List[LogEvent], deadline: Optional[Deadline] = None
+    ) -> None:
+        """Delivers one batch, retrying it a bounded number of times, with
+        jittered backoff and within the deadline, while CloudWatch Logs
+        throttles requests or is unavailable.
+
+        A batch that cannot be delivered is reported as a log delivery
+        exception metric, once; attempts retried successfully are not.
+        """
+        retryable = (
+            self.client.exceptions.ThrottlingException,
+            self.client.exceptions.ServiceUnavailableException,
+        )
+        attempt = 1
+        while True:
+            try:
+                self._deliver(events, deadline)
+                return
+            except Exception as e:  # pylint: disable=broad-except
+                delay = LOG_DELIVERY_BACKOFF.delay(attempt)
+                if (
+                    not isinstance(e, retryable)
+                    or attempt >= LOG_DELIVERY_BACKOFF.max_attempts
+                    or (deadline and deadline.remaining() < delay)
+                ):
+                    self._report_failure(e)
+                    raise
+            attempt += 1
+            time.sleep(delay)
+
+    def _report_failure(self, error: Exception) -> None:
+        self._failures.append((datetime.datetime.utcnow(), error))
+
+    def _publish_failures(self) -> None:
+        if not self.metrics:
+            return
+        while self._failures:
+            timestamp, error = self._failures.popleft()
+            self.metrics.publish_log_delivery_exception_metric(timestamp, error)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        event = {
+            "timestamp": round(record.created * 1000),
+            "message": _truncate(self.format(record)),
+        }
+        if self.background:
+            self._enqueue(event)
+            return
+        self._events.append(event)
+        self._buffered_bytes += _event_size(event)
+        if (
+            len(self._events) >= MAX_EVENTS_PER_BATCH
+            or self._buffered_bytes >= MAX_BATCH_BYTES
+        ):
+            self.flush()
+
+    def flush(self, deadline: Optional[Deadline] = None) -> None:
+        """Sends the buffered records, as long as the deadline allows.
+
+        Records left when the deadline passes stay buffered for the next
+        flush. Never raises: batches that cannot be sent are dropped, and the
+        error printed to the function's own log. Delivery failures since the
+        last flush are then published to the invocation's metrics.
+        """
+        if self.background:
+            self._drain(deadline)
+        else:
+            self._send_buffered(deadline)
+        self._publish_failures()
+
+    def _send_buffered(self, deadline: Optional[Deadline]) -> None:
+        self.acquire()
+        try:
+            events, self._events, self._buffered_bytes = self._events, [], 0
+            batches = list(log_event_batches(events))
+            for index, batch in enumerate(batches):
+                if deadline and deadline.expired():
+                    for left in batches[index:]:
+                        self._events.extend(left)
+                    self._buffered_bytes = sum(map(_event_size, self._events))
+                    return
+                self._send_batch(batch, deadline)
+        finally:
+            self.release()
+
+    def _send_batch(
+        self, batch: List[LogEvent], deadline: Optional[Deadline] = None
+    ) -> None:
+        try:
+            with self._send_lock:
+                self._send(batch, deadline)
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"Could not deliver provider logs: {e}", file=sys.stderr)
+
+    def _enqueue(self, event: LogEvent) -> None:
+        with self._condition:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(event)
+            self._wake_sender()
+
+    def _wake_sender(self) -> None:
+        # called holding the condition
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="log-sender", daemon=True
+            )
+            self._thread.start()
+        self._condition.notify_all()
+
+    def _drain(self, deadline: Optional[Deadline]) -> None:
+        # waits for the sender thread, as Lambda freezes it with the container;
+        # this handler's own records cannot be logged, so problems are printed
+        timeout = deadline.remaining() if deadline else math.inf
+        with self._condition:
+            drained = self._condition.wait_for(
+                self._idle, None if math.isinf(timeout) else max(timeout, 0.0)
+            )
+            pending = len(self._queue) + sum(map(len, self._emf_queue))
+            dropped = self.dropped - self._reported_dropped
+            self._reported_dropped = self.dropped
+        if dropped:
+            print(
+                f"Dropped {dropped} provider log events, the queue was full",
+                file=sys.stderr,
+            )
+        if not drained:
+            print(
+                f"Provider logs not sent by the deadline, {pending} events queued",
+                file=sys.stderr,
+            )
+
+    def _idle(self) -> bool:
+        return not self._queue and not self._emf_queue and not self._sending
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or self._emf_queue)
+                events = list(self._queue)
+                self._queue.clear()
+                emf_requests = list(self._emf_queue)
+                self._emf_queue.clear()
+                self._sending = True
+            for batch in log_event_batches(events):
+                self._send_batch(batch)
+            for emf_events in emf_requests:
+                try:
+                    self._send_emf(emf_events)
+                except Exception as e:  # pylint: disable=broad-except
+                    print(f"Could not deliver provider metrics: {e}", file=sys.stderr)
+            with self._condition:
+                self._sending = False
+                self._condition.notify_all()
+
+    @classmethod
+    def flush_existing(cls, deadline: Optional[Deadline] = None) -> None:
+        """Flushes the log handler set up for the provider, if any."""
+        handler = cls._get_existing_logger()
+        if handler:
+            handler.flush(deadline)
+
+    @classmethod
+    def drain_existing(cls, deadline: Optional[Deadline] = None) -> None:
+        """Waits, until the deadline, for the sender thread of the log handler
+        set up for the provider, if any, to send what was queued after its
+        flush, i.e. the metrics written to it in Embedded Metric Format.
+        """
+        handler = cls._get_existing_logger()
+        if handler and handler.background:
+            handler._drain(deadline)  # pylint: disable=protected-access
+
+    def put_emf(self, documents: List[str]) -> None:
+        """Writes Embedded Metric Format documents to the log stream, marked
+        for CloudWatch to extract the metrics from.
+
+        With ``background``, they are queued for the sender thread instead.
+        """
+        timestamp = round(time.time() * 1000)
+        events = [
+            {"timestamp": timestamp, "message": document} for document in documents
+        ]
+        if self.background:
+            with self._condition:
+                self._emf_queue.append(events)
+                self._wake_sender()
+            return
+        self._send_emf(events)
+
+    def _send_emf(self, events: List[LogEvent]) -> None:
+        client_events = self.client.meta.events
+        with self._send_lock:
+            client_events.register_first(
+                _BEFORE_PUT_LOG_EVENTS,
+                _add_emf_header,
+                unique_id=_EMF_HEADER_HANDLER_ID,
+            )
+            try:
+                self._send(events)
+            finally:
+                client_events.unregister(
+                    _BEFORE_PUT_LOG_EVENTS, unique_id=_EMF_HEADER_HANDLER_ID
+                )
+
+    @classmethod
+    def write_emf(cls, documents: List[str]) -> None:
+        """An Embedded Metric Format sink writing to the provider log stream,
+        or to stdout if log delivery is not set up.
+        """
+        handler = cls._get_existing_logger()
+        if handler:
+            handler.put_emf(documents)
+        else:
+            write_emf_to_stdout(documents)
 
 
 class HookProviderLogHandler(ProviderLogHandler):
@@ -126,6 +497,8 @@ class HookProviderLogHandler(ProviderLogHandler):
         request: HookInvocationRequest,
         provider_sess: Optional[SessionProxy],
         log_format: Optional[logging.Formatter] = None,
+        background: bool = False,
+        metrics: Optional[MetricsPublisherProxy] = None,
     ) -> None:
         log_group = request.requestData.providerLogGroupName
         if request.stackId and request.requestData.targetLogicalId:
@@ -138,15 +511,23 @@ class HookProviderLogHandler(ProviderLogHandler):
             if log_handler:
                 # This is a re-used lambda container, log handler is already setup, so
                 # we just refresh the client with new creds
-                log_handler.client = provider_sess.client("logs")
+                log_handler.client = provider_sess.client(
+                    "logs", config=logs_client_config()
+                )
+                log_handler.metrics = metrics
                 return
 
             # filter provider messages from platform
             provider = request.hookTypeName.replace("::", "_").lower()
             logging.getLogger().handlers[0].addFilter(ProviderFilter(provider))
             log_handler = cls(
-                group=log_group, stream=stream_name, session=provider_sess
+                group=log_group,
+                stream=stream_name,
+                session=provider_sess,
+                background=background,
             )
+            log_handler.metrics = metrics
+            log_handler.create_stream_eagerly()
 
             if log_format:
                 log_handler.setFormatter(log_format)
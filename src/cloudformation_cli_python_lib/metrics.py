@@ -1,21 +1,126 @@
 import datetime
+import json
 import logging
-from botocore.exceptions import ClientError  # type: ignore
-from typing import Any, List, Mapping, Optional, Union
+import math
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from .boto3_proxy import SessionProxy
+from .circuit_breaker import CircuitBreaker
+from .deadline import Deadline
+from .emf import EmfSink, emf_documents
 from .interface import Action, HookInvocationPoint, MetricTypes, StandardUnit
+from .shutdown import on_shutdown
 
 LOG = logging.getLogger(__name__)
 
 METRIC_NAMESPACE_ROOT = "AWS/CloudFormation"
 
+# PutMetricData takes at most 1000 datums and 1 MB per request. Batches are
+# sized on the datums' JSON encoding, so half the limit leaves room for the
+# wire encoding
+MAX_DATUMS_PER_REQUEST = 1000
+MAX_REQUEST_BYTES = 512 * 1024
+# datums waiting for the background flusher, beyond which the oldest are dropped
+MAX_QUEUED_DATUMS = 1000
+# aggregated statistics are sent once they are this old, or cover this many
+# datums
+DEFAULT_AGGREGATION_SECONDS = 60.0
+DEFAULT_AGGREGATION_SAMPLES = 1000
+# histogram buckets are a sixteenth of a doubling wide, so the value sent for a
+# bucket is within 2.2% of every value counted in it. A datum carries at most
+# 150 distinct values
+HISTOGRAM_BUCKETS_PER_DOUBLING = 16
+MAX_HISTOGRAM_VALUES = 150
+# seconds a PutMetricData call may take to connect, and to answer
+METRICS_CONNECT_TIMEOUT = 1.0
+METRICS_READ_TIMEOUT = 2.0
+# pauses PutMetricData for all the invocations of the container
+METRICS_CIRCUIT_BREAKER = CircuitBreaker("metrics publishing")
+
 
 def format_dimensions(dimensions: Mapping[str, str]) -> List[Mapping[str, str]]:
     return [{"Name": key, "Value": value} for key, value in dimensions.items()]
 
 
-class MetricsPublisher:
+def batch_metric_data(
+    datums: List[Dict[str, Any]],
+    max_datums: int = MAX_DATUMS_PER_REQUEST,
+    max_bytes: int = MAX_REQUEST_BYTES,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Splits datums, in order, into batches that fit one request each."""
+    batch: List[Dict[str, Any]] = []
+    size = 0
+    for datum in datums:
+        datum_size = len(json.dumps(datum))
+        if batch and (len(batch) >= max_datums or size + datum_size > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(datum)
+        size += datum_size
+    if batch:
+        yield batch
+
+
+def histogram_bucket(value: float) -> float:
+    """The value sent for the log-scale histogram bucket ``value`` falls in."""
+    if value <= 0:
+        return 0.0
+    index = math.floor(math.log2(value) * HISTOGRAM_BUCKETS_PER_DOUBLING)
+    # the bucket's geometric midpoint
+    return round(2 ** ((index + 0.5) / HISTOGRAM_BUCKETS_PER_DOUBLING), 3)
+
+
+def histogram_datums(aggregate: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Turns an aggregate's ``Histogram`` into ``Values``/``Counts`` datums."""
+    histogram = aggregate["Histogram"]
+    datum = {name: item for name, item in aggregate.items() if name != "Histogram"}
+    values = sorted(histogram)
+    datums = []
+    for start in range(0, len(values), MAX_HISTOGRAM_VALUES):
+        chunk = values[start:][:MAX_HISTOGRAM_VALUES]
+        datums.append(
+            {**datum, "Values": chunk, "Counts": [histogram[v] for v in chunk]}
+        )
+    return datums
+
+
+def metrics_client_config(
+    connect_timeout: float = METRICS_CONNECT_TIMEOUT,
+    read_timeout: float = METRICS_READ_TIMEOUT,
+) -> Any:
+    """The botocore configuration of the CloudWatch clients publishing metrics,
+    also used to prime them.
+
+    Metrics are not worth holding the invocation up for: a request that fails
+    is dropped rather than retried.
+    """
+    # deferred so importing the library does not import botocore
+    # pylint: disable=import-outside-toplevel
+    from botocore.config import Config  # type: ignore
+
+    return Config(
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        retries={"max_attempts": 0},
+    )
+
+
+class MetricsPublisher:  # pylint: disable=too-many-instance-attributes
     """A cloudwatch based metric publisher.\
     Given a resource type and session, \
     this publisher will publish metrics to CloudWatch.\
@@ -32,37 +137,115 @@ class MetricsPublisher:
     publish_duration_metric: Publishes an duration metric
 
     publish_log_delivery_exception_metric: Publishes an log delivery exception metric
+
+    flush: Sends the datums held back by a buffered publisher
+
+    With an ``emf_sink``, metrics are written to it in Embedded Metric Format
+    instead of being sent with PutMetricData. With a ``flusher``, they are
+    sent by its thread, and with an ``aggregator``, as statistic sets.
     """
 
-    def __init__(self, session: SessionProxy, resource_type: str) -> None:
-        self._client = session.client("cloudwatch")
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        session: SessionProxy,
+        resource_type: str,
+        *,
+        buffered: bool = False,
+        emf_sink: Optional[EmfSink] = None,
+        flusher: Optional["BackgroundFlusher"] = None,
+        aggregator: Optional["MetricAggregator"] = None,
+        connect_timeout: float = METRICS_CONNECT_TIMEOUT,
+        read_timeout: float = METRICS_READ_TIMEOUT,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self._session = session
+        self._cloudwatch: Any = None
         self._resource_type = resource_type
         self._namespace = self._make_namespace(self._resource_type)
+        # a buffered publisher holds datums back until flush()
+        self._buffer: Optional[List[Dict[str, Any]]] = [] if buffered else None
+        self._emf_sink = emf_sink
+        self._flusher = flusher
+        self._aggregator = aggregator
+        self._timeouts = (connect_timeout, read_timeout)
+        self._circuit_breaker = circuit_breaker
+
+    @property
+    def _client(self) -> Any:
+        # created on first publish, so the session is only forced when needed
+        if self._cloudwatch is None:
+            config = metrics_client_config(*self._timeouts)
+            self._cloudwatch = self._session.client("cloudwatch", config=config)
+        return self._cloudwatch
 
     def publish_metric(  # pylint: disable-msg=too-many-arguments
         self,
-        metric_name: MetricTypes,
+        metric_name: Union[MetricTypes, str],
         dimensions: Mapping[str, str],
         unit: StandardUnit,
         value: float,
         timestamp: datetime.datetime,
     ) -> None:
+        # custom metrics are named by the handler
+        if isinstance(metric_name, MetricTypes):
+            metric_name = metric_name.name
+        datum = {
+            "MetricName": metric_name,
+            "Dimensions": format_dimensions(dimensions),
+            "Unit": unit.name,
+            "Timestamp": str(timestamp),
+            "Value": value,
+        }
+        if self._buffer is not None:
+            self._buffer.append(datum)
+        elif self._aggregator is not None:
+            self._aggregator.add(self, datum)
+        elif self._flusher is not None:
+            if self._emf_sink is None:
+                # boto3 sessions are not thread-safe, so the client is made
+                # here rather than on the flusher's thread
+                _ = self._client
+            self._flusher.submit(self, datum)
+        else:
+            self._put_metric_data([datum])
+
+    def flush(self) -> None:
+        """Sends the buffered datums, in as few requests as the limits allow.
+
+        Never raises: datums that cannot be sent are logged and dropped.
+        """
+        if not self._buffer:
+            return
+        datums, self._buffer = self._buffer, []
         try:
-            self._client.put_metric_data(
-                Namespace=self._namespace,
-                MetricData=[
-                    {
-                        "MetricName": metric_name.name,
-                        "Dimensions": format_dimensions(dimensions),
-                        "Unit": unit.name,
-                        "Timestamp": str(timestamp),
-                        "Value": value,
-                    }
-                ],
-            )
-
-        except ClientError as e:
+            for batch in batch_metric_data(datums):
+                self._put_metric_data(batch)
+        except Exception as e:  # pylint: disable=broad-except
+            LOG.error("An error occurred while flushing metrics: %s", str(e))
+
+    def _put_metric_data(self, datums: List[Dict[str, Any]]) -> None:
+        if self._emf_sink:
+            try:
+                self._emf_sink(emf_documents(self._namespace, datums))
+            except Exception as e:  # pylint: disable=broad-except
+                LOG.error("An error occurred while publishing metrics: %s", str(e))
+            return
+        # deferred so importing the library does not import botocore
+        # pylint: disable=import-outside-toplevel
+        from botocore.exceptions import BotoCoreError, ClientError  # type: ignore
+
+        breaker = self._circuit_breaker
+        if breaker and not breaker.allow(len(datums)):
+            return
+        try:
+            self._client.put_metric_data(Namespace=self._namespace, MetricData=datums)
+        except (BotoCoreError, ClientError) as e:
             LOG.error("An error occurred while publishing metrics: %s", str(e))
+            if breaker:
+                breaker.record(succeeded=False)
+        else:
+            if breaker:
+                breaker.record(succeeded=True)
 
     def publish_exception_metric(
         self, timestamp: datetime.datetime, action: Action, error: Any
@@ -127,6 +310,90 @@ class MetricsPublisher:
             timestamp=timestamp,
         )
 
+    def publish_stabilization_metrics(
+        self,
+        timestamp: datetime.datetime,
+        action: Action,
+        polls: int,
+        milliseconds: float,
+    ) -> None:
+        dimensions = {
+            "DimensionKeyActionType": action.name,
+            "DimensionKeyResourceType": self._resource_type,
+        }
+        self._publish_stabilization_metrics(timestamp, dimensions, polls, milliseconds)
+
+    def _publish_stabilization_metrics(
+        self,
+        timestamp: datetime.datetime,
+        dimensions: Mapping[str, str],
+        polls: int,
+        milliseconds: float,
+    ) -> None:
+        self.publish_metric(
+            metric_name=MetricTypes.StabilizationPollCount,
+            dimensions=dimensions,
+            unit=StandardUnit.Count,
+            value=float(polls),
+            timestamp=timestamp,
+        )
+        self.publish_metric(
+            metric_name=MetricTypes.StabilizationLatency,
+            dimensions=dimensions,
+            unit=StandardUnit.Milliseconds,
+            value=milliseconds,
+            timestamp=timestamp,
+        )
+
+    def publish_phase_metrics(
+        self,
+        timestamp: datetime.datetime,
+        action: Action,
+        phases: Mapping[str, float],
+    ) -> None:
+        dimensions = {
+            "DimensionKeyActionType": action.name,
+            "DimensionKeyResourceType": self._resource_type,
+        }
+        self._publish_phase_metrics(timestamp, dimensions, phases)
+
+    def _publish_phase_metrics(
+        self,
+        timestamp: datetime.datetime,
+        dimensions: Mapping[str, str],
+        phases: Mapping[str, float],
+    ) -> None:
+        for phase, milliseconds in phases.items():
+            self.publish_metric(
+                metric_name=MetricTypes.HandlerPhaseDuration,
+                dimensions={**dimensions, "DimensionKeyPhase": phase},
+                unit=StandardUnit.Milliseconds,
+                value=milliseconds,
+                timestamp=timestamp,
+            )
+
+    def publish_custom_metric(  # pylint: disable=too-many-arguments
+        self,
+        timestamp: datetime.datetime,
+        action: Action,
+        name: str,
+        *,
+        unit: StandardUnit,
+        value: float,
+        dimensions: Mapping[str, str],
+    ) -> None:
+        self.publish_metric(
+            metric_name=name,
+            dimensions={
+                "DimensionKeyActionType": action.name,
+                "DimensionKeyResourceType": self._resource_type,
+                **dimensions,
+            },
+            unit=unit,
+            value=value,
+            timestamp=timestamp,
+        )
+
     @staticmethod
     def _make_namespace(resource_type: str) -> str:
         suffix = resource_type.replace("::", "/")
@@ -134,8 +401,31 @@ class MetricsPublisher:
 
 
 class HookMetricsPublisher(MetricsPublisher):
-    def __init__(self, session: SessionProxy, hook_type: str, account_id: str) -> None:
-        super().__init__(session, hook_type)
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        session: SessionProxy,
+        hook_type: str,
+        account_id: str,
+        *,
+        buffered: bool = False,
+        emf_sink: Optional[EmfSink] = None,
+        flusher: Optional["BackgroundFlusher"] = None,
+        aggregator: Optional["MetricAggregator"] = None,
+        connect_timeout: float = METRICS_CONNECT_TIMEOUT,
+        read_timeout: float = METRICS_READ_TIMEOUT,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        super().__init__(
+            session,
+            hook_type,
+            buffered=buffered,
+            emf_sink=emf_sink,
+            flusher=flusher,
+            aggregator=aggregator,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            circuit_breaker=circuit_breaker,
+        )
         self._hook_type = hook_type
         self._account_id = account_id
         self._namespace = self._make_hook_namespace(hook_type, account_id)
@@ -212,12 +502,258 @@ class HookMetricsPublisher(MetricsPublisher):
             timestamp=timestamp,
         )
 
+    # pylint: disable=arguments-differ,arguments-renamed
+    def publish_stabilization_metrics(  # type: ignore
+        self,
+        timestamp: datetime.datetime,
+        invocation_point: HookInvocationPoint,
+        polls: int,
+        milliseconds: float,
+    ) -> None:
+        dimensions = {
+            "DimensionKeyInvocationPointType": invocation_point.name,
+            "DimensionKeyHookType": self._hook_type,
+        }
+        self._publish_stabilization_metrics(timestamp, dimensions, polls, milliseconds)
+
+    # pylint: disable=arguments-differ,arguments-renamed
+    def publish_phase_metrics(  # type: ignore
+        self,
+        timestamp: datetime.datetime,
+        invocation_point: HookInvocationPoint,
+        phases: Mapping[str, float],
+    ) -> None:
+        dimensions = {
+            "DimensionKeyInvocationPointType": invocation_point.name,
+            "DimensionKeyHookType": self._hook_type,
+        }
+        self._publish_phase_metrics(timestamp, dimensions, phases)
+
+    # pylint: disable=arguments-differ,arguments-renamed,too-many-arguments
+    def publish_custom_metric(  # type: ignore
+        self,
+        timestamp: datetime.datetime,
+        invocation_point: HookInvocationPoint,
+        name: str,
+        *,
+        unit: StandardUnit,
+        value: float,
+        dimensions: Mapping[str, str],
+    ) -> None:
+        self.publish_metric(
+            metric_name=name,
+            dimensions={
+                "DimensionKeyInvocationPointType": invocation_point.name,
+                "DimensionKeyHookType": self._hook_type,
+                **dimensions,
+            },
+            unit=unit,
+            value=value,
+            timestamp=timestamp,
+        )
+
     @staticmethod
     def _make_hook_namespace(hook_type: str, account_id: str) -> str:
         suffix = hook_type.replace("::", "/")
         return f"{METRIC_NAMESPACE_ROOT}/{account_id}/{suffix}"
 
 
+class BackgroundFlusher:
+    """Sends datums with PutMetricData from a thread of its own, so publishing
+    never waits on CloudWatch.
+
+    Datums wait in a queue of at most ``max_queued`` entries; when it is full
+    the oldest are dropped, and counted in ``dropped``. Whatever is queued
+    when the thread wakes up is sent together, in as few requests as the
+    limits allow. :meth:`drain` waits for the queue to empty before the
+    response is returned, as Lambda freezes the thread along with the
+    container.
+    """
+
+    def __init__(self, max_queued: int = MAX_QUEUED_DATUMS) -> None:
+        self._queue: Deque[Tuple[MetricsPublisher, Dict[str, Any]]] = deque(
+            maxlen=max_queued
+        )
+        self._condition = threading.Condition()
+        self._sending = False
+        self._thread: Optional[threading.Thread] = None
+        self.dropped = 0
+        self._reported_dropped = 0
+
+    def submit(self, publisher: MetricsPublisher, datum: Dict[str, Any]) -> None:
+        with self._condition:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append((publisher, datum))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="metrics-flusher", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify_all()
+
+    def drain(self, deadline: Optional[Deadline] = None) -> bool:
+        """Waits, until the deadline at most, for the queued datums to be sent.
+
+        Returns whether they were; those that were not stay queued.
+        """
+        timeout = deadline.remaining() if deadline else math.inf
+        with self._condition:
+            drained = self._condition.wait_for(
+                self._idle, None if math.isinf(timeout) else max(timeout, 0.0)
+            )
+            pending = len(self._queue)
+            dropped = self.dropped - self._reported_dropped
+            self._reported_dropped = self.dropped
+        if dropped:
+            LOG.warning("Dropped %d metric datums, the metrics queue was full", dropped)
+        if not drained:
+            LOG.warning("Metrics not sent by the deadline, %d datums queued", pending)
+        return drained
+
+    def _idle(self) -> bool:
+        return not self._queue and not self._sending
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue)
+                queued = list(self._queue)
+                self._queue.clear()
+                self._sending = True
+            self._send(queued)
+            with self._condition:
+                self._sending = False
+                self._condition.notify_all()
+
+    @staticmethod
+    def _send(queued: List[Tuple[MetricsPublisher, Dict[str, Any]]]) -> None:
+        by_publisher: Dict[MetricsPublisher, List[Dict[str, Any]]] = {}
+        for publisher, datum in queued:
+            by_publisher.setdefault(publisher, []).append(datum)
+        for publisher, datums in by_publisher.items():
+            try:
+                for batch in batch_metric_data(datums):
+                    publisher._put_metric_data(  # pylint: disable=protected-access
+                        batch
+                    )
+            except Exception as e:  # pylint: disable=broad-except
+                LOG.error("An error occurred while flushing metrics: %s", str(e))
+
+
+class MetricAggregator:  # pylint: disable=too-many-instance-attributes
+    """Aggregates datums into statistic sets across the invocations of a warm
+    container, so a busy provider sends one datum per metric, dimensions and
+    unit rather than one per invocation.
+
+    With ``histograms``, durations are counted in log-scale histograms instead,
+    sent as ``Values`` and ``Counts``, which keeps their percentiles.
+
+    Aggregates are sent once ``max_samples`` datums have been added, or the
+    oldest of them is ``max_age`` seconds old. Both are checked as invocations
+    end, since Lambda freezes the container in between. What is left is sent
+    when the container shuts down, but Lambda only says so (with SIGTERM) to
+    functions with an extension registered: otherwise the last window of
+    aggregates is lost when the container is recycled. Statistic sets have no
+    Embedded Metric Format equivalent, so aggregation only applies to
+    PutMetricData.
+    """
+
+    def __init__(
+        self,
+        max_age: float = DEFAULT_AGGREGATION_SECONDS,
+        max_samples: int = DEFAULT_AGGREGATION_SAMPLES,
+        histograms: bool = False,
+    ) -> None:
+        self.max_age = max_age
+        self.max_samples = max_samples
+        self.histograms = histograms
+        self._lock = threading.Lock()
+        self._aggregates: Dict[Tuple[str, str, Hashable, str], Dict[str, Any]] = {}
+        # the latest publisher of each namespace sends its aggregates, so they
+        # go out with the freshest credentials
+        self._publishers: Dict[str, MetricsPublisher] = {}
+        self._samples = 0
+        self._oldest = 0.0
+        on_shutdown(self.flush)
+
+    def add(self, publisher: MetricsPublisher, datum: Dict[str, Any]) -> None:
+        namespace = publisher._namespace  # pylint: disable=protected-access
+        dimensions = tuple((d["Name"], d["Value"]) for d in datum["Dimensions"])
+        key = (namespace, datum["MetricName"], dimensions, datum["Unit"])
+        value = datum["Value"]
+        with self._lock:
+            if not self._samples:
+                self._oldest = time.monotonic()
+            self._samples += 1
+            self._publishers[namespace] = publisher
+            aggregate = self._aggregates.get(key)
+            if aggregate is None:
+                aggregate = {
+                    name: item for name, item in datum.items() if name != "Value"
+                }
+                self._aggregates[key] = aggregate
+            if self.histograms and datum["Unit"] == StandardUnit.Milliseconds.name:
+                histogram = aggregate.setdefault("Histogram", {})
+                bucket = histogram_bucket(value)
+                histogram[bucket] = histogram.get(bucket, 0.0) + 1.0
+            else:
+                self._add_statistic(aggregate, value)
+
+    @staticmethod
+    def _add_statistic(aggregate: Dict[str, Any], value: float) -> None:
+        statistics = aggregate.get("StatisticValues")
+        if statistics is None:
+            aggregate["StatisticValues"] = {
+                "SampleCount": 1.0,
+                "Sum": value,
+                "Minimum": value,
+                "Maximum": value,
+            }
+            return
+        statistics["SampleCount"] += 1.0
+        statistics["Sum"] += value
+        statistics["Minimum"] = min(statistics["Minimum"], value)
+        statistics["Maximum"] = max(statistics["Maximum"], value)
+
+    def due(self) -> bool:
+        with self._lock:
+            if not self._samples:
+                return False
+            age = time.monotonic() - self._oldest
+            return self._samples >= self.max_samples or age >= self.max_age
+
+    def flush_if_due(self) -> None:
+        if self.due():
+            self.flush()
+
+    def flush(self) -> None:
+        """Sends the aggregates, each timestamped with its first datum.
+
+        Never raises: aggregates that cannot be sent are logged and dropped.
+        """
+        with self._lock:
+            aggregates, self._aggregates = self._aggregates, {}
+            publishers, self._publishers = self._publishers, {}
+            self._samples = 0
+        by_namespace: Dict[str, List[Dict[str, Any]]] = {}
+        for (namespace, *_), aggregate in aggregates.items():
+            datums = by_namespace.setdefault(namespace, [])
+            if "Histogram" in aggregate:
+                datums.extend(histogram_datums(aggregate))
+            else:
+                datums.append(aggregate)
+        for namespace, datums in by_namespace.items():
+            publisher = publishers[namespace]
+            try:
+                for batch in batch_metric_data(datums):
+                    publisher._put_metric_data(  # pylint: disable=protected-access
+                        batch
+                    )
+            except Exception as e:  # pylint: disable=broad-except
+                LOG.error("An error occurred while flushing metrics: %s", str(e))
+
+
 class MetricsPublisherProxy:
     """A proxy for publishing metrics to multiple publishers. \
     Iterates over available publishers and publishes.
@@ -236,16 +772,45 @@ class MetricsPublisherProxy:
 
     publish_log_delivery_exception_metric: \
      Publishes a log delivery exception metric to the list of publishers
+
+    flush: Sends what the publishers have buffered, waits for the flusher and
+    sends the aggregates if they are due
     """
 
-    def __init__(self) -> None:
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        buffered: bool = False,
+        emf_sink: Optional[EmfSink] = None,
+        flusher: Optional[BackgroundFlusher] = None,
+        aggregator: Optional[MetricAggregator] = None,
+        *,
+        connect_timeout: float = METRICS_CONNECT_TIMEOUT,
+        read_timeout: float = METRICS_READ_TIMEOUT,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
         self._publishers: List[MetricsPublisher] = []
+        # whether the publishers added hold their datums back until flush(),
+        # where they write Embedded Metric Format, if they do, the background
+        # flusher sending, or aggregator holding, their datums, and how their
+        # PutMetricData calls are bounded. The circuit breaker is the
+        # container's unless given
+        self._flusher = flusher
+        self._aggregator = aggregator
+        self._options: Dict[str, Any] = {
+            "buffered": buffered,
+            "emf_sink": emf_sink,
+            "flusher": flusher,
+            "aggregator": aggregator,
+            "connect_timeout": connect_timeout,
+            "read_timeout": read_timeout,
+            "circuit_breaker": circuit_breaker or METRICS_CIRCUIT_BREAKER,
+        }
 
     def add_metrics_publisher(
         self, session: Optional[SessionProxy], type_name: Optional[str]
     ) -> None:
         if session and type_name:
-            publisher = MetricsPublisher(session, type_name)
+            publisher = MetricsPublisher(session, type_name, **self._options)
             self._publishers.append(publisher)
 
     def add_hook_metrics_publisher(
@@ -255,7 +820,9 @@ class MetricsPublisherProxy:
         account_id: Optional[str],
     ) -> None:
         if session and type_name and account_id:
-            publisher = HookMetricsPublisher(session, type_name, account_id)
+            publisher = HookMetricsPublisher(
+                session, type_name, account_id, **self._options
+            )
             self._publishers.append(publisher)
 
     def publish_exception_metric(
@@ -290,3 +857,130 @@ class MetricsPublisherProxy:
     ) -> None:
         for publisher in self._publishers:
             publisher.publish_log_delivery_exception_metric(timestamp, error)
+
+    def publish_stabilization_metrics(
+        self,
+        timestamp: datetime.datetime,
+        action: Union[Action, HookInvocationPoint],
+        polls: int,
+        milliseconds: float,
+    ) -> None:
+        for publisher in self._publishers:
+            publisher.publish_stabilization_metrics(
+                timestamp, action, polls, milliseconds  # type: ignore
+            )
+
+    def publish_phase_metrics(
+        self,
+        timestamp: datetime.datetime,
+        action: Union[Action, HookInvocationPoint],
+        phases: Mapping[str, float],
+    ) -> None:
+        for publisher in self._publishers:
+            publisher.publish_phase_metrics(timestamp, action, phases)  # type: ignore
+
+    def publish_custom_metric(  # pylint: disable=too-many-arguments
+        self,
+        timestamp: datetime.datetime,
+        action: Union[Action, HookInvocationPoint],
+        name: str,
+        *,
+        unit: StandardUnit,
+        value: float,
+        dimensions: Mapping[str, str],
+    ) -> None:
+        for publisher in self._publishers:
+            publisher.publish_custom_metric(
+                timestamp,
+                action,  # type: ignore
+                name,
+                unit=unit,
+                value=value,
+                dimensions=dimensions,
+            )
+
+    def flush(self, deadline: Optional[Deadline] = None) -> None:
+        for publisher in self._publishers:
+            publisher.flush()
+        if self._flusher:
+            self._flusher.drain(deadline)
+        if self._aggregator:
+            self._aggregator.flush_if_due()
+
+
+# the buffered metrics of the invocation in progress. The entrypoint defers
+# their flush to the wrapper serializing its response, which flushes them once
+# everything, phase metrics included, has been published
+_DEFERRED: ContextVar[Optional[MetricsPublisherProxy]] = ContextVar(
+    "deferred_metrics", default=None
+)
+
+
+def defer_flush(proxy: MetricsPublisherProxy) -> None:
+    _DEFERRED.set(proxy)
+
+
+def flush_deferred(deadline: Optional[Deadline] = None) -> None:
+    proxy = _DEFERRED.get()
+    _DEFERRED.set(None)
+    if proxy:
+        proxy.flush(deadline)
+
+
+class InvocationMetrics:
+    """Metrics of the current invocation, available to handlers as
+    ``request.metrics``.
+
+    Handlers publish their own metrics with :meth:`count` and :meth:`timing`.
+    They go to the type's namespace, with the built-in metrics' dimensions
+    plus any given, in the same requests (or Embedded Metric Format
+    documents) as the built-in metrics.
+    """
+
+    def __init__(
+        self,
+        proxy: MetricsPublisherProxy,
+        action: Union[Action, HookInvocationPoint],
+    ) -> None:
+        self._proxy = proxy
+        self.action = action
+
+    def publish_stabilization_metrics(self, polls: int, milliseconds: float) -> None:
+        self._proxy.publish_stabilization_metrics(
+            datetime.datetime.utcnow(), self.action, polls, milliseconds
+        )
+
+    def publish_phase_metrics(self, phases: Mapping[str, float]) -> None:
+        self._proxy.publish_phase_metrics(
+            datetime.datetime.utcnow(), self.action, phases
+        )
+
+    def count(
+        self,
+        name: str,
+        value: float = 1.0,
+        dimensions: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        self._proxy.publish_custom_metric(
+            datetime.datetime.utcnow(),
+            self.action,
+            name,
+            unit=StandardUnit.Count,
+            value=value,
+            dimensions=dimensions or {},
+        )
+
+    def timing(
+        self,
+        name: str,
+        milliseconds: float,
+        dimensions: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        self._proxy.publish_custom_metric(
+            datetime.datetime.utcnow(),
+            self.action,
+            name,
+            unit=StandardUnit.Milliseconds,
+            value=milliseconds,
+            dimensions=dimensions or {},
+        )
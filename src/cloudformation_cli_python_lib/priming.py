@@ -0,0 +1,50 @@
+import logging
+import random
+from typing import Any, Iterable, Optional, Type
+
+from .boto3_proxy import CLIENT_POOL, prime_clients
+from .log_delivery import logs_client_config
+from .metrics import metrics_client_config
+from .recast import prime_model
+from .utils import BaseModel, kitchen_sink_serialize
+
+LOG = logging.getLogger(__name__)
+
+
+def prime(
+    *,
+    models: Iterable[Optional[Type[BaseModel]]],
+    services: Iterable[str],
+    regions: Iterable[Optional[str]],
+    max_pool_connections: int,
+    response: Any,
+) -> None:
+    """Does the work of a first invocation that does not depend on the request.
+
+    Resolves the field types of ``models``, builds pooled clients for the
+    handler's ``services`` (sized like the caller session's) and the platform
+    services, and serializes ``response`` once. Nothing here raises, so it is
+    safe to call at import time or from a before-snapshot hook.
+    """
+    for model in models:
+        if model is None:
+            continue
+        try:
+            prime_model(model)
+        except Exception:  # pylint: disable=broad-except
+            LOG.warning("Could not prime model %s", model, exc_info=True)
+    prime_clients(services, regions, max_pool_connections)
+    # the clients the runtime itself creates from the provider session, for
+    # metrics and log delivery, configured as they will be asked for
+    prime_clients(["cloudwatch"], config=metrics_client_config())
+    prime_clients(["logs"], config=logs_client_config())
+    kitchen_sink_serialize(response)
+
+
+def after_restore() -> None:
+    """Resets state that must not be shared by containers restored from one
+    snapshot: open connections, and the random seed (used e.g. for backoff
+    jitter), which would otherwise be identical in every restored container.
+    """
+    CLIENT_POOL.reset_connections()
+    random.seed()
@@ -0,0 +1,213 @@
+from dataclasses import dataclass, replace
+
+import cProfile
+import logging
+import os
+import pstats
+import random
+import sys
+import time
+import tracemalloc
+from contextlib import nullcontext
+from types import TracebackType
+from typing import Any, ContextManager, List, Mapping, Optional, Type
+
+LOG = logging.getLogger(__name__)
+
+# fraction of invocations to profile, e.g. "0.01"
+ENV_SAMPLE_RATE = "CFN_PROFILING_SAMPLE_RATE"
+# "cpu", "memory" or "cpu,memory"
+ENV_MODE = "CFN_PROFILING_MODE"
+# number of functions and allocation sites in the report
+ENV_TOP = "CFN_PROFILING_TOP"
+# directory to write the raw .pstats files to, e.g. "/tmp" for local runs
+ENV_DUMP_DIR = "CFN_PROFILING_DUMP_DIR"
+
+DEFAULT_TOP = 20
+
+
+@dataclass(frozen=True)
+class ProfilingConfig:
+    """Which invocations to profile, and how.
+
+    A sampled invocation runs its handler under :mod:`cProfile` (``cpu``)
+    and/or :mod:`tracemalloc` (``memory``), and the top ``top`` functions and
+    allocation sites are logged as one report, which ends up in the provider
+    log group. Work the handler fans out to other threads is not profiled.
+    """
+
+    sample_rate: float = 0.0
+    cpu: bool = True
+    memory: bool = False
+    top: int = DEFAULT_TOP
+    dump_dir: Optional[str] = None
+
+    @classmethod
+    def from_environ(cls, environ: Mapping[str, str] = os.environ) -> "ProfilingConfig":
+        try:
+            return cls._parse(
+                sample_rate=environ.get(ENV_SAMPLE_RATE),
+                mode=environ.get(ENV_MODE),
+                top=environ.get(ENV_TOP),
+                dump_dir=environ.get(ENV_DUMP_DIR),
+            )
+        except ValueError as e:
+            LOG.warning("Profiling disabled, invalid configuration: %s", e)
+            return cls()
+
+    def with_type_configuration(self, type_configuration: Any) -> "ProfilingConfig":
+        """Applies a ``Profiling`` property of the type configuration, with
+        ``SampleRate``, ``Mode`` and ``Top`` properties, over this
+        configuration.
+        """
+        settings = getattr(type_configuration, "Profiling", None)
+        if settings is None:
+            return self
+        try:
+            return self._parse(
+                sample_rate=getattr(settings, "SampleRate", None),
+                mode=getattr(settings, "Mode", None),
+                top=getattr(settings, "Top", None),
+                dump_dir=self.dump_dir,
+                base=self,
+            )
+        except (TypeError, ValueError) as e:
+            LOG.warning("Ignoring invalid profiling type configuration: %s", e)
+            return self
+
+    @classmethod
+    def _parse(
+        cls,
+        *,
+        sample_rate: Any,
+        mode: Any,
+        top: Any,
+        dump_dir: Optional[str],
+        base: Optional["ProfilingConfig"] = None,
+    ) -> "ProfilingConfig":
+        config = base or cls()
+        if sample_rate is not None:
+            rate = float(sample_rate)
+            if not 0.0 <= rate <= 1.0:
+                raise ValueError(f"sample rate {rate} is not between 0 and 1")
+            config = replace(config, sample_rate=rate)
+        if mode is not None:
+            modes = {m.strip() for m in str(mode).lower().split(",")}
+            if not modes or not modes <= {"cpu", "memory"}:
+                raise ValueError(f"unknown profiling mode {mode!r}")
+            config = replace(config, cpu="cpu" in modes, memory="memory" in modes)
+        if top is not None:
+            config = replace(config, top=int(top))
+        return replace(config, dump_dir=dump_dir or None)
+
+    def sampled(self) -> bool:
+        # not used for anything security related
+        return random.random() < self.sample_rate  # nosec
+
+    def profile(self, label: str) -> ContextManager[Any]:
+        """A profiler for one handler call when this invocation is sampled,
+        a no-op otherwise.
+        """
+        if self.sample_rate <= 0.0 or not self.sampled():
+            return nullcontext()
+        if LOG.level == logging.NOTSET:
+            # the Lambda runtime leaves the root logger at WARNING, which would
+            # drop the report; a level set for this logger is kept
+            LOG.setLevel(logging.INFO)
+        return _Profile(self, label)
+
+
+class _Profile:
+    def __init__(self, config: ProfilingConfig, label: str) -> None:
+        self._config = config
+        self._label = label
+        self._cpu: Optional[cProfile.Profile] = None
+        self._tracing = False
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        if self._config.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        if self._config.cpu:
+            profile = cProfile.Profile()
+            if _enable(profile):
+                self._cpu = profile
+            else:
+                # e.g. when debugging locally
+                LOG.warning("CPU profiling skipped, another profiler is active")
+        self._start = time.perf_counter()
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        milliseconds = (time.perf_counter() - self._start) * 1000.0
+        if self._cpu:
+            self._cpu.disable()
+        lines = [f"Profile of {self._label} ({milliseconds:.1f} ms)"]
+        if self._cpu:
+            lines.extend(self._cpu_report(self._cpu))
+            self._dump(self._cpu)
+        if self._tracing:
+            lines.extend(self._memory_report())
+            tracemalloc.stop()
+        LOG.info("\n".join(lines))
+
+    def _cpu_report(self, profile: cProfile.Profile) -> List[str]:
+        top = self._config.top
+        stats = pstats.Stats(profile).stats  # type: ignore
+        entries = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+        lines = [f"cpu, top {top} by cumulative time:"]
+        for (filename, line, function), (_cc, calls, own, cumulative, _) in entries[
+            :top
+        ]:
+            lines.append(
+                f"  {cumulative * 1000.0:9.1f} ms cum {own * 1000.0:9.1f} ms self "
+                f"{calls:6d} calls  {_short_path(filename)}:{line}({function})"
+            )
+        return lines
+
+    def _memory_report(self) -> List[str]:
+        top = self._config.top
+        _current, peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().statistics("lineno")
+        lines = [f"memory, top {top} allocation sites (peak {peak / 1024.0:.1f} KiB):"]
+        for stat in statistics[:top]:
+            frame = stat.traceback[0]
+            lines.append(
+                f"  {stat.size / 1024.0:9.1f} KiB {stat.count:6d} blocks  "
+                f"{_short_path(frame.filename)}:{frame.lineno}"
+            )
+        return lines
+
+    def _dump(self, profile: cProfile.Profile) -> None:
+        if not self._config.dump_dir:
+            return
+        name = f"{self._label}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.pstats"
+        path = os.path.join(self._config.dump_dir, name)
+        try:
+            profile.dump_stats(path)
+        except OSError as e:
+            LOG.warning("Could not write %s: %s", path, e)
+        else:
+            LOG.info("Wrote %s", path)
+
+
+def _enable(profile: cProfile.Profile) -> bool:
+    # enabling a profiler silently replaces an active one before Python 3.12,
+    # and raises from then on
+    if sys.getprofile() is not None:
+        return False
+    try:
+        profile.enable()
+    except ValueError:
+        return False
+    return True
+
+
+def _short_path(filename: str) -> str:
+    # the package and module are enough to find a function
+    return "/".join(filename.split(os.sep)[-2:])
@@ -1,11 +1,17 @@
 import sys
 import typing
-from typing import Any, Dict, List, Mapping, Set
+from inspect import getmembers, isclass
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
 
 from .exceptions import InvalidRequest
 
 PRIMITIVES = (str, bool, int, float)
 
+# resolved types of dataclass fields, keyed by (dataclass, field name). Field
+# types only change with the model code, so the type hints are introspected
+# once per container rather than on every request
+_FIELD_TYPES: Dict[Tuple[Any, str], Any] = {}
+
 
 # CloudFormation recasts all primitive types as strings, this tries to set them back to
 # the types in the type hints
@@ -27,7 +33,7 @@ def recast_object(
         elif isinstance(v, PRIMITIVES):
             dest_type = cls
             if "__dataclass_fields__" in dir(cls):
-                dest_type = _field_to_type(cls.__dataclass_fields__[k].type, k, classes)
+                dest_type = _dataclass_field_type(cls, k, classes)
             json_data[k] = _recast_primitive(dest_type, k, v)
         else:
             raise InvalidRequest(f"Unsupported type: {type(v)} for {k}")
@@ -55,10 +61,10 @@ def _recast_nested_dict(
     :param dict classes:
     """
     try:
-        child_cls = _field_to_type(cls.__dataclass_fields__[k].type, k, classes)
+        child_cls = _dataclass_field_type(cls, k, classes)
         recast_object(child_cls, v, classes)
     except KeyError:
-        child_cls = _field_to_type(cls.__dataclass_fields__[k].type, k, classes)
+        child_cls = _dataclass_field_type(cls, k, classes)
         for _child, _child_definition in v.items():
             recast_object(child_cls, _child_definition, classes)
             json_data[k][_child] = _child_definition
@@ -71,13 +77,13 @@ def _recast_lists(cls: Any, k: str, v: List[Any], classes: Dict[str, Any]) -> Li
     if "__dataclass_fields__" not in dir(cls):
         pass
     elif k in cls.__dataclass_fields__:
-        cls = _field_to_type(cls.__dataclass_fields__[k].type, k, classes)
+        cls = _dataclass_field_type(cls, k, classes)
     return [cast_sequence_item(cls, k, item, classes) for item in v]
 
 
 def _recast_sets(cls: Any, k: str, v: Set[Any], classes: Dict[str, Any]) -> Set[Any]:
     if "__dataclass_fields__" in dir(cls):
-        cls = _field_to_type(cls.__dataclass_fields__[k].type, k, classes)
+        cls = _dataclass_field_type(cls, k, classes)
     return {cast_sequence_item(cls, k, item, classes) for item in v}
 
 
@@ -108,6 +114,40 @@ def _recast_primitive(cls: Any, k: str, v: Any) -> Any:
     return cls(v)
 
 
+def _dataclass_field_type(cls: Any, key: str, classes: Dict[str, Any]) -> Any:
+    try:
+        return _FIELD_TYPES[(cls, key)]
+    except KeyError:
+        pass
+    field_type = _field_to_type(cls.__dataclass_fields__[key].type, key, classes)
+    _FIELD_TYPES[(cls, key)] = field_type
+    return field_type
+
+
+def prime_model(cls: Any, classes: Optional[Dict[str, Any]] = None) -> None:
+    """Resolves the field types of a model and the models nested in it.
+
+    ``classes`` defaults to the classes of the model's module, which is what
+    generated models pass to :func:`recast_object`.
+    """
+    if classes is None:
+        module = sys.modules[cls.__module__]
+        classes = {n: o for n, o in getmembers(module) if isclass(o)}
+    pending = [cls]
+    seen = set()
+    while pending:
+        model = pending.pop()
+        seen.add(model)
+        for key in model.__dataclass_fields__:
+            try:
+                field_type = _dataclass_field_type(model, key, classes)
+            except (InvalidRequest, KeyError):
+                # recasting fails the same way on a request, nothing to prime
+                continue
+            if hasattr(field_type, "__dataclass_fields__") and field_type not in seen:
+                pending.append(field_type)
+
+
 # yes, introspecting type hints is ugly, but hopefully only needed temporarily
 def _field_to_type(field: Any, key: str, classes: Dict[str, Any]) -> Any:  # noqa: C901
     if field in [int, float, str, bool, typing.Any]:
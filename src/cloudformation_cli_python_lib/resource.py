@@ -1,37 +1,72 @@
-import json
 import logging
+import time
 import traceback
-from datetime import datetime
-from functools import wraps
-from typing import Any, Callable, MutableMapping, Optional, Tuple, Type, Union
+from functools import partial, wraps
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Iterable,
+    List,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 from .boto3_proxy import SessionProxy, _get_boto_session
+from .concurrency import DEFAULT_MAX_WORKERS, HandlerExecutor
+from .deadline import (
+    DEFAULT_SAFETY_MARGIN_SECONDS,
+    RESPONSE_MARGIN_SECONDS,
+    Deadline,
+    DeadlineExceeded,
+)
 from .exceptions import InternalFailure, InvalidRequest, _HandlerError
+from .instrumentation import InstrumentedEntrypoint
 from .interface import (
     Action,
     BaseResourceHandlerRequest,
     HandlerErrorCode,
+    MetricsDestination,
     OperationStatus,
     ProgressEvent,
 )
 from .log_delivery import ProviderLogHandler
-from .metrics import MetricsPublisherProxy
+from .metrics import (
+    InvocationMetrics,
+    MetricAggregator,
+    MetricsPublisherProxy,
+    defer_flush,
+    flush_deferred,
+)
+from .priming import after_restore, prime
+from .profiling import ProfilingConfig
+from .timing import start_phase_timer, take_phase_timer
 from .utils import (
     BaseModel,
     Credentials,
     HandlerRequest,
-    KitchenSinkEncoder,
     LambdaContext,
     TestEvent,
     UnmodelledRequest,
+    kitchen_sink_serialize,
+    resolve_awaitable,
 )
 
 LOG = logging.getLogger(__name__)
 
+T = TypeVar("T")
+R = TypeVar("R")
+
 MUTATING_ACTIONS = (Action.CREATE, Action.UPDATE, Action.DELETE)
 
 HandlerSignature = Callable[
-    [Optional[SessionProxy], Any, MutableMapping[str, Any]], ProgressEvent
+    [Optional[SessionProxy], Any, MutableMapping[str, Any]],
+    Union[ProgressEvent, Awaitable[ProgressEvent]],
 ]
 
 
@@ -43,26 +78,62 @@ def _ensure_serialize(
 ) -> Callable[[Any, MutableMapping[str, Any], Any], Any]:
     @wraps(entrypoint)
     def wrapper(self: Any, event: MutableMapping[str, Any], context: Any) -> Any:
+        take_phase_timer()
         try:
             response = entrypoint(self, event, context)
-            serialized = json.dumps(response, cls=KitchenSinkEncoder)
+            # the entrypoint may have started a timer for this invocation
+            timer = take_phase_timer()
+            with timer.phase("serialize"):
+                serialized = kitchen_sink_serialize(response)
+            timer.finish()
+            return serialized
         except Exception:  # pylint: disable=broad-except
             return ProgressEvent.failed(  # pylint: disable=protected-access
                 HandlerErrorCode.InternalFailure
             )._serialize()
-        return json.loads(serialized)
+        finally:
+            # what was published and logged during the invocation goes out in
+            # as few requests as possible, leaving time to respond
+            deadline = Deadline.from_context(context, RESPONSE_MARGIN_SECONDS)
+            # logs first, as failures to deliver them are reported as metrics
+            ProviderLogHandler.flush_existing(deadline)
+            flush_deferred(deadline)
+            # metrics written to the provider log by a sender thread
+            ProviderLogHandler.drain_existing(deadline)
 
     return wrapper
 
 
-class Resource:
-    def __init__(
+class Resource(InstrumentedEntrypoint):  # pylint: disable=too-many-instance-attributes
+    def __init__(  # pylint: disable=too-many-arguments,too-many-locals
         self,
         type_name: str,
         resouce_model_cls: Type[BaseModel],
         type_configuration_model_cls: Optional[Type[BaseModel]] = None,
         log_format: Optional[logging.Formatter] = None,
+        *,
+        deadline_safety_margin: float = DEFAULT_SAFETY_MARGIN_SECONDS,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        local_reinvoke_max_delay: Optional[int] = None,
+        services: Sequence[str] = (),
+        regions: Sequence[Optional[str]] = (None,),
+        phase_timing: bool = True,
+        phase_metrics: bool = False,
+        profiling: Optional[ProfilingConfig] = None,
+        metrics_destination: MetricsDestination = MetricsDestination.PUT_METRIC_DATA,
+        background_metrics: bool = False,
+        metrics_aggregator: Optional[MetricAggregator] = None,
+        background_logs: bool = False,
     ) -> None:
+        super().__init__(
+            phase_timing=phase_timing,
+            phase_metrics=phase_metrics,
+            profiling=profiling,
+            metrics_destination=metrics_destination,
+            background_metrics=background_metrics,
+            metrics_aggregator=metrics_aggregator,
+            background_logs=background_logs,
+        )
         self.type_name = type_name
         self._model_cls: Type[BaseModel] = resouce_model_cls
         self._type_configuration_model_cls: Optional[
@@ -70,6 +141,17 @@ class Resource:
         ] = type_configuration_model_cls
         self._handlers: MutableMapping[Action, HandlerSignature] = {}
         self.log_format = log_format
+        # seconds before the Lambda timeout at which handlers are checkpointed
+        self.deadline_safety_margin = deadline_safety_margin
+        self._executor = HandlerExecutor(max_workers)
+        # opt-in: IN_PROGRESS events asking for at most this many seconds of
+        # delay are re-invoked in-process instead of going back through
+        # CloudFormation, as long as the invocation has time left
+        self.local_reinvoke_max_delay = local_reinvoke_max_delay
+        # the AWS services (and regions, None being the default one) the
+        # handlers call, for prime()
+        self.services = services
+        self.regions = regions
 
     def handler(self, action: Action) -> Callable[[HandlerSignature], HandlerSignature]:
         def _add_handler(f: HandlerSignature) -> HandlerSignature:
@@ -78,6 +160,39 @@ class Resource:
 
         return _add_handler
 
+    def prime(self) -> None:
+        """Warms up the container ahead of the first invocation.
+
+        Call it at module import, or register it as a before-snapshot hook,
+        to load the models and clients the first request would otherwise
+        have to. Register :meth:`after_restore` as the matching after-restore
+        hook.
+        """
+        prime(
+            models=(self._model_cls, self._type_configuration_model_cls),
+            services=self.services,
+            regions=self.regions,
+            max_pool_connections=self._executor.max_workers,
+            response=ProgressEvent(status=OperationStatus.SUCCESS),
+        )
+
+    @staticmethod
+    def after_restore() -> None:
+        after_restore()
+
+    def map_concurrently(
+        self,
+        fn: Callable[[T], R],
+        items: Iterable[T],
+        max_workers: Optional[int] = None,
+    ) -> List[R]:
+        """Calls ``fn`` on every item on the container's handler thread pool.
+
+        Results come back in the order of ``items``. See
+        :meth:`HandlerExecutor.map` for how failures are raised.
+        """
+        return self._executor.map(fn, items, max_workers)
+
     def _invoke_handler(
         self,
         session: Optional[SessionProxy],
@@ -91,7 +206,15 @@ class Resource:
             return ProgressEvent.failed(
                 HandlerErrorCode.InternalFailure, f"No handler for {action.name}"
             )
-        progress = handler(session, request, callback_context)
+        try:
+            progress = resolve_awaitable(
+                handler(session, request, callback_context), request.deadline
+            )
+        except DeadlineExceeded as e:
+            LOG.info("Invocation deadline reached, checkpointing")
+            progress = e.to_progress_event(
+                callback_context, request.desiredResourceState
+            )
         is_in_progress = progress.status == OperationStatus.IN_PROGRESS
         is_mutable = action in MUTATING_ACTIONS
         if is_in_progress and not is_mutable:
@@ -113,7 +236,7 @@ class Resource:
                 **event.request
             ).to_modelled(self._model_cls, self._type_configuration_model_cls)
 
-            session = _get_boto_session(creds, event.region)
+            session = _get_boto_session(creds, event.region, self._executor.max_workers)
             action = Action[event.action]
         except Exception as e:  # pylint: disable=broad-except
             LOG.exception("Invalid request")
@@ -122,12 +245,24 @@ class Resource:
 
     @_ensure_serialize
     def test_entrypoint(
-        self, event: MutableMapping[str, Any], _context: Any
+        self, event: MutableMapping[str, Any], context: Any
     ) -> ProgressEvent:
         msg = "Uninitialized"
+        # finished, and logged, by _ensure_serialize
+        timer = start_phase_timer(self.phase_timing)
         try:
-            session, request, action, callback_context = self._parse_test_request(event)
-            return self._invoke_handler(session, request, action, callback_context)
+            with timer.phase("parse_request"):
+                deadline = Deadline.from_context(context, self.deadline_safety_margin)
+                session, request, action, callback_context = self._parse_test_request(
+                    event
+                )
+            request.deadline = deadline
+            request.timer = timer
+            # no publishers: handlers' metrics are accepted and not sent
+            request.metrics = InvocationMetrics(MetricsPublisherProxy(), action)
+            timer.annotate(typeName=self.type_name, action=action.name)
+            with timer.phase("handler"):
+                return self._invoke_handler(session, request, action, callback_context)
         except _HandlerError as e:
             LOG.exception("Handler error")
             return e.to_progress_event()
@@ -139,7 +274,7 @@ class Resource:
 
     @staticmethod
     def _parse_request(
-        event_data: MutableMapping[str, Any]
+        event_data: MutableMapping[str, Any], max_pool_connections: Optional[int] = None
     ) -> Tuple[
         Tuple[Optional[SessionProxy], Optional[SessionProxy]],
         Action,
@@ -148,7 +283,10 @@ class Resource:
     ]:
         try:
             event = HandlerRequest.deserialize(event_data)
-            caller_sess = _get_boto_session(event.requestData.callerCredentials)
+            caller_sess = _get_boto_session(
+                event.requestData.callerCredentials,
+                max_pool_connections=max_pool_connections,
+            )
             provider_sess = _get_boto_session(event.requestData.providerCredentials)
             # credentials are used when rescheduling, so can't zero them out (for now)
             action = Action[event.action]
@@ -184,11 +322,22 @@ class Resource:
             LOG.exception("Invalid request")
             raise InvalidRequest(f"{e} ({type(e).__name__})") from e
 
+    def _can_reinvoke_locally(
+        self, progress: ProgressEvent, deadline: Deadline
+    ) -> bool:
+        if self.local_reinvoke_max_delay is None:
+            return False
+        if progress.status != OperationStatus.IN_PROGRESS:
+            return False
+        delay = progress.callbackDelaySeconds
+        return delay <= self.local_reinvoke_max_delay and delay < deadline.remaining()
+
     # TODO: refactor to reduce branching and locals
     @_ensure_serialize  # noqa: C901
     def __call__(  # pylint: disable=too-many-locals  # noqa: C901
         self, event_data: MutableMapping[str, Any], context: LambdaContext
-    ) -> MutableMapping[str, Any]:
+    ) -> ProgressEvent:
+        timer = start_phase_timer(self.phase_timing)
         logs_setup = False
 
         def print_or_log(message: str) -> None:
@@ -199,30 +348,66 @@ class Resource:
                 traceback.print_exc()
 
         try:
-            sessions, action, callback, event = self._parse_request(event_data)
+            with timer.phase("parse_request"):
+                deadline = Deadline.from_context(context, self.deadline_safety_margin)
+                sessions, action, callback, event = self._parse_request(
+                    event_data, self._executor.max_workers
+                )
             caller_sess, provider_sess = sessions
 
-            request = self._cast_resource_request(event)
+            with timer.phase("cast_request"):
+                request = self._cast_resource_request(event)
+            request.deadline = deadline
+            request.timer = timer
 
-            metrics = MetricsPublisherProxy()
+            metrics = self._metrics_proxy()
+            defer_flush(metrics)
             if event.requestData.providerLogGroupName and provider_sess:
-                ProviderLogHandler.setup(event, provider_sess, self.log_format)
+                with timer.phase("log_setup"):
+                    ProviderLogHandler.setup(
+                        event,
+                        provider_sess,
+                        self.log_format,
+                        background=self.background_logs,
+                        metrics=metrics,
+                    )
                 logs_setup = True
                 metrics.add_metrics_publisher(provider_sess, event.resourceType)
+            request.metrics = InvocationMetrics(metrics, action)
+            timer.annotate(typeName=self.type_name, action=action.name)
+            if self.phase_metrics:
+                timer.publish_to(request.metrics)
 
-            metrics.publish_invocation_metric(datetime.utcnow(), action)
-            start_time = datetime.utcnow()
-            error = None
-
-            try:
-                progress = self._invoke_handler(caller_sess, request, action, callback)
-            except Exception as e:  # pylint: disable=broad-except
-                error = e
-            m_secs = (datetime.utcnow() - start_time).total_seconds() * 1000.0
-            metrics.publish_duration_metric(datetime.utcnow(), action, m_secs)
-            if error:
-                metrics.publish_exception_metric(datetime.utcnow(), action, error)
-                raise error
+            progress = self._timed_invoke(
+                partial(self._invoke_handler, caller_sess, request, action, callback),
+                metrics,
+                timer,
+                action,
+                request.typeConfiguration,
+            )
+            while self._can_reinvoke_locally(progress, deadline):
+                LOG.info(
+                    "Re-invoking in-process after %s seconds",
+                    progress.callbackDelaySeconds,
+                )
+                with timer.phase("reinvoke_wait"):
+                    time.sleep(progress.callbackDelaySeconds)
+                # CloudFormation would pass the progress model back in, too
+                if progress.resourceModel is not None:
+                    request.desiredResourceState = progress.resourceModel
+                progress = self._timed_invoke(
+                    partial(
+                        self._invoke_handler,
+                        caller_sess,
+                        request,
+                        action,
+                        progress.callbackContext or {},
+                    ),
+                    metrics,
+                    timer,
+                    action,
+                    request.typeConfiguration,
+                )
         except _HandlerError as e:
             print_or_log("Handler error")
             progress = e.to_progress_event()
@@ -238,4 +423,4 @@ class Resource:
 
         # use the raw event_data as a last-ditch attempt to call back if the
         # request is invalid
-        return progress._serialize()  # pylint: disable=protected-access
+        return progress
@@ -0,0 +1,33 @@
+import atexit
+import os
+import signal
+import threading
+from types import FrameType
+from typing import Callable, Optional
+
+
+def on_shutdown(callback: Callable[[], None]) -> None:
+    """Calls ``callback`` when the container shuts down.
+
+    Lambda does not run :mod:`atexit` hooks. Before shutting a container down
+    it sends SIGTERM, but only when an extension is registered; otherwise the
+    process gets SIGKILL, which nothing can intercept. The callback runs on
+    SIGTERM, before whatever handled the signal until then, and from
+    :mod:`atexit` when the interpreter exits normally, e.g. when run locally.
+    """
+    atexit.register(callback)
+    if threading.current_thread() is not threading.main_thread():
+        # signal handlers can only be installed from the main thread
+        return
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handler(signum: int, frame: Optional[FrameType]) -> None:
+        callback()
+        if callable(previous):
+            previous(signum, frame)
+        elif previous != signal.SIG_IGN:
+            # terminates the process, as the signal would have
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+
+    signal.signal(signal.SIGTERM, handler)
@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+
+import logging
+import math
+import random
+import time
+from typing import Any, Callable, MutableMapping, Optional, TypeVar
+
+from .deadline import DeadlineExceeded
+from .exceptions import NotStabilized
+
+LOG = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_CONTEXT_KEY = "stabilization"
+
+
+@dataclass(frozen=True)
+class BackoffPolicy:
+    """Exponential backoff between polls.
+
+    The n-th delay is ``initial_delay * multiplier ** (n - 1)`` capped at
+    ``max_delay``, with up to ``jitter`` (a fraction) of it taken off at random
+    so providers polling the same API do not do so in lockstep.
+    ``max_attempts`` counts polls across invocations.
+    """
+
+    initial_delay: float = 1.0
+    max_delay: float = 30.0
+    multiplier: float = 2.0
+    jitter: float = 0.5
+    max_attempts: int = 120
+
+    def delay(self, attempt: int) -> float:
+        exponent = min(attempt - 1, 64)  # keep the power finite
+        delay = min(self.max_delay, self.initial_delay * self.multiplier**exponent)
+        # not used for anything security related
+        return delay * (1.0 - self.jitter * random.random())  # nosec
+
+
+DEFAULT_BACKOFF = BackoffPolicy()
+
+
+def stabilize(  # pylint: disable=too-many-arguments
+    probe: Callable[[], T],
+    is_stabilized: Callable[[T], bool],
+    *,
+    request: Any,
+    callback_context: MutableMapping[str, Any],
+    is_failed: Optional[Callable[[T], bool]] = None,
+    policy: BackoffPolicy = DEFAULT_BACKOFF,
+    key: str = DEFAULT_CONTEXT_KEY,
+) -> T:
+    """Polls ``probe`` until ``is_stabilized`` holds for its result.
+
+    Polling happens in-process while ``request.deadline`` leaves time for the
+    next delay. Otherwise the poll state is saved in
+    ``callback_context[key]`` and :class:`DeadlineExceeded` is raised, which
+    the runtime turns into ``IN_PROGRESS``; calling ``stabilize`` again on the
+    next invocation carries on from that state.
+
+    :raises NotStabilized: if ``is_failed`` holds for a result, or the policy
+        runs out of attempts
+    :return: the result that stabilized
+    """
+    state = callback_context.setdefault(key, {"attempts": 0, "startedAt": time.time()})
+    while True:
+        result = probe()
+        state["attempts"] += 1
+        if is_stabilized(result):
+            _finish(request, callback_context, key)
+            return result
+        if is_failed and is_failed(result):
+            _finish(request, callback_context, key)
+            raise NotStabilized(f"Stabilization failed after {state['attempts']} polls")
+        if state["attempts"] >= policy.max_attempts:
+            _finish(request, callback_context, key)
+            raise NotStabilized(f"Not stabilized after {state['attempts']} polls")
+
+        delay = policy.delay(state["attempts"])
+        if request.deadline and delay >= request.deadline.remaining():
+            LOG.info("Stabilization checkpointed after %s polls", state["attempts"])
+            raise DeadlineExceeded(callback_context, math.ceil(delay))
+        time.sleep(delay)
+
+
+def _finish(request: Any, callback_context: MutableMapping[str, Any], key: str) -> None:
+    state = callback_context.pop(key)
+    milliseconds = (time.time() - state["startedAt"]) * 1000.0
+    LOG.info(
+        "Stabilization finished after %s polls in %.0f ms",
+        state["attempts"],
+        milliseconds,
+    )
+    if request.metrics:
+        request.metrics.publish_stabilization_metrics(state["attempts"], milliseconds)
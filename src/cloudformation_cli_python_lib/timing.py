@@ -0,0 +1,161 @@
+import json
+import logging
+import time
+from contextvars import ContextVar
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, ContextManager, Dict, Optional, Type
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .metrics import InvocationMetrics
+
+LOG = logging.getLogger(__name__)
+
+
+class PhaseTimer:
+    """Times the phases of an invocation on a monotonic clock, available to
+    handlers as ``request.timer``.
+
+    Time spent in a phase is added up over every ``with timer.phase(name)``
+    block of that name, so a phase entered more than once (e.g. the handler
+    when re-invoked in-process) is reported once. Handlers can time their own
+    steps the same way; those phases nest inside the ``handler`` phase.
+
+    When the invocation is done, :meth:`finish` writes everything as one
+    structured log line, and publishes the phases as metrics if asked to.
+    """
+
+    def __init__(self) -> None:
+        self._started = time.perf_counter()
+        self._phases: Dict[str, float] = {}
+        self._fields: Dict[str, Any] = {}
+        self._metrics: Optional["InvocationMetrics"] = None
+
+    def phase(self, name: str) -> ContextManager[None]:
+        return _Phase(self, name)
+
+    def record(self, name: str, milliseconds: float) -> None:
+        self._phases[name] = self._phases.get(name, 0.0) + milliseconds
+
+    @property
+    def phases(self) -> Dict[str, float]:
+        """Milliseconds spent in each phase, in the order they were entered."""
+        return dict(self._phases)
+
+    def elapsed(self) -> float:
+        """Milliseconds since the timer was created."""
+        return (time.perf_counter() - self._started) * 1000.0
+
+    def annotate(self, **fields: Any) -> None:
+        """Adds fields to the log line, e.g. the action."""
+        self._fields.update(fields)
+
+    def publish_to(self, metrics: "InvocationMetrics") -> None:
+        self._metrics = metrics
+
+    def finish(self) -> None:
+        line = {**self._fields, "totalMs": self.elapsed(), "phasesMs": self._phases}
+        LOG.info("Invocation timing %s", json.dumps(line))
+        if self._metrics:
+            self._metrics.publish_phase_metrics(self.phases)
+
+
+class _Phase:
+    __slots__ = ("_timer", "_name", "_start")
+
+    def __init__(self, timer: PhaseTimer, name: str) -> None:
+        self._timer = timer
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        milliseconds = (time.perf_counter() - self._start) * 1000.0
+        self._timer.record(self._name, milliseconds)
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class NullPhaseTimer(PhaseTimer):
+    """A timer that records nothing, used when phase timing is turned off.
+
+    Every phase is the same shared no-op context manager, so the
+    instrumentation costs a method call per phase and never reads the clock.
+    """
+
+    def __init__(self) -> None:  # pylint: disable=super-init-not-called
+        pass
+
+    def phase(self, name: str) -> ContextManager[None]:
+        return _NULL_PHASE
+
+    def record(self, name: str, milliseconds: float) -> None:
+        pass
+
+    @property
+    def phases(self) -> Dict[str, float]:
+        return {}
+
+    def elapsed(self) -> float:
+        return 0.0
+
+    def annotate(self, **fields: Any) -> None:
+        pass
+
+    def publish_to(self, metrics: "InvocationMetrics") -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+NULL_PHASE_TIMER = NullPhaseTimer()
+
+# the timer of the invocation in progress. The entrypoint starts it, and the
+# wrapper serializing the entrypoint's response takes it to time serialization
+# and finish it
+_CURRENT_TIMER: ContextVar[PhaseTimer] = ContextVar(
+    "phase_timer", default=NULL_PHASE_TIMER
+)
+
+
+def start_phase_timer(enabled: bool) -> PhaseTimer:
+    if enabled and LOG.level == logging.NOTSET:
+        # the Lambda runtime leaves the root logger at WARNING, which would
+        # drop the timing line; a level set for this logger is kept
+        LOG.setLevel(logging.INFO)
+    timer = PhaseTimer() if enabled else NULL_PHASE_TIMER
+    _CURRENT_TIMER.set(timer)
+    return timer
+
+
+def current_phase_timer() -> PhaseTimer:
+    return _CURRENT_TIMER.get()
+
+
+def take_phase_timer() -> PhaseTimer:
+    timer = _CURRENT_TIMER.get()
+    _CURRENT_TIMER.set(NULL_PHASE_TIMER)
+    return timer
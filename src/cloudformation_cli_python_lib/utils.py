@@ -1,20 +1,28 @@
 # pylint: disable=invalid-name
 from dataclasses import dataclass, field, fields
 
+import asyncio
+import inspect
 import json
+import threading
 from datetime import date, datetime, time
 from typing import (
     Any,
+    Awaitable,
     Callable,
     Dict,
     List,
     Mapping,
     MutableMapping,
     Optional,
+    Set,
     Type,
+    TypeVar,
     Union,
+    cast,
 )
 
+from .deadline import Deadline
 from .exceptions import InvalidRequest
 from .interface import (
     Action,
@@ -23,6 +31,8 @@ from .interface import (
     BaseResourceHandlerRequest,
     HookContext,
     HookInvocationPoint,
+    HookProgressEvent,
+    ProgressEvent,
 )
 
 
@@ -36,6 +46,145 @@ class KitchenSinkEncoder(json.JSONEncoder):
             return super().default(o)
 
 
+_JSON_CONSTANT_KEYS = {True: "true", False: "false", None: "null"}
+_JSON_NATIVE_TYPES = (str, int, float, list, tuple, dict, datetime, date, time)
+
+
+def _serialize_key(key: Any) -> str:
+    # mirrors how the json module coerces dictionary keys
+    if isinstance(key, str):
+        return str.__str__(key)
+    if isinstance(key, float):
+        return json.dumps(float.__float__(key))
+    if key is True or key is False or key is None:
+        return _JSON_CONSTANT_KEYS[key]
+    if isinstance(key, int):
+        return int.__repr__(key)
+    raise TypeError(
+        f"keys must be str, int, float, bool or None, not {type(key).__name__}"
+    )
+
+
+def _model_to_plain(model: BaseModel) -> Dict[str, Any]:
+    # equivalent to BaseModel._serialize followed by encoding, in a single pass
+    return {
+        k: kitchen_sink_serialize(v) for k, v in model.__dict__.items() if v is not None
+    }
+
+
+def _progress_event_to_plain(event: ProgressEvent) -> Dict[str, Any]:
+    # equivalent to ProgressEvent._serialize followed by encoding, in a single pass
+    plain = {}
+    for key, value in event.__dict__.items():
+        if value is None or key == "status":
+            continue
+        if key == "resourceModel" and value:
+            plain[key] = _serialize_model(value)
+        elif key == "resourceModels" and value:
+            plain[key] = [_serialize_model(model) for model in value]
+        elif key == "errorCode" and value:
+            plain[key] = value.name
+        else:
+            plain[key] = kitchen_sink_serialize(value)
+    plain["status"] = event.status.name
+    return plain
+
+
+def _hook_progress_event_to_plain(event: HookProgressEvent) -> Dict[str, Any]:
+    # equivalent to HookProgressEvent._serialize followed by encoding
+    plain = {}
+    for key, value in event.__dict__.items():
+        if value is None or key == "hookStatus":
+            continue
+        if key == "errorCode" and value:
+            plain[key] = value.name
+        else:
+            plain[key] = kitchen_sink_serialize(value)
+    plain["hookStatus"] = event.hookStatus.name
+    return plain
+
+
+_SINGLE_PASS_SERIALIZERS: Dict[type, Callable[[Any], Dict[str, Any]]] = {
+    ProgressEvent: _progress_event_to_plain,
+    HookProgressEvent: _hook_progress_event_to_plain,
+}
+_SINGLE_PASS_UNSUPPORTED: Set[type] = set()
+
+
+def _single_pass_serializer(o_type: type) -> Optional[Callable[[Any], Any]]:
+    """Looks up (and caches) how to walk an object that is not a JSON type.
+
+    Types can only take the single pass if they use the stock ``_serialize``
+    implementations; anything that customises them falls back to ``_serialize``.
+    """
+    try:
+        return _SINGLE_PASS_SERIALIZERS[o_type]
+    except KeyError:
+        pass
+    if o_type in _SINGLE_PASS_UNSUPPORTED:
+        return None
+    if (  # pylint: disable=protected-access
+        issubclass(o_type, BaseModel)
+        and not issubclass(o_type, _JSON_NATIVE_TYPES)
+        and o_type._serialize is BaseModel._serialize
+        and o_type._serialize_item is BaseModel._serialize_item
+        and o_type._serialize_list is BaseModel._serialize_list
+    ):
+        _SINGLE_PASS_SERIALIZERS[o_type] = _model_to_plain
+        return _model_to_plain
+    _SINGLE_PASS_UNSUPPORTED.add(o_type)
+    return None
+
+
+def _serialize_model(model: Any) -> Any:
+    serializer = _single_pass_serializer(type(model))
+    if serializer:
+        return serializer(model)
+    return kitchen_sink_serialize(model._serialize())  # pylint: disable=W0212
+
+
+def kitchen_sink_serialize(o: Any) -> Any:
+    """Converts an object tree to plain JSON-compatible Python objects.
+
+    The result is identical to ``json.loads(json.dumps(o, cls=KitchenSinkEncoder))``,
+    but the tree is only walked once and no intermediate string is built.
+    """
+    o_type = type(o)
+    if o_type in (str, int, float, bool) or o is None:
+        return o
+    if o_type is dict:
+        return {_serialize_key(k): kitchen_sink_serialize(v) for k, v in o.items()}
+    if o_type in (list, tuple):
+        return [kitchen_sink_serialize(item) for item in o]
+    serializer = _single_pass_serializer(o_type)
+    if serializer:
+        return serializer(o)
+    return _serialize_other(o)
+
+
+def _serialize_other(o: Any) -> Any:  # pylint: disable=too-many-return-statements
+    # subclasses (e.g. our str enums) are checked in the same order json does
+    if isinstance(o, str):
+        return str.__str__(o)
+    if isinstance(o, int):
+        return int.__int__(o)
+    if isinstance(o, float):
+        return float.__float__(o)
+    if isinstance(o, (list, tuple)):
+        return [kitchen_sink_serialize(item) for item in o]
+    if isinstance(o, dict):
+        return {_serialize_key(k): kitchen_sink_serialize(v) for k, v in o.items()}
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    try:
+        serialize = o._serialize  # pylint: disable=protected-access
+    except AttributeError:
+        raise TypeError(  # pylint: disable=raise-missing-from
+            f"Object of type {type(o).__name__} is not JSON serializable"
+        )
+    return kitchen_sink_serialize(serialize())
+
+
 @dataclass
 class TestEvent:
     credentials: Mapping[str, str]
@@ -349,3 +498,44 @@ def _deser_item(item: Any, inner_dataclass: Any) -> Any:
     if isinstance(item, dict):
         return inner_dataclass._deserialize(item)  # pylint: disable=protected-access
     raise InvalidRequest(f"cannot deserialize lists of {type(item)}")
+
+
+T = TypeVar("T")
+
+
+class _ContainerEventLoop:
+    """An asyncio event loop that lives as long as the container.
+
+    Creating a loop per invocation (as ``asyncio.run`` does) would throw away
+    anything a handler attached to it, so the loop is created on first use and
+    reused by every later invocation.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def run(self, awaitable: Awaitable[T]) -> T:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+            return self._loop.run_until_complete(awaitable)
+
+
+_EVENT_LOOP = _ContainerEventLoop()
+
+
+def resolve_awaitable(
+    result: Union[T, Awaitable[T]], deadline: Optional[Deadline] = None
+) -> T:
+    """Returns ``result``, first running it to completion if it is awaitable.
+
+    This is what lets ``async def`` handlers be registered next to regular ones.
+    Awaitables still running when ``deadline`` passes are cancelled.
+    """
+    if inspect.isawaitable(result):
+        awaitable = cast(Awaitable[T], result)
+        if deadline:
+            awaitable = deadline.wait_for(awaitable)
+        return _EVENT_LOOP.run(awaitable)
+    return result
@@ -1,7 +1,23 @@
+# pylint: disable=redefined-outer-name,protected-access,no-member
+import pytest
 from boto3.session import Session
-from cloudformation_cli_python_lib.boto3_proxy import SessionProxy, _get_boto_session
+from cloudformation_cli_python_lib.boto3_proxy import (
+    SHARED_LOADER,
+    ClientPool,
+    SessionProxy,
+    SharedLoader,
+    _data_paths,
+    _get_boto_session,
+    _hashable,
+    loader_cache_stats,
+    prime_clients,
+)
 from cloudformation_cli_python_lib.utils import Credentials
 
+import gc
+from botocore.config import Config
+from unittest.mock import Mock, patch, sentinel
+
 
 def test_get_boto_session_returns_proxy():
     proxy = _get_boto_session(Credentials("", "", ""))
@@ -17,3 +33,268 @@ def test_can_retrieve_boto_session():
     proxy = _get_boto_session(Credentials("", "", ""))
     session = proxy.session
     assert isinstance(session, Session)
+
+
+CREDS_A = Credentials("AKIDA", "secret-a", "token-a")
+CREDS_B = Credentials("AKIDB", "secret-b", "token-b")
+
+
+def test_get_boto_session_is_lazy():
+    with patch("boto3.session.Session") as mock_session:
+        proxy = _get_boto_session(CREDS_A, "eu-west-1")
+        mock_session.assert_not_called()
+        assert proxy.region_name == "eu-west-1"
+        assert proxy.session is mock_session.return_value
+        assert proxy.session is mock_session.return_value
+    mock_session.assert_called_once()
+    kwargs = mock_session.call_args.kwargs
+    assert kwargs["aws_access_key_id"] == "AKIDA"
+    assert kwargs["region_name"] == "eu-west-1"
+
+
+def test_session_proxy_requires_session_or_credentials():
+    with pytest.raises(TypeError):
+        SessionProxy()
+
+
+def test_session_proxy_resource_builds_session():
+    proxy = make_proxy(CREDS_A)
+    with patch("boto3.session.Session") as mock_session:
+        resource = proxy.resource("s3", region_name="us-west-2")
+    assert resource is mock_session.return_value.resource.return_value
+    mock_session.return_value.resource.assert_called_once_with(
+        "s3", region_name="us-west-2"
+    )
+
+
+def test_pooled_client_does_not_build_session(pool):
+    first = make_proxy(CREDS_A)
+    client = pool.client(first, CREDS_A, "s3", {})
+    del first
+    gc.collect()
+
+    second = make_proxy(CREDS_B)
+    with patch("boto3.session.Session") as mock_session:
+        assert pool.client(second, CREDS_B, "s3", {}) is client
+    mock_session.assert_not_called()
+
+
+@pytest.fixture
+def pool():
+    return ClientPool()
+
+
+def make_proxy(credentials, region="us-east-1"):
+    return _get_boto_session(credentials, region)
+
+
+def signer_access_key(client):
+    return client._request_signer._credentials.access_key
+
+
+def test_session_proxy_without_credentials_does_not_pool():
+    session = Mock(spec=["client", "resource"])
+    proxy = SessionProxy(session)
+    assert proxy.client("s3", region_name="us-west-2") is session.client.return_value
+    session.client.assert_called_once_with("s3", region_name="us-west-2")
+
+
+def test_session_proxy_client_goes_through_pool():
+    proxy = make_proxy(CREDS_A)
+    with patch("cloudformation_cli_python_lib.boto3_proxy.CLIENT_POOL") as mock_pool:
+        client = proxy.client("s3", "us-west-2", config=sentinel.config)
+    assert client is mock_pool.client.return_value
+    mock_pool.client.assert_called_once_with(
+        proxy,
+        CREDS_A,
+        "s3",
+        {"region_name": "us-west-2", "config": sentinel.config},
+    )
+
+
+def test_pool_reuses_client_for_same_credentials(pool):
+    proxy = make_proxy(CREDS_A)
+    first = pool.client(proxy, CREDS_A, "s3", {})
+    second = pool.client(proxy, CREDS_A, "s3", {})
+    assert first is second
+    assert len(pool) == 1
+
+
+def test_pool_rebinds_credentials_once_owner_is_gone(pool):
+    proxy = make_proxy(CREDS_A)
+    first = pool.client(proxy, CREDS_A, "s3", {})
+    del proxy
+    gc.collect()
+
+    proxy = make_proxy(CREDS_B)
+    second = pool.client(proxy, CREDS_B, "s3", {})
+    assert second is first
+    assert signer_access_key(second) == "AKIDB"
+    assert len(pool) == 1
+
+
+def test_pool_does_not_share_between_live_owners(pool):
+    caller = make_proxy(CREDS_A)
+    provider = make_proxy(CREDS_B)
+    caller_client = pool.client(caller, CREDS_A, "logs", {})
+    provider_client = pool.client(provider, CREDS_B, "logs", {})
+    assert caller_client is not provider_client
+    assert signer_access_key(caller_client) == "AKIDA"
+    assert signer_access_key(provider_client) == "AKIDB"
+    assert len(pool) == 2
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"region_name": "eu-west-1"},
+        {"endpoint_url": "http://localhost:4566"},
+        {"config": Config(max_pool_connections=20)},
+        {"verify": False},
+    ],
+)
+def test_pool_keys_on_client_arguments(pool, kwargs):
+    proxy = make_proxy(CREDS_A)
+    default = pool.client(proxy, CREDS_A, "s3", {})
+    other = pool.client(proxy, CREDS_A, "s3", kwargs)
+    assert other is not default
+    assert pool.client(proxy, CREDS_A, "s3", kwargs) is other
+
+
+def test_pool_treats_equal_configs_as_the_same(pool):
+    proxy = make_proxy(CREDS_A)
+    config = Config(retries={"max_attempts": 1, "mode": "standard"})
+    first = pool.client(proxy, CREDS_A, "s3", {"config": config})
+    config = Config(retries={"mode": "standard", "max_attempts": 1})
+    assert pool.client(proxy, CREDS_A, "s3", {"config": config}) is first
+
+
+def test_pool_bypassed_for_explicit_credentials(pool):
+    proxy = make_proxy(CREDS_A)
+    client = pool.client(
+        proxy,
+        CREDS_A,
+        "s3",
+        {
+            "aws_access_key_id": "AKIDC",
+            "aws_secret_access_key": "secret-c",
+            "aws_session_token": "token-c",
+        },
+    )
+    assert signer_access_key(client) == "AKIDC"
+    assert len(pool) == 0
+
+
+def test_pool_clear(pool):
+    proxy = make_proxy(CREDS_A)
+    first = pool.client(proxy, CREDS_A, "s3", {})
+    pool.clear()
+    assert len(pool) == 0
+    assert pool.client(proxy, CREDS_A, "s3", {}) is not first
+
+
+def test_hashable_normalizes_nested_values():
+    value = {"b": [1, {"c": {2}}], "a": (3,)}
+    assert _hashable(value) == (("a", (3,)), ("b", (1, (("c", "{2}"),))))
+    hash(_hashable(value))
+
+
+def test_sessions_share_one_loader():
+    first = make_proxy(CREDS_A).session
+    second = make_proxy(CREDS_B).session
+    loader = SHARED_LOADER.get()
+    assert first._loader is loader
+    assert second._loader is loader
+    assert first._session.get_component("data_loader") is loader
+
+
+def test_shared_loader_search_paths_do_not_grow():
+    make_proxy(CREDS_A).session  # pylint: disable=expression-not-assigned
+    paths = list(SHARED_LOADER.get().search_paths)
+    make_proxy(CREDS_B).session  # pylint: disable=expression-not-assigned
+    assert SHARED_LOADER.get().search_paths == paths
+
+
+def test_shared_loader_counts_hits_and_misses():
+    shared = SharedLoader()
+    assert shared.cache_stats() == {"hits": 0, "misses": 0, "entries": 0}
+    loader = shared.get()
+    assert shared.get() is loader
+    loader.load_data("endpoints")
+    assert shared.cache_stats() == {"hits": 0, "misses": 1, "entries": 1}
+    loader.load_data("endpoints")
+    assert shared.cache_stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_service_model_parsed_once_across_sessions():
+    make_proxy(CREDS_A).session.client("s3")
+    before = loader_cache_stats()
+    proxy = make_proxy(CREDS_B)
+    proxy.session.client("s3")
+    after = loader_cache_stats()
+    assert after["misses"] == before["misses"]
+    assert after["hits"] > before["hits"]
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        (None, []),
+        ("", []),
+        ("/a", ["/a"]),
+        ("/a:~/b", ["/a", "/root/b"]),
+    ],
+)
+def test_data_paths_from_environment(monkeypatch, value, expected):
+    monkeypatch.setenv("HOME", "/root")
+    if value is None:
+        monkeypatch.delenv("AWS_DATA_PATH", raising=False)
+    else:
+        monkeypatch.setenv("AWS_DATA_PATH", value)
+    assert _data_paths() == expected
+
+
+def test_session_proxy_sizes_connection_pool():
+    session = Mock(spec=["client", "resource"])
+    proxy = SessionProxy(session, max_pool_connections=32)
+
+    proxy.client("s3")
+    config = session.client.call_args.kwargs["config"]
+    assert config.max_pool_connections == 32
+
+    proxy.client("s3", "us-west-2", config=Config(max_pool_connections=4))
+    config = session.client.call_args.kwargs["config"]
+    assert session.client.call_args.kwargs["region_name"] == "us-west-2"
+    assert config.max_pool_connections == 4
+
+    proxy.client("s3", config=Config(connect_timeout=1))
+    config = session.client.call_args.kwargs["config"]
+    assert config.max_pool_connections == 32
+    assert config.connect_timeout == 1
+
+
+def test_get_boto_session_passes_pool_size():
+    proxy = _get_boto_session(CREDS_A, max_pool_connections=32)
+    assert proxy._max_pool_connections == 32
+
+
+def test_prime_clients_builds_idle_pooled_clients(pool):
+    with patch("cloudformation_cli_python_lib.boto3_proxy.CLIENT_POOL", pool):
+        assert prime_clients(["s3", "sqs"], ["us-west-2"], 16) == 2
+        assert prime_clients(["s3", "not-a-service"], ["us-west-2"], 16) == 1
+        assert len(pool) == 2
+
+        proxy = _get_boto_session(CREDS_A, "us-west-2", max_pool_connections=16)
+        with patch("boto3.session.Session") as mock_session:
+            client = proxy.client("s3")
+        mock_session.assert_not_called()
+    assert len(pool) == 2
+    assert signer_access_key(client) == "AKIDA"
+
+
+def test_reset_connections_closes_http_sessions(pool):
+    proxy = make_proxy(CREDS_A)
+    client = pool.client(proxy, CREDS_A, "s3", {})
+    with patch.object(client._endpoint.http_session, "close") as mock_close:
+        pool.reset_connections()
+    mock_close.assert_called_once_with()
@@ -0,0 +1,41 @@
+from cloudformation_cli_python_lib.circuit_breaker import CircuitBreaker
+
+import logging
+from unittest.mock import patch
+
+MONOTONIC = "cloudformation_cli_python_lib.circuit_breaker.time.monotonic"
+
+
+def test_opens_after_consecutive_failures(caplog):
+    breaker = CircuitBreaker("metrics publishing", max_failures=2, cool_down=30.0)
+    with patch(MONOTONIC, return_value=100.0), caplog.at_level(logging.WARNING):
+        breaker.record(succeeded=False)
+        breaker.record(succeeded=True)
+        breaker.record(succeeded=False)
+        assert breaker.allow()
+        breaker.record(succeeded=False)
+        assert not breaker.allow(5)
+        assert not breaker.allow()
+    assert breaker.skipped == 6
+    assert caplog.messages == [
+        "Metrics publishing failed 2 times in a row, pausing it for 30.0 seconds"
+    ]
+
+
+def test_half_open_after_cool_down():
+    breaker = CircuitBreaker("log delivery", max_failures=2, cool_down=30.0)
+    with patch(MONOTONIC) as monotonic:
+        monotonic.return_value = 100.0
+        breaker.record(succeeded=False)
+        breaker.record(succeeded=False)
+        monotonic.return_value = 130.0
+        assert breaker.allow()
+        # one more failure is enough to open it again
+        breaker.record(succeeded=False)
+        assert not breaker.allow()
+        monotonic.return_value = 160.0
+        assert breaker.allow()
+        breaker.record(succeeded=True)
+        breaker.record(succeeded=False)
+        assert breaker.allow()
+    assert breaker.skipped == 1
@@ -0,0 +1,134 @@
+# pylint: disable=redefined-outer-name,protected-access,no-member
+import pytest
+from cloudformation_cli_python_lib.concurrency import (
+    DEFAULT_MAX_WORKERS,
+    HandlerExecutor,
+)
+from cloudformation_cli_python_lib.deadline import DeadlineExceeded
+from cloudformation_cli_python_lib.exceptions import InternalFailure, NotFound
+
+import threading
+import time
+
+
+@pytest.fixture
+def executor():
+    executor = HandlerExecutor(max_workers=4)
+    yield executor
+    executor.shutdown()
+
+
+def test_executor_is_created_lazily_and_reused(executor):
+    assert executor._executor is None
+    executor.map(str, [1])
+    pool = executor._executor
+    executor.map(str, [2])
+    assert executor._executor is pool
+
+
+def test_executor_default_size():
+    assert HandlerExecutor().max_workers == DEFAULT_MAX_WORKERS
+
+
+def test_executor_rejects_empty_pool():
+    with pytest.raises(ValueError):
+        HandlerExecutor(max_workers=0)
+
+
+def test_map_keeps_order(executor):
+    def slow_square(n):
+        time.sleep((5 - n) / 1000.0)
+        return n * n
+
+    assert executor.map(slow_square, range(6)) == [0, 1, 4, 9, 16, 25]
+    assert executor.map(slow_square, []) == []
+
+
+def test_map_runs_concurrently(executor):
+    barrier = threading.Barrier(4, timeout=5)
+    assert executor.map(lambda n: barrier.wait() is not None, range(4)) == [True] * 4
+
+
+@pytest.mark.parametrize("max_workers,expected", [(None, 4), (2, 2), (100, 4)])
+def test_map_bounds_calls_in_flight(executor, max_workers, expected):
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def track(_item):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.pop()
+
+    executor.map(track, range(12), max_workers=max_workers)
+    assert max(peak) == expected
+
+
+def test_map_propagates_handler_errors(executor):
+    def lookup(item):
+        raise NotFound("AWS::Test::Thing", item)
+
+    with pytest.raises(NotFound):
+        executor.map(lookup, ["a"])
+
+
+def test_map_propagates_deadline(executor):
+    def checkpoint(_item):
+        raise DeadlineExceeded({"done": 1})
+
+    with pytest.raises(DeadlineExceeded):
+        executor.map(checkpoint, ["a"])
+
+
+def test_map_wraps_other_errors(executor):
+    def fail(_item):
+        raise KeyError("boom")
+
+    with pytest.raises(InternalFailure) as excinfo:
+        executor.map(fail, ["a"])
+    assert str(excinfo.value) == "'boom' (KeyError)"
+    assert isinstance(excinfo.value.__cause__, KeyError)
+
+
+def test_map_cancels_pending_calls_on_failure(executor):
+    started = []
+
+    def work(item):
+        started.append(item)
+        if item == 0:
+            raise KeyError(item)
+        time.sleep(0.05)
+
+    with pytest.raises(InternalFailure):
+        executor.map(work, range(20), max_workers=2)
+    time.sleep(0.1)
+    assert len(started) < 20
+
+
+def test_map_waits_for_running_calls_on_failure(executor, caplog):
+    finished = []
+    started = threading.Barrier(4)
+
+    def work(item):
+        # every call is running by the time the first one fails
+        started.wait(5)
+        if item == 0:
+            raise KeyError(item)
+        time.sleep(0.1)
+        finished.append(item)
+        if item == 1:
+            raise ValueError(item)
+
+    with pytest.raises(InternalFailure):
+        executor.map(work, range(4))
+    # every call that had started is over before the failure is raised
+    assert sorted(finished) == [1, 2, 3]
+    errors = [r.exc_info[0] for r in caplog.records if r.exc_info]
+    assert errors == [KeyError, ValueError]
+
+
+def test_shutdown_without_pool():
+    HandlerExecutor().shutdown()
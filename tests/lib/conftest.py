@@ -0,0 +1,11 @@
+import pytest
+
+import signal
+
+
+@pytest.fixture(autouse=True)
+def restore_sigterm_handler():
+    # metric aggregators install one for the container's shutdown
+    handler = signal.getsignal(signal.SIGTERM)
+    yield
+    signal.signal(signal.SIGTERM, handler)
@@ -0,0 +1,108 @@
+import pytest
+from cloudformation_cli_python_lib.deadline import (
+    DEFAULT_SAFETY_MARGIN_SECONDS,
+    Deadline,
+    DeadlineExceeded,
+)
+from cloudformation_cli_python_lib.interface import OperationStatus, ProgressEvent
+from cloudformation_cli_python_lib.utils import resolve_awaitable
+
+import asyncio
+import math
+from unittest.mock import Mock, patch, sentinel
+
+MONOTONIC = "cloudformation_cli_python_lib.deadline.time.monotonic"
+
+
+def test_deadline_without_limit():
+    deadline = Deadline(None)
+    assert deadline.remaining() == math.inf
+    assert not deadline.expired()
+    deadline.check()
+
+
+def test_deadline_subtracts_safety_margin():
+    with patch(MONOTONIC, return_value=100.0):
+        deadline = Deadline(60000, safety_margin=15.0)
+        assert deadline.remaining() == 45.0
+    with patch(MONOTONIC, return_value=145.0):
+        assert deadline.remaining() == 0.0
+        assert deadline.expired()
+
+
+def test_deadline_never_negative():
+    with patch(MONOTONIC, return_value=100.0):
+        deadline = Deadline(1000, safety_margin=15.0)
+        assert deadline.remaining() == 0.0
+
+
+def test_deadline_from_context():
+    context = Mock(spec_set=["get_remaining_time_in_millis"])
+    context.get_remaining_time_in_millis.return_value = 60000
+    with patch(MONOTONIC, return_value=0.0):
+        deadline = Deadline.from_context(context)
+        assert deadline.remaining() == 60.0 - DEFAULT_SAFETY_MARGIN_SECONDS
+        deadline = Deadline.from_context(context, safety_margin=1.0)
+        assert deadline.remaining() == 59.0
+
+
+def test_deadline_from_missing_context():
+    assert Deadline.from_context(None).remaining() == math.inf
+
+
+def test_deadline_check_raises_once_expired():
+    deadline = Deadline(0)
+    with pytest.raises(DeadlineExceeded) as excinfo:
+        deadline.check({"step": 2}, callback_delay_seconds=5)
+    assert excinfo.value.callback_context == {"step": 2}
+    assert excinfo.value.callback_delay_seconds == 5
+
+
+def test_deadline_exceeded_to_progress_event():
+    event = DeadlineExceeded({"step": 2}, 5).to_progress_event(
+        {"step": 1}, sentinel.model
+    )
+    assert event == ProgressEvent(
+        status=OperationStatus.IN_PROGRESS,
+        resourceModel=sentinel.model,
+        callbackContext={"step": 2},
+        callbackDelaySeconds=5,
+    )
+
+
+def test_deadline_exceeded_defaults_to_handler_context():
+    event = DeadlineExceeded().to_progress_event({"step": 1})
+    assert event.status == OperationStatus.IN_PROGRESS
+    assert event.callbackContext == {"step": 1}
+    assert event.callbackDelaySeconds == 0
+
+
+def test_wait_for_returns_result():
+    async def handler():
+        return sentinel.result
+
+    assert resolve_awaitable(handler(), Deadline(None)) is sentinel.result
+    assert resolve_awaitable(handler(), Deadline(60000)) is sentinel.result
+
+
+def test_wait_for_cancels_at_deadline():
+    cancelled = []
+
+    async def handler():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(DeadlineExceeded):
+        resolve_awaitable(handler(), Deadline(50))
+    assert cancelled == [True]
+
+
+def test_wait_for_keeps_handler_timeouts():
+    async def handler():
+        await asyncio.wait_for(asyncio.sleep(10), 0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        resolve_awaitable(handler(), Deadline(60000))
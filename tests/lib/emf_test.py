@@ -0,0 +1,67 @@
+from cloudformation_cli_python_lib.emf import emf_documents, write_emf_to_stdout
+from cloudformation_cli_python_lib.metrics import format_dimensions
+
+import json
+
+NAMESPACE = "AWS/CloudFormation/Aa/Bb/Cc"
+
+
+def datum(name, value, timestamp="2019-01-01 00:00:00", **dimensions):
+    return {
+        "MetricName": name,
+        "Dimensions": format_dimensions(dimensions),
+        "Unit": "Count",
+        "Timestamp": timestamp,
+        "Value": value,
+    }
+
+
+def test_emf_documents_group_by_timestamp_and_dimensions():
+    documents = emf_documents(
+        NAMESPACE,
+        [
+            datum("Invocations", 1.0, Action="CREATE"),
+            datum("Errors", 0.0, Action="CREATE"),
+            datum("Invocations", 1.0, Action="CREATE"),
+            datum("Invocations", 1.0, Action="CREATE"),
+            datum("Invocations", 1.0, Action="CREATE", Phase="handler"),
+            datum("Invocations", 1.0, "2019-01-01 00:00:01+00:00", Action="CREATE"),
+        ],
+    )
+    first, second, third = [json.loads(document) for document in documents]
+    assert first == {
+        "_aws": {
+            "Timestamp": 1546300800000,
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": NAMESPACE,
+                    "Dimensions": [["Action"]],
+                    "Metrics": [
+                        {"Name": "Invocations", "Unit": "Count"},
+                        {"Name": "Errors", "Unit": "Count"},
+                    ],
+                }
+            ],
+        },
+        "Action": "CREATE",
+        "Invocations": [1.0, 1.0, 1.0],
+        "Errors": 0.0,
+    }
+    assert second["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Action", "Phase"]]
+    assert third["_aws"]["Timestamp"] == 1546300801000
+
+
+def test_emf_documents_metric_limit():
+    datums = [datum(f"Metric{i}", 1.0) for i in range(101)] + [datum("Metric0", 2.0)]
+    first, second = [json.loads(document) for document in emf_documents("ns", datums)]
+    assert len(first["_aws"]["CloudWatchMetrics"][0]["Metrics"]) == 100
+    assert second["_aws"]["CloudWatchMetrics"][0]["Metrics"] == [
+        {"Name": "Metric100", "Unit": "Count"},
+        {"Name": "Metric0", "Unit": "Count"},
+    ]
+    assert (first["Metric0"], second["Metric0"]) == (1.0, 2.0)
+
+
+def test_write_emf_to_stdout(capsys):
+    write_emf_to_stdout(["{}", "{}"])
+    assert capsys.readouterr().out == "{}\n{}\n"
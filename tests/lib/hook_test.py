@@ -3,6 +3,8 @@ from dataclasses import dataclass
 
 import pytest
 from cloudformation_cli_python_lib import Hook
+from cloudformation_cli_python_lib.deadline import Deadline
+from cloudformation_cli_python_lib.emf import write_emf_to_stdout
 from cloudformation_cli_python_lib.exceptions import InternalFailure, InvalidRequest
 from cloudformation_cli_python_lib.hook import _ensure_serialize
 from cloudformation_cli_python_lib.interface import (
@@ -11,14 +13,24 @@ from cloudformation_cli_python_lib.interface import (
     HookInvocationPoint,
     HookProgressEvent,
     HookStatus,
+    MetricsDestination,
     OperationStatus,
     ProgressEvent,
 )
+from cloudformation_cli_python_lib.log_delivery import HookProviderLogHandler
+from cloudformation_cli_python_lib.metrics import (
+    MetricAggregator,
+    MetricsPublisherProxy,
+)
+from cloudformation_cli_python_lib.profiling import ProfilingConfig
+from cloudformation_cli_python_lib.timing import NULL_PHASE_TIMER
 from cloudformation_cli_python_lib.utils import Credentials, HookInvocationRequest
 
+import asyncio
 import json
+import logging
 from datetime import datetime
-from unittest.mock import Mock, call, patch, sentinel
+from unittest.mock import ANY, Mock, call, patch, sentinel
 
 ENTRYPOINT_PAYLOAD = {
     "awsAccountId": "123456789012",
@@ -69,11 +81,31 @@ def patch_and_raise(hook, str_to_patch, exc_cls, entrypoint):
 
 def test_entrypoint_handler_error(hook):
     with patch("cloudformation_cli_python_lib.hook.HookProviderLogHandler.setup"):
-        event = hook.__call__.__wrapped__(hook, {}, None)  # pylint: disable=no-member
+        event = hook.__call__.__wrapped__(
+            hook, {}, None
+        )._serialize()  # pylint: disable=no-member
     assert event["hookStatus"] == HookStatus.FAILED.value
     assert event["errorCode"] == HandlerErrorCode.InvalidRequest
 
 
+@pytest.mark.parametrize("background", [False, True])
+def test_entrypoint_background_logs(background):
+    hook = Hook(TYPE_NAME, Mock(), background_logs=background)
+    event = ProgressEvent(status=OperationStatus.SUCCESS, message="")
+    hook.handler(HookInvocationPoint.CREATE_PRE_PROVISION)(Mock(return_value=event))
+
+    with patch(
+        "cloudformation_cli_python_lib.hook.HookProviderLogHandler.setup"
+    ) as mock_log_delivery:
+        hook.__call__.__wrapped__(  # pylint: disable=no-member
+            hook, ENTRYPOINT_PAYLOAD, None
+        )
+    kwargs = mock_log_delivery.call_args.kwargs
+    assert kwargs["background"] is background
+    # delivery failures are reported with the invocation's metrics
+    assert isinstance(kwargs["metrics"], MetricsPublisherProxy)
+
+
 def test_entrypoint_success():
     hook = Hook(TYPE_NAME, Mock())
     event = ProgressEvent(status=OperationStatus.SUCCESS, message="")
@@ -88,7 +120,7 @@ def test_entrypoint_success():
     ):
         event = hook.__call__.__wrapped__(  # pylint: disable=no-member
             hook, ENTRYPOINT_PAYLOAD, None
-        )
+        )._serialize()
     mock_log_delivery.assert_called_once()
 
     assert event == {
@@ -115,14 +147,14 @@ def test_entrypoint_handler_raises():
     with patch(
         "cloudformation_cli_python_lib.hook.HookProviderLogHandler.setup"
     ), patch(
-        "cloudformation_cli_python_lib.hook.MetricsPublisherProxy"
+        "cloudformation_cli_python_lib.instrumentation.MetricsPublisherProxy"
     ) as mock_metrics, patch(
         "cloudformation_cli_python_lib.hook.Hook._invoke_handler"
     ) as mock__invoke_handler:
         mock__invoke_handler.side_effect = InvalidRequest("handler failed")
         event = hook.__call__.__wrapped__(  # pylint: disable=no-member
             hook, ENTRYPOINT_PAYLOAD, None
-        )
+        )._serialize()
 
     mock_metrics.return_value.publish_exception_metric.assert_called_once()
 
@@ -175,7 +207,7 @@ def test_entrypoint_success_without_caller_provider_creds():
         payload["requestData"]["callerCredentials"] = None
         event = hook.__call__.__wrapped__(  # pylint: disable=no-member
             hook, payload, None
-        )
+        )._serialize()
         assert event == expected
 
         # Credentials are undefined in payload
@@ -184,7 +216,7 @@ def test_entrypoint_success_without_caller_provider_creds():
 
         event = hook.__call__.__wrapped__(  # pylint: disable=no-member
             hook, payload, None
-        )
+        )._serialize()
         assert event == expected
 
 
@@ -214,7 +246,8 @@ def test__parse_request_valid_request_and__cast_hook_request():
             call(
                 Credentials(
                     **json.loads(ENTRYPOINT_PAYLOAD["requestData"]["callerCredentials"])
-                )
+                ),
+                max_pool_connections=None,
             ),
             call(
                 Credentials(
@@ -261,7 +294,9 @@ def test__parse_request_valid_request_and__cast_hook_request():
 @pytest.mark.parametrize("exc_cls", [Exception, BaseException])
 def test_entrypoint_uncaught_exception(hook, exc_cls):
     with patch("cloudformation_cli_python_lib.hook.HookProviderLogHandler.setup"):
-        event = patch_and_raise(hook, "_parse_request", exc_cls, hook.__call__)
+        event = patch_and_raise(
+            hook, "_parse_request", exc_cls, hook.__call__
+        )._serialize()
     assert event["hookStatus"] == HookStatus.FAILED
     assert event["errorCode"] == HandlerErrorCode.InternalFailure
 
@@ -314,6 +349,7 @@ def test__invoke_handler_not_found(hook):
 
 
 def test__invoke_handler_was_found(hook):
+    request = Mock(deadline=None)
     progress_event = ProgressEvent(status=OperationStatus.IN_PROGRESS)
     mock_handler = hook.handler(HookInvocationPoint.CREATE_PRE_PROVISION)(
         Mock(return_value=progress_event)
@@ -321,7 +357,7 @@ def test__invoke_handler_was_found(hook):
 
     resp = hook._invoke_handler(
         sentinel.session,
-        sentinel.request,
+        request,
         HookInvocationPoint.CREATE_PRE_PROVISION,
         sentinel.context,
         sentinel.type_configuration,
@@ -329,12 +365,55 @@ def test__invoke_handler_was_found(hook):
     assert resp is progress_event
     mock_handler.assert_called_once_with(
         sentinel.session,
-        sentinel.request,
+        request,
         sentinel.context,
         sentinel.type_configuration,
     )
 
 
+def test__invoke_handler_async_handler(hook):
+    request = Mock(deadline=None)
+    progress_event = ProgressEvent(status=OperationStatus.SUCCESS)
+
+    @hook.handler(HookInvocationPoint.CREATE_PRE_PROVISION)
+    async def handler(session, request, _callback_context, type_configuration):
+        results = await asyncio.gather(
+            asyncio.sleep(0, result=session), asyncio.sleep(0, result=request)
+        )
+        assert results == [sentinel.session, request]
+        assert type_configuration is sentinel.type_configuration
+        return progress_event
+
+    resp = hook._invoke_handler(
+        sentinel.session,
+        request,
+        HookInvocationPoint.CREATE_PRE_PROVISION,
+        sentinel.context,
+        sentinel.type_configuration,
+    )
+    assert resp is progress_event
+
+
+def test__invoke_handler_checkpoints_at_deadline(hook):
+    request = Mock(deadline=Deadline(50))
+
+    @hook.handler(HookInvocationPoint.CREATE_PRE_PROVISION)
+    async def handler(_session, _request, callback_context, _type_configuration):
+        callback_context["step"] = 2
+        await asyncio.sleep(10)
+
+    resp = hook._invoke_handler(
+        sentinel.session,
+        request,
+        HookInvocationPoint.CREATE_PRE_PROVISION,
+        {"step": 1},
+        sentinel.type_configuration,
+    )
+    assert resp == ProgressEvent(
+        status=OperationStatus.IN_PROGRESS, callbackContext={"step": 2}
+    )
+
+
 @pytest.mark.parametrize("event,messages", [({}, ("missing", "credentials"))])
 def test__parse_test_request_invalid_request(hook, event, messages):
     with pytest.raises(InternalFailure) as excinfo:
@@ -434,10 +513,14 @@ def test_test_entrypoint_success():
         "typeConfiguration": sentinel.type_configuration,
     }
 
+    context = Mock(spec_set=["get_remaining_time_in_millis"])
+    context.get_remaining_time_in_millis.return_value = 60000
     event = hook.test_entrypoint.__wrapped__(  # pylint: disable=no-member
-        hook, payload, None
+        hook, payload, context
     )
     assert event is progress_event
+    request = mock_handler.call_args.args[1]
+    assert 49.0 < request.deadline.remaining() <= 50.0
 
     mock_type_configuration_model._deserialize.assert_has_calls(
         [call(sentinel.type_configuration)]
@@ -445,6 +528,66 @@ def test_test_entrypoint_success():
     mock_handler.assert_called_once()
 
 
+@pytest.mark.parametrize("phase_timing", [True, False])
+def test_test_entrypoint_times_phases(caplog, phase_timing):
+    hook = Hook(TYPE_NAME, Mock(), phase_timing=phase_timing)
+    timers = []
+
+    @hook.handler(HookInvocationPoint.CREATE_PRE_PROVISION)
+    def handler(_session, request, _callback_context, _type_configuration):
+        timers.append(request.timer)
+        with request.timer.phase("describe"):
+            return ProgressEvent(status=OperationStatus.SUCCESS)
+
+    payload = {
+        "credentials": {"accessKeyId": "", "secretAccessKey": "", "sessionToken": ""},
+        "actionInvocationPoint": "CREATE_PRE_PROVISION",
+        "request": {
+            "clientRequestToken": "ecba020e-b2e6-4742-a7d0-8a06ae7c4b2b",
+        },
+    }
+
+    with caplog.at_level(logging.INFO, "cloudformation_cli_python_lib.timing"):
+        event = hook.test_entrypoint(payload, None)
+    assert event["status"] == OperationStatus.SUCCESS.value
+    lines = [r.getMessage() for r in caplog.records if r.name.endswith("timing")]
+    if not phase_timing:
+        assert timers == [NULL_PHASE_TIMER]
+        assert not lines
+        return
+    assert list(timers[0].phases) == [
+        "parse_request",
+        "describe",
+        "handler",
+        "serialize",
+    ]
+    (line,) = lines
+    assert '"action": "CREATE_PRE_PROVISION"' in line
+
+
+def test_test_entrypoint_handler_records_metrics():
+    hook = Hook(TYPE_NAME, Mock())
+
+    @hook.handler(HookInvocationPoint.CREATE_PRE_PROVISION)
+    def handler(_session, request, _callback_context, _type_configuration):
+        request.metrics.count("ResourcesChecked")
+        request.metrics.timing("CheckWait", 12.5)
+        return ProgressEvent(status=OperationStatus.SUCCESS)
+
+    payload = {
+        "credentials": {"accessKeyId": "", "secretAccessKey": "", "sessionToken": ""},
+        "actionInvocationPoint": "CREATE_PRE_PROVISION",
+        "request": {
+            "clientRequestToken": "ecba020e-b2e6-4742-a7d0-8a06ae7c4b2b",
+        },
+    }
+
+    with patch("cloudformation_cli_python_lib.metrics.MetricsPublisher") as publisher:
+        event = hook.test_entrypoint(payload, None)
+    assert event["status"] == OperationStatus.SUCCESS.value
+    publisher.assert_not_called()
+
+
 @pytest.mark.parametrize(
     "operation_status,hook_status",
     [
@@ -456,3 +599,155 @@ def test_test_entrypoint_success():
 )
 def test_get_hook_status(operation_status, hook_status):
     assert hook_status == Hook._get_hook_status(operation_status)
+
+
+def test_map_concurrently():
+    hook = Hook(TYPE_NAME, Mock(), max_workers=3)
+    assert hook._executor.max_workers == 3
+    assert hook.map_concurrently(str, [1, 2, 3]) == ["1", "2", "3"]
+
+
+def test_prime():
+    hook = Hook(TYPE_NAME, sentinel.type_configuration, services=["s3"])
+    with patch("cloudformation_cli_python_lib.hook.prime") as mock_prime:
+        hook.prime(target_models=[sentinel.target_model])
+    kwargs = mock_prime.call_args.kwargs
+    assert kwargs["models"] == (sentinel.type_configuration, sentinel.target_model)
+    assert kwargs["services"] == ["s3"]
+    assert kwargs["regions"] == (None,)
+    assert kwargs["response"].hookStatus == HookStatus.SUCCESS
+
+
+def test_after_restore():
+    with patch("cloudformation_cli_python_lib.hook.after_restore") as mock_restore:
+        Hook.after_restore()
+    mock_restore.assert_called_once_with()
+
+
+def test_entrypoint_times_phases(caplog):
+    hook = Hook(TYPE_NAME, Mock(), phase_metrics=True)
+
+    def handler(_session, request, _callback_context, _type_configuration):
+        with request.timer.phase("evaluate"):
+            return ProgressEvent(status=OperationStatus.SUCCESS)
+
+    hook.handler(HookInvocationPoint.CREATE_PRE_PROVISION)(handler)
+    with patch(
+        "cloudformation_cli_python_lib.hook.HookProviderLogHandler.setup"
+    ), patch(
+        "cloudformation_cli_python_lib.instrumentation.MetricsPublisherProxy"
+    ) as mock_metrics, caplog.at_level(
+        logging.INFO, "cloudformation_cli_python_lib.timing"
+    ):
+        event = hook(ENTRYPOINT_PAYLOAD, None)
+    assert event["hookStatus"] == HookStatus.SUCCESS
+    (line,) = [r.getMessage() for r in caplog.records if r.name.endswith("timing")]
+    assert '"loaderCache": {"hits": ' in line
+    mock_metrics.assert_called_once_with(buffered=True, emf_sink=None)
+    (phases,) = mock_metrics.return_value.publish_phase_metrics.call_args.args[2:]
+    mock_metrics.return_value.flush.assert_called_once_with(ANY)
+    assert list(phases) == [
+        "parse_request",
+        "cast_request",
+        "log_setup",
+        "metrics",
+        "evaluate",
+        "handler",
+        "serialize",
+    ]
+
+
+def test_entrypoint_without_phase_timing(caplog):
+    hook = Hook(TYPE_NAME, Mock(), phase_timing=False)
+    hook.handler(HookInvocationPoint.CREATE_PRE_PROVISION)(
+        lambda *_args: ProgressEvent(status=OperationStatus.SUCCESS)
+    )
+    with patch(
+        "cloudformation_cli_python_lib.hook.HookProviderLogHandler.setup"
+    ), patch(
+        "cloudformation_cli_python_lib.instrumentation.MetricsPublisherProxy"
+    ), caplog.at_level(
+        logging.INFO, "cloudformation_cli_python_lib.timing"
+    ):
+        event = hook(ENTRYPOINT_PAYLOAD, None)
+    assert event["hookStatus"] == HookStatus.SUCCESS
+    assert not [r for r in caplog.records if r.name.endswith("timing")]
+
+
+def test_entrypoint_flushes_provider_logs():
+    hook = Hook(TYPE_NAME, Mock())
+    hook.handler(HookInvocationPoint.CREATE_PRE_PROVISION)(
+        lambda *_args: ProgressEvent(status=OperationStatus.SUCCESS)
+    )
+    with patch(
+        "cloudformation_cli_python_lib.hook.HookProviderLogHandler.setup"
+    ), patch(
+        "cloudformation_cli_python_lib.instrumentation.MetricsPublisherProxy"
+    ), patch.object(
+        HookProviderLogHandler, "flush_existing"
+    ) as mock_flush:
+        event = hook(ENTRYPOINT_PAYLOAD, None)
+    assert event["hookStatus"] == HookStatus.SUCCESS
+    mock_flush.assert_called_once()
+
+
+def test_entrypoint_profiles_handler():
+    hook = Hook(TYPE_NAME, Mock(), profiling=ProfilingConfig(1.0))
+    hook.handler(HookInvocationPoint.CREATE_PRE_PROVISION)(Mock())
+    with patch(
+        "cloudformation_cli_python_lib.hook.HookProviderLogHandler.setup"
+    ), patch(
+        "cloudformation_cli_python_lib.instrumentation.MetricsPublisherProxy"
+    ), patch(
+        "cloudformation_cli_python_lib.hook.ProfilingConfig.profile"
+    ) as mock_profile:
+        hook(ENTRYPOINT_PAYLOAD, None)
+    mock_profile.assert_called_once_with("CREATE_PRE_PROVISION")
+
+
+@pytest.mark.parametrize(
+    "destination,sink",
+    [
+        (MetricsDestination.PUT_METRIC_DATA, None),
+        (MetricsDestination.EMF_STDOUT, write_emf_to_stdout),
+        (MetricsDestination.EMF_PROVIDER_LOG, HookProviderLogHandler.write_emf),
+    ],
+)
+def test_metrics_destination(destination, sink):
+    hook = Hook(TYPE_NAME, Mock(), metrics_destination=destination)
+    assert hook._emf_sink() == sink
+
+
+@pytest.mark.parametrize(
+    "destination,background",
+    [
+        (MetricsDestination.PUT_METRIC_DATA, True),
+        (MetricsDestination.EMF_STDOUT, False),
+    ],
+)
+def test_background_metrics(destination, background):
+    hook = Hook(
+        TYPE_NAME, Mock(), metrics_destination=destination, background_metrics=True
+    )
+    proxy = hook._metrics_proxy()
+    assert (proxy._flusher is hook._metrics_flusher) is background
+    assert proxy._options["buffered"] is not background
+
+
+@pytest.mark.parametrize(
+    "destination,aggregated",
+    [
+        (MetricsDestination.PUT_METRIC_DATA, True),
+        (MetricsDestination.EMF_STDOUT, False),
+    ],
+)
+def test_metrics_aggregator(destination, aggregated):
+    aggregator = MetricAggregator()
+    hook = Hook(
+        TYPE_NAME,
+        Mock(),
+        metrics_destination=destination,
+        metrics_aggregator=aggregator,
+    )
+    proxy = hook._metrics_proxy()
+    assert (proxy._aggregator is aggregator) is aggregated
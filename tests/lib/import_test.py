@@ -0,0 +1,62 @@
+import pytest
+
+import subprocess
+import sys
+
+# import times are compared with importing boto3 in the same run, at their
+# best of a few, so that a busy machine slows both down alike
+RUNS = 3
+
+
+def import_time(statement, module="cloudformation_cli_python_lib"):
+    script = (
+        f"{statement}\n"
+        "import sys\n"
+        "print(sorted(m for m in ('boto3', 'botocore') if m in sys.modules))\n"
+    )
+    result = subprocess.run(  # nosec
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    cumulative = 0
+    for line in result.stderr.splitlines():
+        _self, total, name = line.split("|")
+        if name.strip() == module:
+            cumulative = int(total)
+    return cumulative, result.stdout.strip()
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import cloudformation_cli_python_lib",
+        "from cloudformation_cli_python_lib import Resource",
+        "from cloudformation_cli_python_lib import Hook",
+    ],
+)
+def test_import_does_not_load_boto(statement):
+    cumulative, loaded = import_time(statement)
+    assert loaded == "[]"
+    assert cumulative > 0
+
+
+def test_import_takes_a_fraction_of_boto3():
+    library = min(
+        import_time("from cloudformation_cli_python_lib import Resource")[0]
+        for _ in range(RUNS)
+    )
+    boto3 = min(import_time("import boto3", "boto3")[0] for _ in range(RUNS))
+    assert 0 < library < boto3 / 2
+
+
+def test_lazy_attributes():
+    # pylint: disable=import-outside-toplevel
+    import cloudformation_cli_python_lib
+    from cloudformation_cli_python_lib.boto3_proxy import SessionProxy
+
+    assert cloudformation_cli_python_lib.SessionProxy is SessionProxy
+    assert "Resource" in dir(cloudformation_cli_python_lib)
+    with pytest.raises(AttributeError):
+        cloudformation_cli_python_lib.Missing  # pylint: disable=pointless-statement
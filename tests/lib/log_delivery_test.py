@@ -1,9 +1,15 @@
-# pylint: disable=redefined-outer-name,protected-access
+# pylint: disable=redefined-outer-name,protected-access,no-member
 import pytest
+from cloudformation_cli_python_lib.deadline import Deadline
 from cloudformation_cli_python_lib.log_delivery import (
+    MAX_BATCH_SPAN_MILLIS,
+    MAX_EVENT_BYTES,
     HookProviderLogHandler,
     ProviderFilter,
     ProviderLogHandler,
+    _truncate,
+    log_event_batches,
+    logs_client_config,
 )
 from cloudformation_cli_python_lib.utils import (
     HandlerRequest,
@@ -15,7 +21,10 @@ from cloudformation_cli_python_lib.utils import (
 import botocore.errorfactory
 import botocore.session
 import logging
-from unittest.mock import DEFAULT, Mock, create_autospec, patch
+import threading
+import time
+from botocore.awsrequest import AWSResponse
+from unittest.mock import ANY, DEFAULT, Mock, create_autospec, patch, sentinel
 from uuid import uuid4
 
 logs_model = botocore.session.get_session().get_service_model("logs")
@@ -162,7 +171,7 @@ def test_setup_with_provider_creds_and_stack_id_and_logical_resource_id(
     with p_logger as mock_log, p__get_logger as mock_get:
         mock_get.return_value = None
         ProviderLogHandler.setup(payload, mock_session)
-    mock_session.client.assert_called_once_with("logs")
+    mock_session.client.assert_called_once_with("logs", config=ANY)
     mock_log.return_value.addHandler.assert_called_once()
     plh = mock_log.return_value.addHandler.call_args[0][0]
     assert payload.stackId in plh.stream
@@ -175,7 +184,7 @@ def test_setup_with_provider_creds_without_stack_id(setup_patches, mock_session)
     with p_logger as mock_log, p__get_logger as mock_get:
         mock_get.return_value = None
         ProviderLogHandler.setup(payload, mock_session)
-    mock_session.client.assert_called_once_with("logs")
+    mock_session.client.assert_called_once_with("logs", config=ANY)
     mock_log.return_value.addHandler.assert_called_once()
     plh = mock_log.return_value.addHandler.call_args[0][0]
     assert payload.awsAccountId in plh.stream
@@ -190,7 +199,7 @@ def test_setup_with_provider_creds_without_logical_resource_id(
     with p_logger as mock_log, p__get_logger as mock_get:
         mock_get.return_value = None
         ProviderLogHandler.setup(payload, mock_session)
-    mock_session.client.assert_called_once_with("logs")
+    mock_session.client.assert_called_once_with("logs", config=ANY)
     mock_log.return_value.addHandler.assert_called_once()
     plh = mock_log.return_value.addHandler.call_args[0][0]
     assert payload.awsAccountId in plh.stream
@@ -203,9 +212,35 @@ def test_setup_existing_logger(setup_patches, mock_session):
     payload, _hook_payload, p_logger, p__get_logger, _p__get_hook_logger = setup_patches
     with p_logger as mock_log, p__get_logger as mock_get:
         mock_get.return_value = existing
-        ProviderLogHandler.setup(payload, mock_session)
-    mock_session.client.assert_called_once_with("logs")
+        ProviderLogHandler.setup(payload, mock_session, metrics=sentinel.metrics)
+    mock_session.client.assert_called_once_with("logs", config=ANY)
     mock_log.return_value.addHandler.assert_not_called()
+    assert existing.metrics is sentinel.metrics
+
+
+def test_setup_background(setup_patches, mock_session):
+    payload, _hook_payload, p_logger, p__get_logger, _p__get_hook_logger = setup_patches
+    with p_logger as mock_log, p__get_logger as mock_get:
+        mock_get.return_value = None
+        ProviderLogHandler.setup(
+            payload, mock_session, background=True, metrics=sentinel.metrics
+        )
+    plh = mock_log.return_value.addHandler.call_args[0][0]
+    assert plh.background
+    assert plh.metrics is sentinel.metrics
+
+
+def test_setup_creates_stream_eagerly(setup_patches, mock_session):
+    payload, hook_payload, p_logger, p__get_logger, p__get_hook_logger = setup_patches
+    p_create = patch.object(ProviderLogHandler, "create_stream_eagerly")
+    with p_create as mock_create, p_logger as mock_log, p__get_logger as mock_get:
+        with p__get_hook_logger as mock_get_hook:
+            mock_get.return_value = None
+            mock_get_hook.return_value = None
+            ProviderLogHandler.setup(payload, mock_session)
+            HookProviderLogHandler.setup(hook_payload, mock_session)
+    assert mock_log.return_value.addHandler.call_count == 2
+    assert mock_create.call_count == 2
 
 
 def test_setup_with_formatter(setup_patches, mock_session, mock_handler_set_formatter):
@@ -218,7 +253,7 @@ def test_setup_with_formatter(setup_patches, mock_session, mock_handler_set_form
     with p_logger as mock_log, p__get_logger as mock_get, p__set_handler_formatter as mock_set_formatter:  # pylint: disable=C0301  # noqa: B950
         mock_get.return_value = None
         ProviderLogHandler.setup(payload, mock_session, formatter)
-    mock_session.client.assert_called_once_with("logs")
+    mock_session.client.assert_called_once_with("logs", config=ANY)
     mock_log.return_value.addHandler.assert_called_once()
     mock_set_formatter.assert_called_once_with(formatter)
 
@@ -276,37 +311,125 @@ def test__create_already_exists(mock_provider_handler, create_method):
     mock_logs_method.assert_called_once()
 
 
-@pytest.mark.parametrize("sequence_token", [None, "some-seq"])
-def test__put_log_event_success(mock_provider_handler, sequence_token):
-    mock_provider_handler.sequence_token = sequence_token
+def test__put_log_event_success(mock_provider_handler):
     mock_put = mock_provider_handler.client.put_log_events
-    mock_put.return_value = {"nextSequenceToken": "some-other-seq"}
-    mock_provider_handler._put_log_event(
-        logging.LogRecord("a", 123, "/", 234, "log-msg", [], False)
+    events = [{"timestamp": 1, "message": "log-msg"}]
+    mock_provider_handler._put_events(events)
+    mock_put.assert_called_once_with(
+        logGroupName="test-group", logStreamName="test-stream", logEvents=events
+    )
+
+
+def test__put_log_event_does_not_retry_invalid_token(mock_provider_handler):
+    mock_put = mock_provider_handler.client.put_log_events
+    mock_put.side_effect = logs_exceptions.InvalidSequenceTokenException(
+        {}, operation_name="Test"
     )
+    with pytest.raises(logs_exceptions.InvalidSequenceTokenException):
+        mock_provider_handler._send([{"timestamp": 1, "message": "log-msg"}])
     mock_put.assert_called_once()
 
 
-def test__put_log_event_invalid_token(mock_provider_handler):
+@pytest.mark.parametrize(
+    "exc_cls",
+    [logs_exceptions.ThrottlingException, logs_exceptions.ServiceUnavailableException],
+)
+def test__send_retries_with_backoff(mock_provider_handler, exc_cls):
+    mock_provider_handler.metrics = Mock()
+    mock_put = mock_provider_handler.client.put_log_events
+    error = exc_cls({}, operation_name="PutLogEvents")
+    mock_put.side_effect = [error, error, DEFAULT]
+    with patch("cloudformation_cli_python_lib.log_delivery.time.sleep") as mock_sleep:
+        mock_provider_handler._send([{"timestamp": 1, "message": "log-msg"}])
+    assert mock_put.call_count == 3
+    (first,), (second,) = (sleep.args for sleep in mock_sleep.call_args_list)
+    assert 0.1 <= first <= 0.2
+    assert 0.2 <= second <= 0.4
+    # delivered in the end, so not reported
+    mock_provider_handler.flush()
+    reported = mock_provider_handler.metrics.publish_log_delivery_exception_metric
+    reported.assert_not_called()
+
+
+def test__send_gives_up_after_max_attempts(mock_provider_handler):
+    mock_provider_handler.metrics = Mock()
     mock_put = mock_provider_handler.client.put_log_events
-    mock_put.return_value = {"nextSequenceToken": "some-other-seq"}
-    mock_put.side_effect = [
-        logs_exceptions.InvalidSequenceTokenException({}, operation_name="Test"),
-        logs_exceptions.DataAlreadyAcceptedException({}, operation_name="Test"),
-        DEFAULT,
-    ]
-    mock_provider_handler._put_log_event(
+    error = logs_exceptions.ThrottlingException({}, operation_name="PutLogEvents")
+    mock_put.side_effect = error
+    with patch(
+        "cloudformation_cli_python_lib.log_delivery.time.sleep"
+    ) as mock_sleep, pytest.raises(logs_exceptions.ThrottlingException):
+        mock_provider_handler._send([{"timestamp": 1, "message": "log-msg"}])
+    assert mock_put.call_count == 3
+    assert mock_sleep.call_count == 2
+    # reported on the next flush, once for the batch
+    mock_provider_handler.flush()
+    reported = mock_provider_handler.metrics.publish_log_delivery_exception_metric
+    reported.assert_called_once_with(ANY, error)
+
+
+def test__send_retries_within_deadline(mock_provider_handler):
+    mock_put = mock_provider_handler.client.put_log_events
+    mock_put.side_effect = logs_exceptions.ThrottlingException(
+        {}, operation_name="PutLogEvents"
+    )
+    with patch(
+        "cloudformation_cli_python_lib.log_delivery.time.sleep"
+    ) as mock_sleep, pytest.raises(logs_exceptions.ThrottlingException):
+        mock_provider_handler._send(
+            [{"timestamp": 1, "message": "log-msg"}], Deadline(0.05)
+        )
+    mock_put.assert_called_once()
+    mock_sleep.assert_not_called()
+
+
+def test_failures_wait_for_metrics(mock_provider_handler):
+    mock_provider_handler._report_failure(sentinel.error)
+    mock_provider_handler.flush()
+    assert list(mock_provider_handler._failures) == [(ANY, sentinel.error)]
+
+    # e.g. the next invocation's
+    mock_provider_handler.metrics = Mock()
+    mock_provider_handler.flush()
+    reported = mock_provider_handler.metrics.publish_log_delivery_exception_metric
+    reported.assert_called_once_with(ANY, sentinel.error)
+    assert not mock_provider_handler._failures
+
+
+def test_background_failures_reported_on_flush(mock_session):
+    handler = ProviderLogHandler("g", "s", mock_session, background=True)
+    handler.metrics = Mock()
+    handler._send = Mock(
+        side_effect=lambda *_args: handler._report_failure(sentinel.error)
+    )
+    handler.emit(logging.LogRecord("a", 123, "/", 234, "log-msg", [], False))
+    handler.flush(Deadline(10))
+    reported = handler.metrics.publish_log_delivery_exception_metric
+    reported.assert_called_once_with(ANY, sentinel.error)
+
+
+def test_flush_reports_failed_batch(mock_provider_handler):
+    mock_provider_handler.metrics = Mock()
+    mock_put = mock_provider_handler.client.put_log_events
+    error = logs_exceptions.InvalidParameterException({}, operation_name="Test")
+    mock_put.side_effect = error
+    mock_provider_handler.emit(
         logging.LogRecord("a", 123, "/", 234, "log-msg", [], False)
     )
-    assert mock_put.call_count == 3
+    mock_provider_handler.flush()
+    reported = mock_provider_handler.metrics.publish_log_delivery_exception_metric
+    reported.assert_called_once_with(ANY, error)
 
 
 def test_emit_existing_cwl_group_stream(mock_provider_handler):
-    mock_provider_handler._put_log_event = Mock()
+    mock_provider_handler._put_events = Mock()
     mock_provider_handler.emit(
         logging.LogRecord("a", 123, "/", 234, "log-msg", [], False)
     )
-    mock_provider_handler._put_log_event.assert_called_once()
+    mock_provider_handler._put_events.assert_not_called()
+    mock_provider_handler.flush()
+    mock_provider_handler.flush()
+    mock_provider_handler._put_events.assert_called_once()
 
 
 def test_emit_no_group_stream(mock_provider_handler):
@@ -314,14 +437,15 @@ def test_emit_no_group_stream(mock_provider_handler):
         {"Error": {"Message": "log group does not exist"}},
         operation_name="PutLogRecords",
     )
-    mock_provider_handler._put_log_event = Mock()
-    mock_provider_handler._put_log_event.side_effect = [group_exc, DEFAULT]
+    mock_provider_handler._put_events = Mock()
+    mock_provider_handler._put_events.side_effect = [group_exc, DEFAULT]
     mock_provider_handler._create_log_group = Mock()
     mock_provider_handler._create_log_stream = Mock()
     mock_provider_handler.emit(
         logging.LogRecord("a", 123, "/", 234, "log-msg", [], False)
     )
-    assert mock_provider_handler._put_log_event.call_count == 2
+    mock_provider_handler.flush()
+    assert mock_provider_handler._put_events.call_count == 2
     mock_provider_handler._create_log_group.assert_called_once()
     mock_provider_handler._create_log_stream.assert_called_once()
 
@@ -330,11 +454,12 @@ def test_emit_no_group_stream(mock_provider_handler):
         {"Error": {"Message": "log stream does not exist"}},
         operation_name="PutLogRecords",
     )
-    mock_provider_handler._put_log_event.side_effect = [stream_exc, DEFAULT]
+    mock_provider_handler._put_events.side_effect = [stream_exc, DEFAULT]
     mock_provider_handler.emit(
         logging.LogRecord("a", 123, "/", 234, "log-msg", [], False)
     )
-    assert mock_provider_handler._put_log_event.call_count == 4
+    mock_provider_handler.flush()
+    assert mock_provider_handler._put_events.call_count == 4
     mock_provider_handler._create_log_group.assert_called_once()
     assert mock_provider_handler._create_log_stream.call_count == 2
 
@@ -367,7 +492,7 @@ def test_setup_with_hook_provider_creds_and_stack_id_and_target_logical_id(
     with p_logger as mock_log, p__get_hook_logger as mock_get:
         mock_get.return_value = None
         HookProviderLogHandler.setup(hook_payload, mock_session)
-    mock_session.client.assert_called_once_with("logs")
+    mock_session.client.assert_called_once_with("logs", config=ANY)
     mock_log.return_value.addHandler.assert_called_once()
     plh = mock_log.return_value.addHandler.call_args[0][0]
     assert hook_payload.stackId in plh.stream
@@ -380,7 +505,7 @@ def test_setup_with_hook_provider_creds_without_stack_id(setup_patches, mock_ses
     with p_logger as mock_log, p__get_hook_logger as mock_get:
         mock_get.return_value = None
         HookProviderLogHandler.setup(hook_payload, mock_session)
-    mock_session.client.assert_called_once_with("logs")
+    mock_session.client.assert_called_once_with("logs", config=ANY)
     mock_log.return_value.addHandler.assert_called_once()
     plh = mock_log.return_value.addHandler.call_args[0][0]
     assert hook_payload.awsAccountId in plh.stream
@@ -394,7 +519,7 @@ def test_setup_with_hook_provider_creds_without_target_logical_id(
     with p_logger as mock_log, p__get_hook_logger as mock_get:
         mock_get.return_value = None
         HookProviderLogHandler.setup(hook_payload, mock_session)
-    mock_session.client.assert_called_once_with("logs")
+    mock_session.client.assert_called_once_with("logs", config=ANY)
     mock_log.return_value.addHandler.assert_called_once()
     plh = mock_log.return_value.addHandler.call_args[0][0]
     assert hook_payload.awsAccountId in plh.stream
@@ -406,9 +531,12 @@ def test_setup_existing_hook_logger(setup_patches, mock_session):
     _payload, hook_payload, p_logger, _p__get_logger, p__get_hook_logger = setup_patches
     with p_logger as mock_log, p__get_hook_logger as mock_get:
         mock_get.return_value = existing
-        HookProviderLogHandler.setup(hook_payload, mock_session)
-    mock_session.client.assert_called_once_with("logs")
+        HookProviderLogHandler.setup(
+            hook_payload, mock_session, metrics=sentinel.metrics
+        )
+    mock_session.client.assert_called_once_with("logs", config=ANY)
     mock_log.return_value.addHandler.assert_not_called()
+    assert existing.metrics is sentinel.metrics
 
 
 def test_setup_with_hook_formatter(
@@ -423,7 +551,7 @@ def test_setup_with_hook_formatter(
     with p_logger as mock_log, p__get_logger as mock_get, p__set_hook_handler_formatter as mock_set_formatter:  # pylint: disable=C0301  # noqa: B950
         mock_get.return_value = None
         HookProviderLogHandler.setup(hook_payload, mock_session, formatter)
-    mock_session.client.assert_called_once_with("logs")
+    mock_session.client.assert_called_once_with("logs", config=ANY)
     mock_log.return_value.addHandler.assert_called_once()
     mock_set_formatter.assert_called_once_with(formatter)
 
@@ -482,37 +610,26 @@ def test__hook_create_already_exists(mock_hook_provider_handler, create_method):
     mock_logs_method.assert_called_once()
 
 
-@pytest.mark.parametrize("sequence_token", [None, "some-seq"])
-def test__hook_put_log_event_success(mock_hook_provider_handler, sequence_token):
-    mock_hook_provider_handler.sequence_token = sequence_token
-    mock_put = mock_hook_provider_handler.client.put_log_events
-    mock_put.return_value = {"nextSequenceToken": "some-other-seq"}
-    mock_hook_provider_handler._put_log_event(
-        logging.LogRecord("a", 123, "/", 234, "log-msg", [], False)
-    )
-    mock_put.assert_called_once()
-
-
-def test__hook_put_log_event_invalid_token(mock_hook_provider_handler):
+def test__hook_put_log_event_success(mock_hook_provider_handler):
     mock_put = mock_hook_provider_handler.client.put_log_events
-    mock_put.return_value = {"nextSequenceToken": "some-other-seq"}
-    mock_put.side_effect = [
-        logs_exceptions.InvalidSequenceTokenException({}, operation_name="Test"),
-        logs_exceptions.DataAlreadyAcceptedException({}, operation_name="Test"),
-        DEFAULT,
-    ]
-    mock_hook_provider_handler._put_log_event(
-        logging.LogRecord("a", 123, "/", 234, "log-msg", [], False)
+    events = [{"timestamp": 1, "message": "log-msg"}]
+    mock_hook_provider_handler._put_events(events)
+    mock_put.assert_called_once_with(
+        logGroupName="test-hook-group",
+        logStreamName="test-hook-stream",
+        logEvents=events,
     )
-    assert mock_put.call_count == 3
 
 
 def test_hook_emit_existing_cwl_group_stream(mock_hook_provider_handler):
-    mock_hook_provider_handler._put_log_event = Mock()
+    mock_hook_provider_handler._put_events = Mock()
     mock_hook_provider_handler.emit(
         logging.LogRecord("a", 123, "/", 234, "log-msg", [], False)
     )
-    mock_hook_provider_handler._put_log_event.assert_called_once()
+    mock_hook_provider_handler._put_events.assert_not_called()
+    mock_hook_provider_handler.flush()
+    mock_hook_provider_handler.flush()
+    mock_hook_provider_handler._put_events.assert_called_once()
 
 
 def test_hook_emit_no_group_stream(mock_hook_provider_handler):
@@ -520,14 +637,15 @@ def test_hook_emit_no_group_stream(mock_hook_provider_handler):
         {"Error": {"Message": "log group does not exist"}},
         operation_name="PutLogRecords",
     )
-    mock_hook_provider_handler._put_log_event = Mock()
-    mock_hook_provider_handler._put_log_event.side_effect = [group_exc, DEFAULT]
+    mock_hook_provider_handler._put_events = Mock()
+    mock_hook_provider_handler._put_events.side_effect = [group_exc, DEFAULT]
     mock_hook_provider_handler._create_log_group = Mock()
     mock_hook_provider_handler._create_log_stream = Mock()
     mock_hook_provider_handler.emit(
         logging.LogRecord("a", 123, "/", 234, "log-msg", [], False)
     )
-    assert mock_hook_provider_handler._put_log_event.call_count == 2
+    mock_hook_provider_handler.flush()
+    assert mock_hook_provider_handler._put_events.call_count == 2
     mock_hook_provider_handler._create_log_group.assert_called_once()
     mock_hook_provider_handler._create_log_stream.assert_called_once()
 
@@ -536,11 +654,12 @@ def test_hook_emit_no_group_stream(mock_hook_provider_handler):
         {"Error": {"Message": "log stream does not exist"}},
         operation_name="PutLogRecords",
     )
-    mock_hook_provider_handler._put_log_event.side_effect = [stream_exc, DEFAULT]
+    mock_hook_provider_handler._put_events.side_effect = [stream_exc, DEFAULT]
     mock_hook_provider_handler.emit(
         logging.LogRecord("a", 123, "/", 234, "log-msg", [], False)
     )
-    assert mock_hook_provider_handler._put_log_event.call_count == 4
+    mock_hook_provider_handler.flush()
+    assert mock_hook_provider_handler._put_events.call_count == 4
     mock_hook_provider_handler._create_log_group.assert_called_once()
     assert mock_hook_provider_handler._create_log_stream.call_count == 2
 
@@ -564,3 +683,304 @@ def test__get_existing_hook_logger_logger_present(mock_logger, mock_session):
     ):
         actual = HookProviderLogHandler._get_existing_logger()
     assert actual == expected
+
+
+def test_put_emf_marks_only_emf_events(mock_session):
+    client = botocore.session.get_session().create_client(
+        "logs",
+        region_name="us-east-1",
+        aws_access_key_id="AKID",
+        aws_secret_access_key="secret",
+    )
+    headers = []
+
+    def send(request, **_kwargs):
+        headers.append(request.headers.get("x-amzn-logs-format"))
+        return AWSResponse(
+            request.url, 200, {}, Mock(stream=lambda: [b'{"nextSequenceToken": "1"}'])
+        )
+
+    client.meta.events.register("before-send", send)
+    mock_session.client.return_value = client
+    handler = ProviderLogHandler("test-group", "test-stream", mock_session)
+
+    handler.put_emf(['{"_aws": {}}'])
+    handler.emit(logging.LogRecord("a", 123, "/", 234, "log-msg", [], False))
+    handler.flush()
+    assert headers == [b"json/emf", None]
+
+
+def test_truncate_keeps_short_messages():
+    assert _truncate("log-msg") == "log-msg"
+
+
+def test_truncate_long_messages_within_event_limit():
+    truncated = _truncate("\u20ac" * MAX_EVENT_BYTES)
+    assert len(truncated.encode("utf-8")) <= MAX_EVENT_BYTES - 26
+    assert set(truncated) == {"\u20ac"}
+
+
+def test_log_event_batches_sorts_events():
+    events = [{"timestamp": 2, "message": "b"}, {"timestamp": 1, "message": "a"}]
+    assert list(log_event_batches(events)) == [
+        [{"timestamp": 1, "message": "a"}, {"timestamp": 2, "message": "b"}]
+    ]
+
+
+def test_log_event_batches_splits_by_count():
+    events = [{"timestamp": i, "message": "m"} for i in range(5)]
+    batches = list(log_event_batches(events, max_events=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_log_event_batches_splits_by_bytes():
+    events = [{"timestamp": i, "message": "x" * 74} for i in range(3)]
+    batches = list(log_event_batches(events, max_bytes=200))
+    assert [len(batch) for batch in batches] == [2, 1]
+
+
+def test_log_event_batches_splits_by_span():
+    events = [
+        {"timestamp": 0, "message": "a"},
+        {"timestamp": MAX_BATCH_SPAN_MILLIS - 1, "message": "b"},
+        {"timestamp": MAX_BATCH_SPAN_MILLIS, "message": "c"},
+    ]
+    batches = list(log_event_batches(events))
+    assert [len(batch) for batch in batches] == [2, 1]
+
+
+def test_log_event_batches_empty():
+    assert not list(log_event_batches([]))
+
+
+def test_emit_flushes_full_batch(mock_provider_handler):
+    mock_provider_handler._send = Mock()
+    record = logging.LogRecord("a", 123, "/", 234, "log-msg", [], False)
+    with patch("cloudformation_cli_python_lib.log_delivery.MAX_EVENTS_PER_BATCH", 2):
+        mock_provider_handler.emit(record)
+        mock_provider_handler._send.assert_not_called()
+        mock_provider_handler.emit(record)
+    mock_provider_handler._send.assert_called_once()
+    assert len(mock_provider_handler._send.call_args.args[0]) == 2
+
+
+def test_emit_flushes_full_bytes(mock_provider_handler):
+    mock_provider_handler._send = Mock()
+    record = logging.LogRecord("a", 123, "/", 234, "log-msg", [], False)
+    with patch("cloudformation_cli_python_lib.log_delivery.MAX_BATCH_BYTES", 10):
+        mock_provider_handler.emit(record)
+    mock_provider_handler._send.assert_called_once()
+
+
+def test_flush_after_deadline_keeps_events(mock_provider_handler):
+    mock_provider_handler._send = Mock()
+    mock_provider_handler.emit(
+        logging.LogRecord("a", 123, "/", 234, "log-msg", [], False)
+    )
+    mock_provider_handler.flush(Deadline(0))
+    mock_provider_handler._send.assert_not_called()
+    assert len(mock_provider_handler._events) == 1
+    assert mock_provider_handler._buffered_bytes == len("log-msg") + 26
+
+    mock_provider_handler.flush(Deadline(60))
+    mock_provider_handler._send.assert_called_once()
+    assert not mock_provider_handler._events
+    assert mock_provider_handler._buffered_bytes == 0
+
+
+def test_flush_drops_failed_batch(mock_provider_handler, capsys):
+    mock_provider_handler._send = Mock(side_effect=RuntimeError("throttled"))
+    mock_provider_handler.emit(
+        logging.LogRecord("a", 123, "/", 234, "log-msg", [], False)
+    )
+    mock_provider_handler.flush()
+    assert "Could not deliver provider logs: throttled" in capsys.readouterr().err
+    assert not mock_provider_handler._events
+
+
+def test_flush_existing_handler():
+    handler = Mock(spec=ProviderLogHandler)
+    with patch.object(ProviderLogHandler, "_get_existing_logger", return_value=handler):
+        ProviderLogHandler.flush_existing(Deadline(1))
+    handler.flush.assert_called_once()
+
+
+def test_flush_existing_without_handler():
+    with patch.object(ProviderLogHandler, "_get_existing_logger", return_value=None):
+        ProviderLogHandler.flush_existing()
+
+
+def test_create_stream_eagerly(mock_provider_handler):
+    mock_provider_handler.create_stream_eagerly()
+    assert mock_provider_handler._stream_creation.name == "log-stream-creation"
+    mock_provider_handler._send([{"timestamp": 1, "message": "log-msg"}])
+    mock_provider_handler.client.put_log_events.assert_called_once()
+    mock_provider_handler.client.create_log_stream.assert_called_once()
+    mock_provider_handler.client.create_log_group.assert_not_called()
+
+
+def test_send_waits_for_stream_creation_until_deadline(mock_provider_handler):
+    started, release = threading.Event(), threading.Event()
+
+    def create_log_stream(**_kwargs):
+        started.set()
+        release.wait(5)
+
+    mock_provider_handler.client.create_log_stream.side_effect = create_log_stream
+    mock_provider_handler.create_stream_eagerly()
+    started.wait(5)
+    begin = time.monotonic()
+    mock_provider_handler._send(
+        [{"timestamp": 1, "message": "log-msg"}], Deadline(0.05)
+    )
+    assert time.monotonic() - begin < 1
+    mock_provider_handler.client.put_log_events.assert_called_once()
+    release.set()
+
+
+def test_logs_client_config_bounds_requests():
+    config = logs_client_config()
+    assert (config.connect_timeout, config.read_timeout) == (1.0, 5.0)
+    assert config.retries == {"max_attempts": 0}
+
+
+def test_create_stream_without_group(mock_provider_handler):
+    create_stream = mock_provider_handler.client.create_log_stream
+    create_stream.side_effect = [
+        logs_exceptions.ResourceNotFoundException({}, operation_name="Test"),
+        DEFAULT,
+    ]
+    mock_provider_handler._create_stream()
+    mock_provider_handler.client.create_log_group.assert_called_once()
+    assert create_stream.call_count == 2
+
+
+def test_create_stream_failure(mock_provider_handler, capsys):
+    mock_provider_handler.client.create_log_stream.side_effect = RuntimeError("denied")
+    mock_provider_handler._create_stream()
+    err = capsys.readouterr().err
+    assert "Could not create the provider log stream: denied" in err
+
+
+def test_background_emit_sends_from_thread(mock_session):
+    handler = ProviderLogHandler("g", "s", mock_session, background=True)
+    threads = []
+    handler._send = Mock(
+        side_effect=lambda *_args: threads.append(threading.current_thread())
+    )
+    for message in ("a", "b"):
+        handler.emit(logging.LogRecord("a", 123, "/", 234, message, [], False))
+    handler.flush(Deadline(10))
+    sent = [
+        event["message"]
+        for call in handler._send.call_args_list
+        for event in call.args[0]
+    ]
+    assert sent == ["a", "b"]
+    assert {thread.name for thread in threads} == {"log-sender"}
+    assert not handler._events
+
+
+def test_background_flush_without_records(mock_session, capsys):
+    handler = ProviderLogHandler("g", "s", mock_session, background=True)
+    handler.flush()
+    assert handler._thread is None
+    assert not capsys.readouterr().err
+
+
+def test_background_queue_drops_oldest(mock_session, capsys):
+    handler = ProviderLogHandler("g", "s", mock_session, background=True, max_queued=2)
+    # no sender thread, so the events stay queued
+    handler._thread = Mock()
+    for message in ("a", "b", "c"):
+        handler.emit(logging.LogRecord("a", 123, "/", 234, message, [], False))
+    assert [event["message"] for event in handler._queue] == ["b", "c"]
+    assert handler.dropped == 1
+
+    handler.flush(Deadline(0))
+    err = capsys.readouterr().err
+    assert "Dropped 1 provider log events, the queue was full" in err
+    assert "Provider logs not sent by the deadline, 2 events queued" in err
+    # drops are reported once
+    handler.flush(Deadline(0))
+    assert "Dropped" not in capsys.readouterr().err
+
+
+def test_background_put_emf_sends_from_thread(mock_session):
+    handler = ProviderLogHandler("g", "s", mock_session, background=True)
+    threads = []
+    handler._send = Mock(
+        side_effect=lambda *_args: threads.append(threading.current_thread())
+    )
+    handler.put_emf(['{"a": 1}', '{"b": 2}'])
+    with patch.object(ProviderLogHandler, "_get_existing_logger", return_value=handler):
+        ProviderLogHandler.drain_existing(Deadline(10))
+    ((events,),) = [c.args for c in handler._send.call_args_list]
+    assert [event["message"] for event in events] == ['{"a": 1}', '{"b": 2}']
+    assert [thread.name for thread in threads] == ["log-sender"]
+    # the header is only registered around the EMF request
+    handler.client.meta.events.register_first.assert_called_once()
+    handler.client.meta.events.unregister.assert_called_once()
+
+
+def test_background_put_emf_failure(mock_session, capsys):
+    handler = ProviderLogHandler("g", "s", mock_session, background=True)
+    handler._send = Mock(side_effect=RuntimeError("denied"))
+    handler.put_emf(["{}"])
+    handler._drain(Deadline(10))
+    err = capsys.readouterr().err
+    assert "Could not deliver provider metrics: denied" in err
+
+
+def test_background_put_emf_pending_at_deadline(mock_session, capsys):
+    handler = ProviderLogHandler("g", "s", mock_session, background=True)
+    # no sender thread, so the documents stay queued
+    handler._thread = Mock()
+    handler.put_emf(["{}", "{}"])
+    handler._drain(Deadline(0))
+    err = capsys.readouterr().err
+    assert "Provider logs not sent by the deadline, 2 events queued" in err
+
+
+def test_drain_existing_without_sender(mock_session):
+    handler = ProviderLogHandler("g", "s", mock_session)
+    handler._drain = Mock()
+    with patch.object(ProviderLogHandler, "_get_existing_logger", return_value=handler):
+        ProviderLogHandler.drain_existing(Deadline(10))
+    handler._drain.assert_not_called()
+    with patch.object(ProviderLogHandler, "_get_existing_logger", return_value=None):
+        ProviderLogHandler.drain_existing(Deadline(10))
+
+
+@pytest.mark.parametrize(
+    "message,groups_created", [("log group does not exist", 1), ("no stream", 0)]
+)
+def test_put_emf_creates_missing_group_and_stream(
+    mock_provider_handler, message, groups_created
+):
+    exc = logs_exceptions.ResourceNotFoundException(
+        {"Error": {"Message": message}}, operation_name="PutLogEvents"
+    )
+    mock_put = mock_provider_handler.client.put_log_events
+    mock_put.side_effect = [exc, DEFAULT]
+    mock_provider_handler.put_emf(["{}", "{}"])
+    assert mock_put.call_count == 2
+    assert len(mock_put.call_args.kwargs["logEvents"]) == 2
+    create_group = mock_provider_handler.client.create_log_group
+    assert create_group.call_count == groups_created
+    mock_provider_handler.client.create_log_stream.assert_called_once()
+
+
+def test_write_emf_to_provider_log():
+    handler = Mock(spec=ProviderLogHandler)
+    with patch.object(ProviderLogHandler, "_get_existing_logger", return_value=handler):
+        ProviderLogHandler.write_emf(["{}"])
+    handler.put_emf.assert_called_once_with(["{}"])
+
+
+def test_write_emf_without_log_delivery(capsys):
+    with patch.object(
+        HookProviderLogHandler, "_get_existing_logger", return_value=None
+    ):
+        HookProviderLogHandler.write_emf(["{}", "[]"])
+    assert capsys.readouterr().out == "{}\n[]\n"
@@ -1,6 +1,8 @@
 # auto enums `.name` causes no-member
-# pylint: disable=redefined-outer-name,no-member,protected-access
+# pylint: disable=redefined-outer-name,no-member,protected-access,too-many-lines
 import pytest
+from cloudformation_cli_python_lib.circuit_breaker import CircuitBreaker
+from cloudformation_cli_python_lib.deadline import Deadline
 from cloudformation_cli_python_lib.interface import (
     Action,
     HookInvocationPoint,
@@ -8,16 +10,29 @@ from cloudformation_cli_python_lib.interface import (
     StandardUnit,
 )
 from cloudformation_cli_python_lib.metrics import (
+    METRICS_CIRCUIT_BREAKER,
+    BackgroundFlusher,
     HookMetricsPublisher,
+    InvocationMetrics,
+    MetricAggregator,
     MetricsPublisher,
     MetricsPublisherProxy,
+    batch_metric_data,
+    defer_flush,
+    flush_deferred,
     format_dimensions,
+    histogram_bucket,
+    histogram_datums,
 )
 
 import botocore.errorfactory
 import botocore.session
+import json
+import logging
+import threading
+from botocore.exceptions import EndpointConnectionError
 from datetime import datetime
-from unittest.mock import Mock, call, patch
+from unittest.mock import ANY, Mock, call, patch, sentinel
 
 cloudwatch_model = botocore.session.get_session().get_service_model("cloudwatch")
 factory = botocore.errorfactory.ClientExceptionsFactory()
@@ -45,6 +60,55 @@ def test_format_dimensions():
     ]
 
 
+def test_publisher_creates_client_on_first_publish(mock_session):
+    publisher = MetricsPublisher(mock_session, RESOURCE_TYPE)
+    mock_session.client.assert_not_called()
+    publisher.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+    publisher.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+    mock_session.client.assert_called_once_with("cloudwatch", config=ANY)
+
+
+def test_client_has_short_timeouts_and_no_retries(mock_session):
+    proxy = MetricsPublisherProxy(connect_timeout=0.5, read_timeout=1.5)
+    proxy.add_metrics_publisher(mock_session, RESOURCE_TYPE)
+    proxy.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+    config = mock_session.client.call_args.kwargs["config"]
+    assert (config.connect_timeout, config.read_timeout) == (0.5, 1.5)
+    assert config.retries == {"max_attempts": 0}
+
+
+def test_publisher_circuit_breaker(mock_session):
+    breaker = CircuitBreaker("metrics publishing", max_failures=2)
+    proxy = MetricsPublisherProxy(circuit_breaker=breaker)
+    proxy.add_metrics_publisher(mock_session, RESOURCE_TYPE)
+    mock_put = mock_session.client.return_value.put_metric_data
+    mock_put.side_effect = EndpointConnectionError(endpoint_url="https://cw")
+    with patch(
+        "cloudformation_cli_python_lib.metrics.LOG", autospec=True
+    ) as mock_logger:
+        for _ in range(3):
+            proxy.publish_duration_metric(datetime(2019, 1, 1), Action.CREATE, 1.0)
+    assert mock_put.call_count == 2
+    assert mock_logger.error.call_count == 2
+    assert breaker.skipped == 1
+
+
+def test_publisher_circuit_breaker_closes_on_success(mock_session):
+    breaker = CircuitBreaker("metrics publishing", max_failures=2)
+    publisher = MetricsPublisher(mock_session, RESOURCE_TYPE, circuit_breaker=breaker)
+    mock_put = mock_session.client.return_value.put_metric_data
+    mock_put.side_effect = [EndpointConnectionError(endpoint_url="https://cw"), {}, {}]
+    for _ in range(3):
+        publisher.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+    assert mock_put.call_count == 3
+    assert breaker.allow()
+
+
+def test_proxy_uses_the_containers_circuit_breaker():
+    proxy = MetricsPublisherProxy()
+    assert proxy._options["circuit_breaker"] is METRICS_CIRCUIT_BREAKER
+
+
 def test_put_metric_catches_error(mock_session):
     client = mock_session.client("cloudwatch")
     client.exceptions = cloudwatch_exceptions
@@ -92,7 +156,7 @@ def test_publish_exception_metric(mock_session):
     proxy.add_metrics_publisher(mock_session, RESOURCE_TYPE)
     proxy.publish_exception_metric(fake_datetime, Action.CREATE, Exception("fake-err"))
     expected_calls = [
-        call.client("cloudwatch"),
+        call.client("cloudwatch", config=ANY),
         call.client().put_metric_data(
             Namespace="AWS/CloudFormation/Aa/Bb/Cc",
             MetricData=[
@@ -123,7 +187,7 @@ def test_publish_invocation_metric(mock_session):
     proxy.publish_invocation_metric(fake_datetime, Action.CREATE)
 
     expected_calls = [
-        call.client("cloudwatch"),
+        call.client("cloudwatch", config=ANY),
         call.client().put_metric_data(
             Namespace="AWS/CloudFormation/Aa/Bb/Cc",
             MetricData=[
@@ -150,7 +214,7 @@ def test_publish_duration_metric(mock_session):
     proxy.publish_duration_metric(fake_datetime, Action.CREATE, 100)
 
     expected_calls = [
-        call.client("cloudwatch"),
+        call.client("cloudwatch", config=ANY),
         call.client().put_metric_data(
             Namespace="AWS/CloudFormation/Aa/Bb/Cc",
             MetricData=[
@@ -177,7 +241,7 @@ def test_publish_log_delivery_exception_metric(mock_session):
     proxy.publish_log_delivery_exception_metric(fake_datetime, TypeError("test"))
 
     expected_calls = [
-        call.client("cloudwatch"),
+        call.client("cloudwatch", config=ANY),
         call.client().put_metric_data(
             Namespace="AWS/CloudFormation/Aa/Bb/Cc",
             MetricData=[
@@ -253,7 +317,7 @@ def test_publish_hook_exception_metric(mock_session):
         fake_datetime, HookInvocationPoint.CREATE_PRE_PROVISION, Exception("fake-err")
     )
     expected_calls = [
-        call.client("cloudwatch"),
+        call.client("cloudwatch", config=ANY),
         call.client().put_metric_data(
             Namespace="AWS/CloudFormation/123456789012/De/Ee/Ff",
             MetricData=[
@@ -289,7 +353,7 @@ def test_publish_hook_invocation_metric(mock_session):
     )
 
     expected_calls = [
-        call.client("cloudwatch"),
+        call.client("cloudwatch", config=ANY),
         call.client().put_metric_data(
             Namespace="AWS/CloudFormation/123456789012/De/Ee/Ff",
             MetricData=[
@@ -321,7 +385,7 @@ def test_publish_hook_duration_metric(mock_session):
     )
 
     expected_calls = [
-        call.client("cloudwatch"),
+        call.client("cloudwatch", config=ANY),
         call.client().put_metric_data(
             Namespace="AWS/CloudFormation/123456789012/De/Ee/Ff",
             MetricData=[
@@ -351,7 +415,7 @@ def test_publish_hook_log_delivery_exception_metric(mock_session):
     proxy.publish_log_delivery_exception_metric(fake_datetime, TypeError("test"))
 
     expected_calls = [
-        call.client("cloudwatch"),
+        call.client("cloudwatch", config=ANY),
         call.client().put_metric_data(
             Namespace="AWS/CloudFormation/123456789012/De/Ee/Ff",
             MetricData=[
@@ -383,3 +447,571 @@ def test_metrics_publisher_proxy_add_metrics_publisher_none_safe():
     proxy.add_metrics_publisher(None, None)
     proxy.add_hook_metrics_publisher(None, None, None)
     assert not proxy._publishers  # pylint: disable=protected-access
+
+
+def stabilization_calls(namespace, dimensions, fake_datetime):
+    dimensions = format_dimensions(dimensions)
+    return [
+        call.client("cloudwatch", config=ANY),
+        call.client().put_metric_data(
+            Namespace=namespace,
+            MetricData=[
+                {
+                    "MetricName": MetricTypes.StabilizationPollCount.name,
+                    "Dimensions": dimensions,
+                    "Unit": StandardUnit.Count.name,
+                    "Timestamp": str(fake_datetime),
+                    "Value": 7.0,
+                }
+            ],
+        ),
+        call.client().put_metric_data(
+            Namespace=namespace,
+            MetricData=[
+                {
+                    "MetricName": MetricTypes.StabilizationLatency.name,
+                    "Dimensions": dimensions,
+                    "Unit": StandardUnit.Milliseconds.name,
+                    "Timestamp": str(fake_datetime),
+                    "Value": 1500.0,
+                }
+            ],
+        ),
+    ]
+
+
+def test_publish_stabilization_metrics(mock_session):
+    fake_datetime = datetime(2019, 1, 1)
+    proxy = MetricsPublisherProxy()
+    proxy.add_metrics_publisher(mock_session, RESOURCE_TYPE)
+    proxy.publish_stabilization_metrics(fake_datetime, Action.CREATE, 7, 1500.0)
+
+    assert mock_session.mock_calls == stabilization_calls(
+        "AWS/CloudFormation/Aa/Bb/Cc",
+        {
+            "DimensionKeyActionType": "CREATE",
+            "DimensionKeyResourceType": RESOURCE_TYPE,
+        },
+        fake_datetime,
+    )
+
+
+def test_publish_hook_stabilization_metrics(mock_session):
+    fake_datetime = datetime(2019, 1, 1)
+    proxy = MetricsPublisherProxy()
+    proxy.add_hook_metrics_publisher(mock_session, HOOK_TYPE, ACCOUNT_ID)
+    proxy.publish_stabilization_metrics(
+        fake_datetime, HookInvocationPoint.CREATE_PRE_PROVISION, 7, 1500.0
+    )
+
+    assert mock_session.mock_calls == stabilization_calls(
+        "AWS/CloudFormation/123456789012/De/Ee/Ff",
+        {
+            "DimensionKeyInvocationPointType": "CREATE_PRE_PROVISION",
+            "DimensionKeyHookType": HOOK_TYPE,
+        },
+        fake_datetime,
+    )
+
+
+def test_invocation_metrics_binds_action():
+    proxy = Mock(spec=MetricsPublisherProxy)
+    metrics = InvocationMetrics(proxy, Action.UPDATE)
+    metrics.publish_stabilization_metrics(3, 250.0)
+    (
+        timestamp,
+        action,
+        polls,
+        milliseconds,
+    ) = proxy.publish_stabilization_metrics.call_args.args
+    assert isinstance(timestamp, datetime)
+    assert (action, polls, milliseconds) == (Action.UPDATE, 3, 250.0)
+
+
+def phase_calls(namespace, dimensions, fake_datetime):
+    return [call.client("cloudwatch", config=ANY)] + [
+        call.client().put_metric_data(
+            Namespace=namespace,
+            MetricData=[
+                {
+                    "MetricName": MetricTypes.HandlerPhaseDuration.name,
+                    "Dimensions": format_dimensions(
+                        {**dimensions, "DimensionKeyPhase": phase}
+                    ),
+                    "Unit": StandardUnit.Milliseconds.name,
+                    "Timestamp": str(fake_datetime),
+                    "Value": value,
+                }
+            ],
+        )
+        for phase, value in (("parse_request", 1.5), ("handler", 20.0))
+    ]
+
+
+def test_publish_phase_metrics(mock_session):
+    fake_datetime = datetime(2019, 1, 1)
+    proxy = MetricsPublisherProxy()
+    proxy.add_metrics_publisher(mock_session, RESOURCE_TYPE)
+    proxy.publish_phase_metrics(
+        fake_datetime, Action.CREATE, {"parse_request": 1.5, "handler": 20.0}
+    )
+
+    assert mock_session.mock_calls == phase_calls(
+        "AWS/CloudFormation/Aa/Bb/Cc",
+        {
+            "DimensionKeyActionType": "CREATE",
+            "DimensionKeyResourceType": RESOURCE_TYPE,
+        },
+        fake_datetime,
+    )
+
+
+def test_publish_hook_phase_metrics(mock_session):
+    fake_datetime = datetime(2019, 1, 1)
+    proxy = MetricsPublisherProxy()
+    proxy.add_hook_metrics_publisher(mock_session, HOOK_TYPE, ACCOUNT_ID)
+    proxy.publish_phase_metrics(
+        fake_datetime,
+        HookInvocationPoint.CREATE_PRE_PROVISION,
+        {"parse_request": 1.5, "handler": 20.0},
+    )
+
+    assert mock_session.mock_calls == phase_calls(
+        "AWS/CloudFormation/123456789012/De/Ee/Ff",
+        {
+            "DimensionKeyInvocationPointType": "CREATE_PRE_PROVISION",
+            "DimensionKeyHookType": HOOK_TYPE,
+        },
+        fake_datetime,
+    )
+
+
+def test_invocation_metrics_publishes_phases():
+    proxy = Mock(spec=MetricsPublisherProxy)
+    metrics = InvocationMetrics(proxy, Action.DELETE)
+    metrics.publish_phase_metrics({"handler": 5.0})
+    timestamp, action, phases = proxy.publish_phase_metrics.call_args.args
+    assert isinstance(timestamp, datetime)
+    assert (action, phases) == (Action.DELETE, {"handler": 5.0})
+
+
+def test_invocation_metrics_custom_metrics():
+    proxy = Mock(spec=MetricsPublisherProxy)
+    metrics = InvocationMetrics(proxy, Action.LIST)
+    metrics.count("ItemsListed", 25.0, {"Page": "1"})
+    metrics.timing("DescribeLatency", 12.5)
+    count, timing = proxy.publish_custom_metric.call_args_list
+    assert count.args[1:] == (Action.LIST, "ItemsListed")
+    assert count.kwargs == {
+        "unit": StandardUnit.Count,
+        "value": 25.0,
+        "dimensions": {"Page": "1"},
+    }
+    assert timing.args[1:] == (Action.LIST, "DescribeLatency")
+    assert timing.kwargs == {
+        "unit": StandardUnit.Milliseconds,
+        "value": 12.5,
+        "dimensions": {},
+    }
+
+
+def test_custom_metrics_share_the_batch(mock_session):
+    proxy = MetricsPublisherProxy(buffered=True)
+    proxy.add_metrics_publisher(mock_session, RESOURCE_TYPE)
+    proxy.add_hook_metrics_publisher(mock_session, HOOK_TYPE, ACCOUNT_ID)
+    point = HookInvocationPoint.CREATE_PRE_PROVISION
+    proxy.publish_invocation_metric(datetime(2019, 1, 1), point)
+    InvocationMetrics(proxy, point).count("Retries", dimensions={"Api": "Get"})
+    proxy.flush()
+
+    mock_put = mock_session.client.return_value.put_metric_data
+    resource, hook = mock_put.call_args_list
+    assert resource.kwargs["Namespace"] == RESOURCE_NAMESPACE
+    assert resource.kwargs["MetricData"][1]["Dimensions"] == format_dimensions(
+        {
+            "DimensionKeyActionType": "CREATE_PRE_PROVISION",
+            "DimensionKeyResourceType": RESOURCE_TYPE,
+            "Api": "Get",
+        }
+    )
+    assert hook.kwargs["Namespace"] == HOOK_NAMESPACE
+    invocations, retries = hook.kwargs["MetricData"]
+    assert invocations["MetricName"] == MetricTypes.HandlerInvocationCount.name
+    assert retries["MetricName"] == "Retries"
+    assert (retries["Unit"], retries["Value"]) == ("Count", 1.0)
+    assert retries["Dimensions"] == format_dimensions(
+        {
+            "DimensionKeyInvocationPointType": "CREATE_PRE_PROVISION",
+            "DimensionKeyHookType": HOOK_TYPE,
+            "Api": "Get",
+        }
+    )
+
+
+def test_batch_metric_data_keeps_order_within_limits():
+    datums = [{"MetricName": "m", "Value": float(i)} for i in range(7)]
+    size = len(json.dumps(datums[0]))
+    assert list(batch_metric_data(datums, max_datums=3)) == [
+        datums[0:3],
+        datums[3:6],
+        datums[6:7],
+    ]
+    assert list(batch_metric_data(datums, max_bytes=2 * size)) == [
+        datums[0:2],
+        datums[2:4],
+        datums[4:6],
+        datums[6:7],
+    ]
+    assert not list(batch_metric_data([]))
+
+
+def test_batch_metric_data_oversized_datum():
+    datum = {"MetricName": "m" * 100}
+    assert list(batch_metric_data([datum, datum], max_bytes=10)) == [[datum], [datum]]
+
+
+def test_buffered_publisher_sends_once_on_flush(mock_session):
+    fake_datetime = datetime(2019, 1, 1)
+    proxy = MetricsPublisherProxy(buffered=True)
+    proxy.add_metrics_publisher(mock_session, RESOURCE_TYPE)
+    proxy.publish_invocation_metric(fake_datetime, Action.CREATE)
+    proxy.publish_duration_metric(fake_datetime, Action.CREATE, 100.0)
+    assert not mock_session.mock_calls
+
+    proxy.flush()
+    proxy.flush()
+    mock_put = mock_session.client.return_value.put_metric_data
+    mock_put.assert_called_once()
+    datums = mock_put.call_args.kwargs["MetricData"]
+    assert [datum["MetricName"] for datum in datums] == [
+        "HandlerInvocationCount",
+        "HandlerInvocationDuration",
+    ]
+
+
+def test_buffered_hook_publisher(mock_session):
+    proxy = MetricsPublisherProxy(buffered=True)
+    proxy.add_hook_metrics_publisher(mock_session, HOOK_TYPE, ACCOUNT_ID)
+    proxy.publish_invocation_metric(
+        datetime(2019, 1, 1), HookInvocationPoint.CREATE_PRE_PROVISION
+    )
+    assert not mock_session.mock_calls
+    proxy.flush()
+    mock_put = mock_session.client.return_value.put_metric_data
+    assert mock_put.call_args.kwargs["Namespace"] == HOOK_NAMESPACE
+
+
+def test_buffered_publisher_splits_batches(mock_session):
+    publisher = MetricsPublisher(mock_session, RESOURCE_TYPE, buffered=True)
+    for _ in range(1001):
+        publisher.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+    publisher.flush()
+    mock_put = mock_session.client.return_value.put_metric_data
+    assert [len(c.kwargs["MetricData"]) for c in mock_put.call_args_list] == [1000, 1]
+
+
+def test_flush_never_raises(mock_session):
+    mock_session.client.side_effect = ValueError("no region")
+    publisher = MetricsPublisher(mock_session, RESOURCE_TYPE, buffered=True)
+    publisher.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+    with patch(
+        "cloudformation_cli_python_lib.metrics.LOG", autospec=True
+    ) as mock_logger:
+        publisher.flush()
+    mock_logger.error.assert_called_once_with(
+        "An error occurred while flushing metrics: %s", "no region"
+    )
+
+
+def test_flush_deferred():
+    proxy = Mock(spec=MetricsPublisherProxy)
+    defer_flush(proxy)
+    flush_deferred(sentinel.deadline)
+    flush_deferred(sentinel.deadline)
+    proxy.flush.assert_called_once_with(sentinel.deadline)
+
+
+def test_background_flusher_sends_from_its_thread(mock_session):
+    flusher = BackgroundFlusher()
+    threads = []
+    mock_put = mock_session.client.return_value.put_metric_data
+    mock_put.side_effect = lambda **kwargs: threads.append(threading.current_thread())
+    proxy = MetricsPublisherProxy(flusher=flusher)
+    proxy.add_metrics_publisher(mock_session, RESOURCE_TYPE)
+    proxy.add_hook_metrics_publisher(mock_session, HOOK_TYPE, ACCOUNT_ID)
+    proxy.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+    # made on the publishing thread
+    assert mock_session.client.call_count == 2
+
+    proxy.flush(Deadline(None))
+    assert {c.kwargs["Namespace"] for c in mock_put.call_args_list} == {
+        RESOURCE_NAMESPACE,
+        HOOK_NAMESPACE,
+    }
+    assert threads and threading.current_thread() not in threads
+
+
+def test_background_flusher_batches_what_is_queued(mock_session):
+    flusher = BackgroundFlusher()
+    publisher = MetricsPublisher(mock_session, RESOURCE_TYPE, flusher=flusher)
+    release = threading.Event()
+    mock_put = mock_session.client.return_value.put_metric_data
+    mock_put.side_effect = lambda **kwargs: release.wait(5)
+    for _ in range(3):
+        publisher.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+    release.set()
+    assert flusher.drain()
+    # the first datum may have woken the thread on its own
+    assert sum(len(c.kwargs["MetricData"]) for c in mock_put.call_args_list) == 3
+    assert mock_put.call_count <= 2
+
+
+def test_background_flusher_drops_oldest(caplog, mock_session):
+    flusher = BackgroundFlusher(max_queued=2)
+    publisher = MetricsPublisher(mock_session, RESOURCE_TYPE, flusher=flusher)
+    release = threading.Event()
+    mock_put = mock_session.client.return_value.put_metric_data
+    mock_put.side_effect = lambda **kwargs: release.wait(5)
+    publisher.publish_duration_metric(datetime(2019, 1, 1), Action.CREATE, 0.0)
+    # wait for the thread to take the first datum
+    while flusher._queue:
+        release.wait(0.001)
+    for value in (1.0, 2.0, 3.0):
+        publisher.publish_duration_metric(datetime(2019, 1, 1), Action.CREATE, value)
+    assert flusher.dropped == 1
+
+    with caplog.at_level(logging.WARNING):
+        assert not flusher.drain(Deadline(0))
+    assert "Dropped 1 metric datums" in caplog.text
+    assert "Metrics not sent by the deadline, 2 datums queued" in caplog.text
+
+    caplog.clear()
+    release.set()
+    assert flusher.drain(Deadline(5000))
+    assert not caplog.text
+    batches = [c.kwargs["MetricData"] for c in mock_put.call_args_list]
+    values = [datum["Value"] for batch in batches for datum in batch]
+    assert values == [0.0, 2.0, 3.0]
+
+
+def test_background_flusher_survives_errors(mock_session):
+    flusher = BackgroundFlusher()
+    publisher = MetricsPublisher(mock_session, RESOURCE_TYPE, flusher=flusher)
+    mock_put = mock_session.client.return_value.put_metric_data
+    mock_put.side_effect = [ValueError("no region"), None]
+    with patch(
+        "cloudformation_cli_python_lib.metrics.LOG", autospec=True
+    ) as mock_logger:
+        publisher.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+        assert flusher.drain()
+        publisher.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+        assert flusher.drain()
+    mock_logger.error.assert_called_once_with(
+        "An error occurred while flushing metrics: %s", "no region"
+    )
+    assert mock_put.call_count == 2
+
+
+def test_aggregator_sends_statistic_sets_when_due():
+    aggregator = MetricAggregator(max_samples=4)
+    first_session, second_session = Mock(spec_set=["client"]), Mock(spec_set=["client"])
+    first = MetricsPublisherProxy(aggregator=aggregator)
+    first.add_metrics_publisher(first_session, RESOURCE_TYPE)
+    first.publish_duration_metric(datetime(2019, 1, 1), Action.CREATE, 10.0)
+    first.publish_duration_metric(datetime(2019, 1, 1, 0, 0, 5), Action.CREATE, 30.0)
+    first.flush()
+    assert not first_session.mock_calls
+
+    second = MetricsPublisherProxy(aggregator=aggregator)
+    second.add_metrics_publisher(second_session, RESOURCE_TYPE)
+    second.publish_duration_metric(datetime(2019, 1, 1), Action.CREATE, 20.0)
+    second.publish_duration_metric(datetime(2019, 1, 1), Action.UPDATE, 5.0)
+    second.flush()
+    assert not first_session.mock_calls
+    second_session.client.return_value.put_metric_data.assert_called_once_with(
+        Namespace=RESOURCE_NAMESPACE,
+        MetricData=[
+            {
+                "MetricName": MetricTypes.HandlerInvocationDuration.name,
+                "Dimensions": [
+                    {"Name": "DimensionKeyActionType", "Value": "CREATE"},
+                    {"Name": "DimensionKeyResourceType", "Value": RESOURCE_TYPE},
+                ],
+                "Unit": StandardUnit.Milliseconds.name,
+                "Timestamp": "2019-01-01 00:00:00",
+                "StatisticValues": {
+                    "SampleCount": 3.0,
+                    "Sum": 60.0,
+                    "Minimum": 10.0,
+                    "Maximum": 30.0,
+                },
+            },
+            {
+                "MetricName": MetricTypes.HandlerInvocationDuration.name,
+                "Dimensions": [
+                    {"Name": "DimensionKeyActionType", "Value": "UPDATE"},
+                    {"Name": "DimensionKeyResourceType", "Value": RESOURCE_TYPE},
+                ],
+                "Unit": StandardUnit.Milliseconds.name,
+                "Timestamp": "2019-01-01 00:00:00",
+                "StatisticValues": {
+                    "SampleCount": 1.0,
+                    "Sum": 5.0,
+                    "Minimum": 5.0,
+                    "Maximum": 5.0,
+                },
+            },
+        ],
+    )
+    assert not aggregator.due()
+
+
+def test_aggregator_due_by_age():
+    aggregator = MetricAggregator(max_age=60.0)
+    assert not aggregator.due()
+    publisher = MetricsPublisher(Mock(), RESOURCE_TYPE, aggregator=aggregator)
+    with patch("cloudformation_cli_python_lib.metrics.time.monotonic") as monotonic:
+        monotonic.return_value = 100.0
+        publisher.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+        monotonic.return_value = 159.0
+        assert not aggregator.due()
+        monotonic.return_value = 160.0
+        assert aggregator.due()
+
+
+def test_aggregator_keeps_hook_namespaces_apart(mock_session):
+    aggregator = MetricAggregator()
+    proxy = MetricsPublisherProxy(aggregator=aggregator)
+    proxy.add_metrics_publisher(mock_session, RESOURCE_TYPE)
+    proxy.add_hook_metrics_publisher(mock_session, HOOK_TYPE, ACCOUNT_ID)
+    proxy.publish_exception_metric(
+        datetime(2019, 1, 1), HookInvocationPoint.CREATE_PRE_PROVISION, ValueError()
+    )
+    aggregator.flush()
+    mock_put = mock_session.client.return_value.put_metric_data
+    assert [c.kwargs["Namespace"] for c in mock_put.call_args_list] == [
+        RESOURCE_NAMESPACE,
+        HOOK_NAMESPACE,
+    ]
+    (datum,) = mock_put.call_args.kwargs["MetricData"]
+    assert {d["Name"] for d in datum["Dimensions"]} == {
+        "DimensionKeyInvocationPointType",
+        "DimensionKeyExceptionType",
+        "DimensionKeyHookType",
+    }
+
+
+def test_aggregator_flushes_on_shutdown():
+    with patch("cloudformation_cli_python_lib.metrics.on_shutdown") as on_shutdown:
+        aggregator = MetricAggregator()
+    on_shutdown.assert_called_once_with(aggregator.flush)
+
+
+def test_aggregator_flush_never_raises(mock_session):
+    mock_session.client.side_effect = ValueError("no region")
+    aggregator = MetricAggregator()
+    publisher = MetricsPublisher(mock_session, RESOURCE_TYPE, aggregator=aggregator)
+    publisher.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+    with patch(
+        "cloudformation_cli_python_lib.metrics.LOG", autospec=True
+    ) as mock_logger:
+        aggregator.flush()
+    mock_logger.error.assert_called_once_with(
+        "An error occurred while flushing metrics: %s", "no region"
+    )
+    assert not aggregator.due()
+
+
+@pytest.mark.parametrize("value", [0.004, 0.5, 1.0, 10.0, 104.0, 12345.0])
+def test_histogram_bucket(value):
+    bucket = histogram_bucket(value)
+    assert abs(bucket - value) / value < 2 ** (1 / 32) - 1 + 0.001
+    assert histogram_bucket(bucket) == bucket
+
+
+def test_histogram_bucket_not_positive():
+    assert histogram_bucket(0.0) == histogram_bucket(-1.0) == 0.0
+
+
+def test_histogram_datums_split():
+    histogram = {float(value): 2.0 for value in range(151, 0, -1)}
+    datums = histogram_datums({"MetricName": "m", "Histogram": histogram})
+    assert len(datums) == 2
+    first, second = datums[0], datums[1]
+    assert first["Values"] == [float(value) for value in range(1, 151)]
+    assert first["Counts"] == [2.0] * 150
+    assert (second["Values"], second["Counts"]) == ([151.0], [2.0])
+    assert "Histogram" not in first and second["MetricName"] == "m"
+
+
+def test_aggregator_histograms(mock_session):
+    aggregator = MetricAggregator(histograms=True)
+    proxy = MetricsPublisherProxy(aggregator=aggregator)
+    proxy.add_metrics_publisher(mock_session, RESOURCE_TYPE)
+    for milliseconds in (100.0, 101.0, 400.0):
+        proxy.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+        proxy.publish_duration_metric(datetime(2019, 1, 1), Action.CREATE, milliseconds)
+        proxy.publish_phase_metrics(
+            datetime(2019, 1, 1), Action.CREATE, {"handler": milliseconds}
+        )
+    aggregator.flush()
+    mock_put = mock_session.client.return_value.put_metric_data
+    count, duration, phase = mock_put.call_args.kwargs["MetricData"]
+    assert count["StatisticValues"]["SampleCount"] == 3.0
+    for datum in (duration, phase):
+        assert datum["Values"] == [histogram_bucket(100.0), histogram_bucket(400.0)]
+        assert datum["Counts"] == [2.0, 1.0]
+        assert "StatisticValues" not in datum and "Histogram" not in datum
+    assert {"Name": "DimensionKeyPhase", "Value": "handler"} in phase["Dimensions"]
+
+
+def test_background_emf_publisher(mock_session):
+    sink = Mock()
+    flusher = BackgroundFlusher()
+    publisher = MetricsPublisher(
+        mock_session, RESOURCE_TYPE, emf_sink=sink, flusher=flusher
+    )
+    publisher.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+    assert flusher.drain()
+    sink.assert_called_once()
+    assert not mock_session.mock_calls
+
+
+def test_emf_publisher(mock_session):
+    sink = Mock()
+    proxy = MetricsPublisherProxy(emf_sink=sink)
+    proxy.add_metrics_publisher(mock_session, RESOURCE_TYPE)
+    proxy.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+    assert not mock_session.mock_calls
+    (documents,) = sink.call_args.args
+    (document,) = [json.loads(document) for document in documents]
+    assert document["HandlerInvocationCount"] == 1.0
+    assert document["DimensionKeyResourceType"] == RESOURCE_TYPE
+
+
+def test_buffered_hook_emf_publisher(mock_session):
+    sink = Mock()
+    proxy = MetricsPublisherProxy(buffered=True, emf_sink=sink)
+    proxy.add_hook_metrics_publisher(mock_session, HOOK_TYPE, ACCOUNT_ID)
+    point = HookInvocationPoint.CREATE_PRE_PROVISION
+    proxy.publish_invocation_metric(datetime(2019, 1, 1), point)
+    proxy.publish_duration_metric(datetime(2019, 1, 1), point, 5.0)
+    sink.assert_not_called()
+    proxy.flush()
+    (documents,) = sink.call_args.args
+    (document,) = [json.loads(document) for document in documents]
+    assert document["_aws"]["CloudWatchMetrics"][0]["Namespace"] == HOOK_NAMESPACE
+    assert document["HandlerInvocationDuration"] == 5.0
+    assert not mock_session.mock_calls
+
+
+def test_emf_sink_error_is_logged(mock_session):
+    sink = Mock(side_effect=OSError("closed"))
+    publisher = MetricsPublisher(mock_session, RESOURCE_TYPE, emf_sink=sink)
+    with patch(
+        "cloudformation_cli_python_lib.metrics.LOG", autospec=True
+    ) as mock_logger:
+        publisher.publish_invocation_metric(datetime(2019, 1, 1), Action.CREATE)
+    mock_logger.error.assert_called_once_with(
+        "An error occurred while publishing metrics: %s", "closed"
+    )
@@ -0,0 +1,64 @@
+# pylint: disable=protected-access
+from cloudformation_cli_python_lib.boto3_proxy import ClientPool, _get_boto_session
+from cloudformation_cli_python_lib.metrics import MetricsPublisher
+from cloudformation_cli_python_lib.priming import after_restore, prime
+from cloudformation_cli_python_lib.utils import Credentials
+
+from unittest.mock import ANY, call, patch, sentinel
+
+from .sample_model import ResourceModel, SimpleResourceModel
+
+PRIMING = "cloudformation_cli_python_lib.priming"
+
+
+def test_prime_models_and_clients():
+    with patch(f"{PRIMING}.prime_model") as mock_prime_model, patch(
+        f"{PRIMING}.prime_clients"
+    ) as mock_prime_clients, patch(f"{PRIMING}.kitchen_sink_serialize") as mock_ser:
+        mock_prime_model.side_effect = [None, ValueError("boom")]
+        prime(
+            models=(ResourceModel, None, SimpleResourceModel),
+            services=["s3"],
+            regions=[None],
+            max_pool_connections=10,
+            response=sentinel.response,
+        )
+    assert mock_prime_model.call_args_list == [
+        call(ResourceModel),
+        call(SimpleResourceModel),
+    ]
+    assert mock_prime_clients.call_args_list == [
+        call(["s3"], [None], 10),
+        call(["cloudwatch"], config=ANY),
+        call(["logs"], config=ANY),
+    ]
+    mock_ser.assert_called_once_with(sentinel.response)
+
+
+def test_after_restore_resets_connections_and_seed():
+    with patch(f"{PRIMING}.CLIENT_POOL") as mock_pool, patch(
+        f"{PRIMING}.random.seed"
+    ) as mock_seed:
+        after_restore()
+    mock_pool.reset_connections.assert_called_once_with()
+    mock_seed.assert_called_once_with()
+
+
+def test_primed_metrics_client_is_taken_over():
+    pool = ClientPool()
+    with patch("cloudformation_cli_python_lib.boto3_proxy.CLIENT_POOL", pool):
+        prime(
+            models=(),
+            services=(),
+            regions=(),
+            max_pool_connections=10,
+            response={},
+        )
+        session = _get_boto_session(Credentials("AKID", "secret", "token"))
+        publisher = MetricsPublisher(session, "Aa::Bb::Cc")
+        with patch(
+            "cloudformation_cli_python_lib.boto3_proxy._create_session"
+        ) as mock_create_session:
+            client = publisher._client
+        mock_create_session.assert_not_called()
+    assert client.meta.config.retries["total_max_attempts"] == 1
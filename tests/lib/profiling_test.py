@@ -0,0 +1,183 @@
+import pytest
+from cloudformation_cli_python_lib.profiling import (
+    ENV_DUMP_DIR,
+    ENV_MODE,
+    ENV_SAMPLE_RATE,
+    ENV_TOP,
+    ProfilingConfig,
+)
+
+import cProfile
+import logging
+import os
+import tracemalloc
+from contextlib import nullcontext
+from types import SimpleNamespace
+from unittest.mock import patch
+
+RANDOM = "cloudformation_cli_python_lib.profiling.random.random"
+
+
+def work():
+    return [str(i) for i in range(1000)]
+
+
+def report(caplog):
+    (message,) = [r.getMessage() for r in caplog.records if r.msg != "Wrote %s"]
+    return message
+
+
+def test_from_environ_defaults_to_off():
+    config = ProfilingConfig.from_environ({})
+    assert config == ProfilingConfig()
+    assert isinstance(config.profile("CREATE"), nullcontext)
+
+
+def test_from_environ():
+    config = ProfilingConfig.from_environ(
+        {
+            ENV_SAMPLE_RATE: "0.25",
+            ENV_MODE: "memory, CPU",
+            ENV_TOP: "5",
+            ENV_DUMP_DIR: "/tmp",
+        }
+    )
+    assert config == ProfilingConfig(
+        0.25, cpu=True, memory=True, top=5, dump_dir="/tmp"
+    )
+
+
+@pytest.mark.parametrize(
+    "environ",
+    [
+        {ENV_SAMPLE_RATE: "often"},
+        {ENV_SAMPLE_RATE: "2"},
+        {ENV_SAMPLE_RATE: "1", ENV_MODE: "disk"},
+        {ENV_SAMPLE_RATE: "1", ENV_TOP: "all"},
+    ],
+)
+def test_from_environ_invalid(caplog, environ):
+    with caplog.at_level(logging.WARNING):
+        assert ProfilingConfig.from_environ(environ) == ProfilingConfig()
+    assert "Profiling disabled" in caplog.text
+
+
+def test_with_type_configuration():
+    base = ProfilingConfig(dump_dir="/tmp")
+    assert base.with_type_configuration(None) is base
+    assert base.with_type_configuration(SimpleNamespace(Profiling=None)) is base
+
+    settings = SimpleNamespace(SampleRate=0.5, Mode="memory", Top=None)
+    config = base.with_type_configuration(SimpleNamespace(Profiling=settings))
+    assert config == ProfilingConfig(0.5, cpu=False, memory=True, dump_dir="/tmp")
+
+
+@pytest.mark.parametrize("settings", [{"SampleRate": -1}, {"SampleRate": object()}])
+def test_with_type_configuration_invalid(caplog, settings):
+    base = ProfilingConfig(0.5)
+    settings = SimpleNamespace(**settings)
+    with caplog.at_level(logging.WARNING):
+        config = base.with_type_configuration(SimpleNamespace(Profiling=settings))
+    assert config is base
+    assert "Ignoring invalid profiling type configuration" in caplog.text
+
+
+@pytest.mark.parametrize("rand,expected", [(0.09, True), (0.1, False)])
+def test_sampled(rand, expected):
+    with patch(RANDOM, return_value=rand):
+        assert ProfilingConfig(0.1).sampled() is expected
+
+
+def test_profile_not_sampled():
+    with patch(RANDOM, return_value=0.5):
+        assert isinstance(ProfilingConfig(0.1).profile("CREATE"), nullcontext)
+
+
+def test_profile_cpu(caplog, tmp_path):
+    config = ProfilingConfig(1.0, top=3, dump_dir=str(tmp_path))
+    with caplog.at_level(logging.INFO):
+        with config.profile("CREATE"):
+            work()
+    lines = report(caplog).splitlines()
+    assert lines[0].startswith("Profile of CREATE (")
+    assert lines[1] == "cpu, top 3 by cumulative time:"
+    assert len(lines) == 5
+    assert any("profiling_test.py" in line and "(work)" in line for line in lines)
+    (dump,) = os.listdir(tmp_path)
+    assert dump.startswith("CREATE-") and dump.endswith(".pstats")
+
+
+def test_profile_logged_under_default_logging(caplog):
+    logger = logging.getLogger("cloudformation_cli_python_lib.profiling")
+    level = logger.level
+    logger.setLevel(logging.NOTSET)
+    try:
+        # as in the Lambda runtime
+        assert logging.getLogger().level == logging.WARNING
+        with ProfilingConfig(1.0).profile("CREATE"):
+            work()
+        assert report(caplog).startswith("Profile of CREATE (")
+        # a level set for the logger is kept
+        logger.setLevel(logging.ERROR)
+        with ProfilingConfig(1.0).profile("CREATE"):
+            work()
+        assert logger.level == logging.ERROR
+    finally:
+        logger.setLevel(level)
+
+
+def test_profile_dump_failure(caplog, tmp_path):
+    config = ProfilingConfig(1.0, dump_dir=str(tmp_path / "missing"))
+    with caplog.at_level(logging.INFO):
+        with config.profile("CREATE"):
+            work()
+    assert "Could not write" in caplog.text
+
+
+def test_profile_memory(caplog):
+    config = ProfilingConfig(1.0, cpu=False, memory=True, top=2)
+    with caplog.at_level(logging.INFO):
+        with config.profile("DELETE"):
+            data = work()
+    assert data
+    lines = report(caplog).splitlines()
+    assert lines[1].startswith("memory, top 2 allocation sites (peak ")
+    assert len(lines) == 4
+    assert "profiling_test.py" in lines[2]
+    assert not tracemalloc.is_tracing()
+
+
+def test_profile_memory_leaves_existing_tracing_alone(caplog):
+    config = ProfilingConfig(1.0, cpu=False, memory=True)
+    tracemalloc.start()
+    try:
+        with caplog.at_level(logging.INFO):
+            with config.profile("DELETE"):
+                work()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    assert report(caplog).splitlines() == [report(caplog).splitlines()[0]]
+
+
+def test_profile_cpu_with_another_profiler_active(caplog):
+    other = cProfile.Profile()
+    other.enable()
+    try:
+        with caplog.at_level(logging.INFO):
+            with ProfilingConfig(1.0).profile("UPDATE"):
+                work()
+    finally:
+        other.disable()
+    assert "another profiler is active" in caplog.text
+    assert "cpu, top" not in caplog.text
+
+
+def test_profile_cpu_when_enabling_fails(caplog):
+    with patch("cloudformation_cli_python_lib.profiling.cProfile.Profile") as profile:
+        profile.return_value.enable.side_effect = ValueError()
+        with caplog.at_level(logging.INFO):
+            with ProfilingConfig(1.0).profile("UPDATE"):
+                work()
+    assert "another profiler is active" in caplog.text
+    profile.return_value.disable.assert_not_called()
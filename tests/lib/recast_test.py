@@ -1,18 +1,35 @@
 # pylint: disable=protected-access
+from dataclasses import dataclass
+
 import pytest
 from cloudformation_cli_python_lib.exceptions import InvalidRequest
 from cloudformation_cli_python_lib.recast import (
+    _FIELD_TYPES,
     _field_to_type,
     _recast_lists,
     _recast_primitive,
     get_forward_ref_type,
+    prime_model,
     recast_object,
 )
 
 from typing import Awaitable, Generic, Optional, Union
 from unittest.mock import patch
 
-from .sample_model import ResourceModel as ComplexResourceModel, SimpleResourceModel
+from .sample_model import (
+    ADict,
+    DeepDict,
+    DeeperDict,
+    ResourceModel as ComplexResourceModel,
+    SimpleResourceModel,
+)
+
+
+@dataclass
+class UnprimableModel:  # pylint: disable=invalid-name
+    Weird: Optional[Union[str, list]]
+    Missing: Optional["_Missing"]  # noqa: F821
+    Nested: Optional["_SimpleResourceModel"]  # noqa: F821
 
 
 def test_recast_complex_object():
@@ -105,6 +122,37 @@ def test_recast_complex_object():
     assert ComplexResourceModel._deserialize(payload)._serialize() == expected
 
 
+def test_recast_object_resolves_field_types_once():
+    _FIELD_TYPES.clear()
+    payload = {"AnInt": "1", "ABool": "true"}
+    with patch(
+        "cloudformation_cli_python_lib.recast._field_to_type", wraps=_field_to_type
+    ) as mock_field_to_type:
+        recast_object(SimpleResourceModel, dict(payload), {})
+        recast_object(SimpleResourceModel, dict(payload), {})
+    assert mock_field_to_type.call_count == 2
+    assert _FIELD_TYPES[(SimpleResourceModel, "AnInt")] is int
+
+
+def test_prime_model_resolves_nested_models():
+    _FIELD_TYPES.clear()
+    prime_model(ComplexResourceModel)
+    assert _FIELD_TYPES[(ComplexResourceModel, "ADict")] is ADict
+    assert _FIELD_TYPES[(ADict, "DeepDict")] is DeepDict
+    assert _FIELD_TYPES[(DeepDict, "DeeperDict")] is DeeperDict
+    assert _FIELD_TYPES[(DeeperDict, "DeepestBool")] is bool
+
+
+def test_prime_model_skips_unprocessable_fields():
+    _FIELD_TYPES.clear()
+    prime_model(UnprimableModel, {"SimpleResourceModel": SimpleResourceModel})
+    assert set(_FIELD_TYPES) == {
+        (UnprimableModel, "Nested"),
+        (SimpleResourceModel, "AnInt"),
+        (SimpleResourceModel, "ABool"),
+    }
+
+
 def test_recast_object_invalid_json_type():
     with pytest.raises(InvalidRequest) as excinfo:
         recast_object(SimpleResourceModel, [], {})
@@ -2,17 +2,29 @@
 from dataclasses import dataclass
 
 import pytest
+from cloudformation_cli_python_lib.deadline import Deadline
+from cloudformation_cli_python_lib.emf import write_emf_to_stdout
 from cloudformation_cli_python_lib.exceptions import InternalFailure, InvalidRequest
 from cloudformation_cli_python_lib.interface import (
     Action,
     BaseModel,
     HandlerErrorCode,
+    MetricsDestination,
     OperationStatus,
     ProgressEvent,
 )
+from cloudformation_cli_python_lib.log_delivery import ProviderLogHandler
+from cloudformation_cli_python_lib.metrics import (
+    MetricAggregator,
+    MetricsPublisherProxy,
+)
+from cloudformation_cli_python_lib.profiling import ProfilingConfig
 from cloudformation_cli_python_lib.resource import Resource, _ensure_serialize
+from cloudformation_cli_python_lib.timing import NULL_PHASE_TIMER
 from cloudformation_cli_python_lib.utils import Credentials, HandlerRequest
 
+import asyncio
+import logging
 from datetime import datetime
 from unittest.mock import Mock, call, patch, sentinel
 
@@ -72,11 +84,29 @@ def test_entrypoint_handler_error(resource):
     with patch("cloudformation_cli_python_lib.resource.ProviderLogHandler.setup"):
         event = resource.__call__.__wrapped__(  # pylint: disable=no-member
             resource, {}, None
-        )
+        )._serialize()
     assert event["status"] == OperationStatus.FAILED.value
     assert event["errorCode"] == HandlerErrorCode.InvalidRequest
 
 
+@pytest.mark.parametrize("background", [False, True])
+def test_entrypoint_background_logs(background):
+    resource = Resource(TYPE_NAME, Mock(), Mock(), background_logs=background)
+    event = ProgressEvent(status=OperationStatus.SUCCESS, message="")
+    resource.handler(Action.CREATE)(Mock(return_value=event))
+
+    with patch(
+        "cloudformation_cli_python_lib.resource.ProviderLogHandler.setup"
+    ) as mock_log_delivery:
+        resource.__call__.__wrapped__(  # pylint: disable=no-member
+            resource, ENTRYPOINT_PAYLOAD, None
+        )
+    kwargs = mock_log_delivery.call_args.kwargs
+    assert kwargs["background"] is background
+    # delivery failures are reported with the invocation's metrics
+    assert isinstance(kwargs["metrics"], MetricsPublisherProxy)
+
+
 def test_entrypoint_success():
     resource = Resource(TYPE_NAME, Mock(), Mock())
     event = ProgressEvent(status=OperationStatus.SUCCESS, message="")
@@ -89,7 +119,7 @@ def test_entrypoint_success():
     ):
         event = resource.__call__.__wrapped__(  # pylint: disable=no-member
             resource, ENTRYPOINT_PAYLOAD, None
-        )
+        )._serialize()
     mock_log_delivery.assert_called_once()
 
     assert event == {
@@ -123,14 +153,14 @@ def test_entrypoint_handler_raises():
     with patch(
         "cloudformation_cli_python_lib.resource.ProviderLogHandler.setup"
     ), patch(
-        "cloudformation_cli_python_lib.resource.MetricsPublisherProxy"
+        "cloudformation_cli_python_lib.instrumentation.MetricsPublisherProxy"
     ) as mock_metrics, patch(
         "cloudformation_cli_python_lib.resource.Resource._invoke_handler"
     ) as mock__invoke_handler:
         mock__invoke_handler.side_effect = InvalidRequest("handler failed")
         event = resource.__call__.__wrapped__(  # pylint: disable=no-member
             resource, ENTRYPOINT_PAYLOAD, None
-        )
+        )._serialize()
 
     mock_metrics.return_value.publish_exception_metric.assert_called_once()
     assert event == {
@@ -190,7 +220,7 @@ def test_entrypoint_ignore_remove_fields_from_response():
     ):
         event = resource.__call__.__wrapped__(  # pylint: disable=no-member
             resource, ENTRYPOINT_PAYLOAD, None
-        )
+        )._serialize()
     mock_log_delivery.assert_called_once()
 
     assert event == {
@@ -222,7 +252,7 @@ def test_entrypoint_success_without_caller_provider_creds():
         payload["requestData"]["callerCredentials"] = None
         event = resource.__call__.__wrapped__(  # pylint: disable=no-member
             resource, payload, None
-        )
+        )._serialize()
         assert event == expected
 
         # Credentials are undefined in payload
@@ -231,10 +261,235 @@ def test_entrypoint_success_without_caller_provider_creds():
 
         event = resource.__call__.__wrapped__(  # pylint: disable=no-member
             resource, payload, None
-        )
+        )._serialize()
         assert event == expected
 
 
+def test_entrypoint_checkpoints_before_lambda_timeout():
+    @dataclass
+    class ResourceModel(BaseModel):
+        a_string: str
+
+        @classmethod
+        def _deserialize(cls, json_data):
+            return cls("test")
+
+    resource = Resource(TYPE_NAME, ResourceModel, deadline_safety_margin=5.0)
+    context = Mock(spec_set=["get_remaining_time_in_millis"])
+    context.get_remaining_time_in_millis.return_value = 4000
+
+    @resource.handler(Action.CREATE)
+    def handler(_session, request, callback_context):
+        callback_context["resumeFrom"] = "stabilize"
+        request.deadline.check()
+
+    payload = ENTRYPOINT_PAYLOAD.copy()
+    payload["requestData"] = payload["requestData"].copy()
+    payload["requestData"]["providerCredentials"] = None
+    payload["requestData"]["callerCredentials"] = None
+
+    with patch("cloudformation_cli_python_lib.resource.ProviderLogHandler.setup"):
+        event = resource(payload, context)
+    assert event["status"] == OperationStatus.IN_PROGRESS
+    assert event["callbackContext"] == {"resumeFrom": "stabilize"}
+    assert event["resourceModel"] == {"a_string": "test"}
+
+
+@dataclass
+class ReinvokeModel(BaseModel):
+    step: int
+
+    @classmethod
+    def _deserialize(cls, json_data):
+        return cls(**json_data) if json_data else None
+
+
+def lambda_context(remaining_millis):
+    context = Mock(spec_set=["get_remaining_time_in_millis"])
+    context.get_remaining_time_in_millis.return_value = remaining_millis
+    return context
+
+
+def reinvoke(resource, handler, remaining_millis=600000):
+    resource.handler(Action.CREATE)(handler)
+    payload = ENTRYPOINT_PAYLOAD.copy()
+    payload["requestData"] = payload["requestData"].copy()
+    payload["requestData"]["resourceProperties"] = {"step": 0}
+    payload["requestData"]["previousResourceProperties"] = None
+    with patch(
+        "cloudformation_cli_python_lib.resource.ProviderLogHandler.setup"
+    ), patch(
+        "cloudformation_cli_python_lib.instrumentation.MetricsPublisherProxy"
+    ) as mock_metrics, patch(
+        "cloudformation_cli_python_lib.resource.time.sleep"
+    ) as mock_sleep:
+        event = resource(payload, lambda_context(remaining_millis))
+    return event, mock_metrics.return_value, mock_sleep
+
+
+def in_progress(request, callback_context, delay):
+    step = request.desiredResourceState.step + 1
+    return ProgressEvent(
+        status=OperationStatus.IN_PROGRESS,
+        resourceModel=ReinvokeModel(step),
+        callbackContext={"polls": callback_context.get("polls", 0) + 1},
+        callbackDelaySeconds=delay,
+    )
+
+
+def test_entrypoint_reinvokes_in_process():
+    resource = Resource(TYPE_NAME, ReinvokeModel, local_reinvoke_max_delay=5)
+    contexts = []
+
+    def handler(_session, request, callback_context):
+        contexts.append(dict(callback_context))
+        if request.desiredResourceState.step == 2:
+            return ProgressEvent(
+                status=OperationStatus.SUCCESS,
+                resourceModel=request.desiredResourceState,
+            )
+        return in_progress(request, callback_context, 3)
+
+    event, metrics, mock_sleep = reinvoke(resource, handler)
+    assert event["status"] == OperationStatus.SUCCESS
+    assert event["resourceModel"] == {"step": 2}
+    assert contexts == [{}, {"polls": 1}, {"polls": 2}]
+    assert mock_sleep.call_args_list == [call(3), call(3)]
+    assert metrics.publish_invocation_metric.call_count == 3
+    assert metrics.publish_duration_metric.call_count == 3
+
+
+def test_entrypoint_times_phases(caplog):
+    resource = Resource(
+        TYPE_NAME, ReinvokeModel, local_reinvoke_max_delay=5, phase_metrics=True
+    )
+
+    def handler(_session, request, callback_context):
+        with request.timer.phase("describe"):
+            if request.desiredResourceState.step == 1:
+                return ProgressEvent(status=OperationStatus.SUCCESS)
+        return in_progress(request, callback_context, 1)
+
+    with caplog.at_level(logging.INFO, "cloudformation_cli_python_lib.timing"):
+        event, metrics, _mock_sleep = reinvoke(resource, handler)
+    assert event["status"] == OperationStatus.SUCCESS
+    (phases,) = metrics.publish_phase_metrics.call_args.args[2:]
+    assert list(phases) == [
+        "parse_request",
+        "cast_request",
+        "log_setup",
+        "metrics",
+        "describe",
+        "handler",
+        "reinvoke_wait",
+        "serialize",
+    ]
+    (line,) = [r.getMessage() for r in caplog.records if r.name.endswith("timing")]
+    assert '"typeName": "Test::Foo::Bar", "action": "CREATE"' in line
+    assert '"loaderCache": {"hits": ' in line
+
+
+def test_entrypoint_flushes_metrics_once():
+    resource = Resource(
+        TYPE_NAME, ReinvokeModel, local_reinvoke_max_delay=5, phase_metrics=True
+    )
+
+    def handler(_session, request, callback_context):
+        if request.desiredResourceState.step == 1:
+            return ProgressEvent(status=OperationStatus.SUCCESS)
+        return in_progress(request, callback_context, 1)
+
+    event, metrics, _mock_sleep = reinvoke(resource, handler)
+    assert event["status"] == OperationStatus.SUCCESS
+    # after everything else, phase metrics included
+    calls = [name for name, _args, _kwargs in metrics.mock_calls if name != "__bool__"]
+    assert calls[-2:] == ["publish_phase_metrics", "flush"]
+    (deadline,) = metrics.flush.call_args.args
+    assert isinstance(deadline, Deadline)
+
+
+def test_entrypoint_flushes_provider_logs():
+    resource = Resource(TYPE_NAME, ReinvokeModel)
+
+    def handler(_session, _request, _callback_context):
+        return ProgressEvent(status=OperationStatus.SUCCESS)
+
+    with patch.object(ProviderLogHandler, "flush_existing") as mock_flush:
+        event, _metrics, _mock_sleep = reinvoke(resource, handler)
+    assert event["status"] == OperationStatus.SUCCESS
+    (deadline,) = mock_flush.call_args.args
+    # keeping time to respond
+    assert 598 < deadline.remaining() < 599
+
+
+def test_entrypoint_without_phase_timing(caplog):
+    resource = Resource(TYPE_NAME, ReinvokeModel, phase_timing=False)
+    timers = []
+
+    def handler(_session, request, _callback_context):
+        timers.append(request.timer)
+        return ProgressEvent(status=OperationStatus.SUCCESS)
+
+    with caplog.at_level(logging.INFO, "cloudformation_cli_python_lib.timing"):
+        event, _metrics, _mock_sleep = reinvoke(resource, handler)
+    assert event["status"] == OperationStatus.SUCCESS
+    assert timers == [NULL_PHASE_TIMER]
+    assert not [r for r in caplog.records if r.name.endswith("timing")]
+
+
+def test_entrypoint_profiles_handler(caplog):
+    resource = Resource(TYPE_NAME, ReinvokeModel, profiling=ProfilingConfig(1.0))
+
+    def handler(_session, _request, _callback_context):
+        return ProgressEvent(status=OperationStatus.SUCCESS)
+
+    with caplog.at_level(logging.INFO, "cloudformation_cli_python_lib.profiling"):
+        event, _metrics, _mock_sleep = reinvoke(resource, handler)
+    assert event["status"] == OperationStatus.SUCCESS
+    (report,) = [r.getMessage() for r in caplog.records if r.name.endswith("profiling")]
+    assert report.startswith("Profile of CREATE")
+    assert "resource_test.py" in report
+
+
+@pytest.mark.parametrize(
+    "max_delay,delay,remaining_millis",
+    [
+        (None, 0, 600000),  # not enabled
+        (5, 6, 600000),  # longer than the cap
+        (60, 45, 50000),  # longer than the time left
+    ],
+)
+def test_entrypoint_hands_back_to_cloudformation(max_delay, delay, remaining_millis):
+    resource = Resource(TYPE_NAME, ReinvokeModel, local_reinvoke_max_delay=max_delay)
+
+    def handler(_session, request, callback_context):
+        return in_progress(request, callback_context, delay)
+
+    event, metrics, mock_sleep = reinvoke(resource, handler, remaining_millis)
+    assert event["status"] == OperationStatus.IN_PROGRESS
+    assert event["callbackContext"] == {"polls": 1}
+    assert event["callbackDelaySeconds"] == delay
+    mock_sleep.assert_not_called()
+    metrics.publish_duration_metric.assert_called_once()
+
+
+def test_entrypoint_reinvoke_stops_on_failure():
+    resource = Resource(TYPE_NAME, ReinvokeModel, local_reinvoke_max_delay=5)
+
+    def handler(_session, request, callback_context):
+        if callback_context:
+            assert request.desiredResourceState.step == 0
+            raise InvalidRequest("bad")
+        return ProgressEvent(
+            status=OperationStatus.IN_PROGRESS, callbackContext={"polls": 1}
+        )
+
+    event, metrics, _mock_sleep = reinvoke(resource, handler)
+    assert event["status"] == OperationStatus.FAILED
+    assert event["errorCode"] == HandlerErrorCode.InvalidRequest
+    metrics.publish_exception_metric.assert_called_once()
+
+
 def test_cast_resource_request_invalid_request(resource):
     request = HandlerRequest.deserialize(ENTRYPOINT_PAYLOAD)
     request.requestData = None
@@ -263,7 +518,10 @@ def test__parse_request_valid_request_and__cast_resource_request():
 
     mock_session.assert_has_calls(
         [
-            call(Credentials(**ENTRYPOINT_PAYLOAD["requestData"]["callerCredentials"])),
+            call(
+                Credentials(**ENTRYPOINT_PAYLOAD["requestData"]["callerCredentials"]),
+                max_pool_connections=None,
+            ),
             call(
                 Credentials(**ENTRYPOINT_PAYLOAD["requestData"]["providerCredentials"])
             ),
@@ -299,7 +557,9 @@ def test__parse_request_valid_request_and__cast_resource_request():
 @pytest.mark.parametrize("exc_cls", [Exception, BaseException])
 def test_entrypoint_uncaught_exception(resource, exc_cls):
     with patch("cloudformation_cli_python_lib.resource.ProviderLogHandler.setup"):
-        event = patch_and_raise(resource, "_parse_request", exc_cls, resource.__call__)
+        event = patch_and_raise(
+            resource, "_parse_request", exc_cls, resource.__call__
+        )._serialize()
     assert event["status"] == OperationStatus.FAILED
     assert event["errorCode"] == HandlerErrorCode.InternalFailure
 
@@ -348,26 +608,60 @@ def test__invoke_handler_not_found(resource):
 
 
 def test__invoke_handler_was_found(resource):
+    request = Mock(deadline=None)
     progress_event = ProgressEvent(status=OperationStatus.IN_PROGRESS)
     mock_handler = resource.handler(Action.CREATE)(Mock(return_value=progress_event))
 
     resp = resource._invoke_handler(
-        sentinel.session, sentinel.request, Action.CREATE, sentinel.context
+        sentinel.session, request, Action.CREATE, sentinel.context
+    )
+    assert resp is progress_event
+    mock_handler.assert_called_once_with(sentinel.session, request, sentinel.context)
+
+
+def test__invoke_handler_async_handler(resource):
+    request = Mock(deadline=None)
+    progress_event = ProgressEvent(status=OperationStatus.SUCCESS)
+
+    @resource.handler(Action.CREATE)
+    async def handler(session, request, _callback_context):
+        results = await asyncio.gather(
+            asyncio.sleep(0, result=session), asyncio.sleep(0, result=request)
+        )
+        assert results == [sentinel.session, request]
+        return progress_event
+
+    resp = resource._invoke_handler(
+        sentinel.session, request, Action.CREATE, sentinel.context
     )
     assert resp is progress_event
-    mock_handler.assert_called_once_with(
-        sentinel.session, sentinel.request, sentinel.context
+
+
+def test__invoke_handler_checkpoints_at_deadline(resource):
+    request = Mock(deadline=Deadline(0), desiredResourceState=sentinel.model)
+
+    @resource.handler(Action.CREATE)
+    def handler(_session, request, callback_context):
+        callback_context["step"] = 2
+        request.deadline.check()
+
+    resp = resource._invoke_handler(
+        sentinel.session, request, Action.CREATE, {"step": 1}
+    )
+    assert resp == ProgressEvent(
+        status=OperationStatus.IN_PROGRESS,
+        resourceModel=sentinel.model,
+        callbackContext={"step": 2},
     )
 
 
 @pytest.mark.parametrize("action", [Action.LIST, Action.READ])
 def test__invoke_handler_non_mutating_must_be_synchronous(resource, action):
+    request = Mock(deadline=None)
     progress_event = ProgressEvent(status=OperationStatus.IN_PROGRESS)
     resource.handler(action)(Mock(return_value=progress_event))
     with pytest.raises(Exception) as excinfo:
-        resource._invoke_handler(
-            sentinel.session, sentinel.request, action, sentinel.context
-        )
+        resource._invoke_handler(sentinel.session, request, action, sentinel.context)
     assert excinfo.value.args[0] == "READ and LIST handlers must return synchronously."
 
 
@@ -474,3 +768,215 @@ def test_test_entrypoint_success():
     mock_model._deserialize.assert_has_calls([call(None), call(None)])
     mock_type_configuration_model._deserialize.assert_has_calls([call(None)])
     mock_handler.assert_called_once()
+
+
+def test_test_entrypoint_async_handler():
+    mock_model = Mock(spec_set=["_deserialize"])
+    mock_model._deserialize.side_effect = [None, None]
+    resource = Resource(TYPE_NAME, mock_model)
+
+    @resource.handler(Action.CREATE)
+    async def handler(_session, _request, callback_context):
+        await asyncio.sleep(0)
+        return ProgressEvent(
+            status=OperationStatus.IN_PROGRESS, callbackContext=callback_context
+        )
+
+    payload = {
+        "credentials": {"accessKeyId": "", "secretAccessKey": "", "sessionToken": ""},
+        "action": "CREATE",
+        "request": {
+            "clientRequestToken": "ecba020e-b2e6-4742-a7d0-8a06ae7c4b2b",
+            "desiredResourceState": None,
+            "previousResourceState": None,
+            "logicalResourceIdentifier": None,
+        },
+        "callbackContext": {"a": "b"},
+    }
+
+    event = resource.test_entrypoint(payload, None)
+    assert event["status"] == OperationStatus.IN_PROGRESS.value
+    assert event["callbackContext"] == {"a": "b"}
+
+
+def test_test_entrypoint_sets_deadline():
+    mock_model = Mock(spec_set=["_deserialize"])
+    mock_model._deserialize.side_effect = [None, None]
+    resource = Resource(TYPE_NAME, mock_model, deadline_safety_margin=1.0)
+    context = Mock(spec_set=["get_remaining_time_in_millis"])
+    context.get_remaining_time_in_millis.return_value = 60000
+    deadlines = []
+
+    @resource.handler(Action.CREATE)
+    def handler(_session, request, _callback_context):
+        deadlines.append(request.deadline)
+        return ProgressEvent(status=OperationStatus.SUCCESS)
+
+    payload = {
+        "credentials": {"accessKeyId": "", "secretAccessKey": "", "sessionToken": ""},
+        "action": "CREATE",
+        "request": {
+            "clientRequestToken": "ecba020e-b2e6-4742-a7d0-8a06ae7c4b2b",
+            "desiredResourceState": None,
+            "previousResourceState": None,
+            "logicalResourceIdentifier": None,
+        },
+    }
+
+    resource.test_entrypoint(payload, context)
+    assert 58.0 < deadlines[0].remaining() <= 59.0
+
+
+def test_test_entrypoint_handler_records_metrics():
+    mock_model = Mock(spec_set=["_deserialize"])
+    mock_model._deserialize.side_effect = [None, None]
+    resource = Resource(TYPE_NAME, mock_model)
+
+    @resource.handler(Action.CREATE)
+    def handler(_session, request, _callback_context):
+        request.metrics.count("WidgetsCreated")
+        request.metrics.timing("WidgetWait", 12.5)
+        return ProgressEvent(status=OperationStatus.SUCCESS)
+
+    payload = {
+        "credentials": {"accessKeyId": "", "secretAccessKey": "", "sessionToken": ""},
+        "action": "CREATE",
+        "request": {
+            "clientRequestToken": "ecba020e-b2e6-4742-a7d0-8a06ae7c4b2b",
+            "desiredResourceState": None,
+            "previousResourceState": None,
+            "logicalResourceIdentifier": None,
+        },
+    }
+
+    with patch("cloudformation_cli_python_lib.metrics.MetricsPublisher") as publisher:
+        event = resource.test_entrypoint(payload, None)
+    assert event["status"] == OperationStatus.SUCCESS.value
+    publisher.assert_not_called()
+
+
+@pytest.mark.parametrize("phase_timing", [True, False])
+def test_test_entrypoint_times_phases(caplog, phase_timing):
+    mock_model = Mock(spec_set=["_deserialize"])
+    mock_model._deserialize.side_effect = [None, None]
+    resource = Resource(TYPE_NAME, mock_model, phase_timing=phase_timing)
+    timers = []
+
+    @resource.handler(Action.CREATE)
+    def handler(_session, request, _callback_context):
+        timers.append(request.timer)
+        with request.timer.phase("describe"):
+            return ProgressEvent(status=OperationStatus.SUCCESS)
+
+    payload = {
+        "credentials": {"accessKeyId": "", "secretAccessKey": "", "sessionToken": ""},
+        "action": "CREATE",
+        "request": {
+            "clientRequestToken": "ecba020e-b2e6-4742-a7d0-8a06ae7c4b2b",
+            "desiredResourceState": None,
+            "previousResourceState": None,
+            "logicalResourceIdentifier": None,
+        },
+    }
+
+    with caplog.at_level(logging.INFO, "cloudformation_cli_python_lib.timing"):
+        event = resource.test_entrypoint(payload, None)
+    assert event["status"] == OperationStatus.SUCCESS.value
+    lines = [r.getMessage() for r in caplog.records if r.name.endswith("timing")]
+    if not phase_timing:
+        assert timers == [NULL_PHASE_TIMER]
+        assert not lines
+        return
+    assert list(timers[0].phases) == [
+        "parse_request",
+        "describe",
+        "handler",
+        "serialize",
+    ]
+    (line,) = lines
+    assert '"typeName": "Test::Foo::Bar", "action": "CREATE"' in line
+
+
+def test_map_concurrently():
+    resource = Resource(TYPE_NAME, None, max_workers=3)
+    assert resource._executor.max_workers == 3
+    assert resource.map_concurrently(str, [1, 2, 3], max_workers=2) == ["1", "2", "3"]
+
+
+def test_parse_test_request_sizes_connection_pool():
+    resource = Resource(TYPE_NAME, Mock(), max_workers=25)
+    payload = {
+        "credentials": {"accessKeyId": "", "secretAccessKey": "", "sessionToken": ""},
+        "action": "CREATE",
+        "request": {"clientRequestToken": "ecba020e-b2e6-4742-a7d0-8a06ae7c4b2b"},
+    }
+    with patch(
+        "cloudformation_cli_python_lib.resource._get_boto_session"
+    ) as mock_session:
+        resource._parse_test_request(payload)
+    assert mock_session.call_args.args[2] == 25
+
+
+def test_prime():
+    resource = Resource(
+        TYPE_NAME, sentinel.model, max_workers=4, services=["s3"], regions=["eu-west-1"]
+    )
+    with patch("cloudformation_cli_python_lib.resource.prime") as mock_prime:
+        resource.prime()
+    kwargs = mock_prime.call_args.kwargs
+    assert kwargs["models"] == (sentinel.model, None)
+    assert kwargs["services"] == ["s3"]
+    assert kwargs["regions"] == ["eu-west-1"]
+    assert kwargs["max_pool_connections"] == 4
+    assert kwargs["response"].status == OperationStatus.SUCCESS
+
+
+def test_after_restore():
+    with patch("cloudformation_cli_python_lib.resource.after_restore") as mock_restore:
+        Resource.after_restore()
+    mock_restore.assert_called_once_with()
+
+
+@pytest.mark.parametrize(
+    "destination,sink",
+    [
+        (MetricsDestination.PUT_METRIC_DATA, None),
+        (MetricsDestination.EMF_STDOUT, write_emf_to_stdout),
+        (MetricsDestination.EMF_PROVIDER_LOG, ProviderLogHandler.write_emf),
+    ],
+)
+def test_metrics_destination(destination, sink):
+    resource = Resource(TYPE_NAME, None, metrics_destination=destination)
+    assert resource._emf_sink() == sink
+
+
+@pytest.mark.parametrize(
+    "destination,background",
+    [
+        (MetricsDestination.PUT_METRIC_DATA, True),
+        (MetricsDestination.EMF_PROVIDER_LOG, False),
+    ],
+)
+def test_background_metrics(destination, background):
+    resource = Resource(
+        TYPE_NAME, None, metrics_destination=destination, background_metrics=True
+    )
+    proxy = resource._metrics_proxy()
+    assert (proxy._flusher is resource._metrics_flusher) is background
+    assert proxy._options["buffered"] is not background
+
+
+@pytest.mark.parametrize(
+    "destination,aggregated",
+    [
+        (MetricsDestination.PUT_METRIC_DATA, True),
+        (MetricsDestination.EMF_PROVIDER_LOG, False),
+    ],
+)
+def test_metrics_aggregator(destination, aggregated):
+    aggregator = MetricAggregator()
+    resource = Resource(
+        TYPE_NAME, None, metrics_destination=destination, metrics_aggregator=aggregator
+    )
+    proxy = resource._metrics_proxy()
+    assert (proxy._aggregator is aggregator) is aggregated
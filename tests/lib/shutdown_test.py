@@ -0,0 +1,60 @@
+import pytest
+from cloudformation_cli_python_lib.shutdown import on_shutdown
+
+import signal
+import threading
+from unittest.mock import Mock, patch, sentinel
+
+SHUTDOWN = "cloudformation_cli_python_lib.shutdown"
+
+
+def install(previous):
+    callback = Mock()
+    with patch(f"{SHUTDOWN}.atexit.register") as register, patch(
+        f"{SHUTDOWN}.signal.getsignal", return_value=previous
+    ), patch(f"{SHUTDOWN}.signal.signal") as mock_signal:
+        on_shutdown(callback)
+    register.assert_called_once_with(callback)
+    ((signum, handler),) = [c.args for c in mock_signal.call_args_list]
+    assert signum == signal.SIGTERM
+    return callback, handler
+
+
+def test_sigterm_calls_back_then_previous_handler():
+    previous = Mock()
+    callback, handler = install(previous)
+    handler(signal.SIGTERM, sentinel.frame)
+    callback.assert_called_once_with()
+    previous.assert_called_once_with(signal.SIGTERM, sentinel.frame)
+
+
+@pytest.mark.parametrize("previous", [signal.SIG_DFL, None])
+def test_sigterm_still_terminates(previous):
+    callback, handler = install(previous)
+    with patch(f"{SHUTDOWN}.signal.signal") as mock_signal, patch(
+        f"{SHUTDOWN}.os.kill"
+    ) as mock_kill:
+        handler(signal.SIGTERM, None)
+    callback.assert_called_once_with()
+    mock_signal.assert_called_once_with(signal.SIGTERM, signal.SIG_DFL)
+    mock_kill.assert_called_once()
+
+
+def test_sigterm_ignored_before():
+    callback, handler = install(signal.SIG_IGN)
+    with patch(f"{SHUTDOWN}.os.kill") as mock_kill:
+        handler(signal.SIGTERM, None)
+    callback.assert_called_once_with()
+    mock_kill.assert_not_called()
+
+
+def test_outside_main_thread_only_at_exit():
+    callback = Mock()
+    with patch(f"{SHUTDOWN}.atexit.register") as register, patch(
+        f"{SHUTDOWN}.signal.signal"
+    ) as mock_signal:
+        thread = threading.Thread(target=on_shutdown, args=(callback,))
+        thread.start()
+        thread.join()
+    register.assert_called_once_with(callback)
+    mock_signal.assert_not_called()
@@ -0,0 +1,127 @@
+# pylint: disable=redefined-outer-name
+import pytest
+from cloudformation_cli_python_lib.deadline import Deadline, DeadlineExceeded
+from cloudformation_cli_python_lib.exceptions import NotStabilized
+from cloudformation_cli_python_lib.stabilization import BackoffPolicy, stabilize
+
+from unittest.mock import Mock, call, patch
+
+SLEEP = "cloudformation_cli_python_lib.stabilization.time.sleep"
+NO_JITTER = BackoffPolicy(initial_delay=1.0, max_delay=5.0, jitter=0.0)
+
+
+@pytest.fixture
+def request_():
+    return Mock(deadline=None, spec_set=["deadline", "metrics"])
+
+
+def probe_returning(*states):
+    return Mock(side_effect=list(states))
+
+
+def is_active(state):
+    return state == "ACTIVE"
+
+
+def is_failed(state):
+    return state == "FAILED"
+
+
+@pytest.mark.parametrize(
+    "attempt,expected", [(1, 1.0), (2, 2.0), (3, 4.0), (4, 5.0), (1000, 5.0)]
+)
+def test_backoff_delay_is_capped(attempt, expected):
+    assert NO_JITTER.delay(attempt) == expected
+
+
+def test_backoff_jitter():
+    policy = BackoffPolicy(initial_delay=10.0, jitter=0.5)
+    with patch("cloudformation_cli_python_lib.stabilization.random.random") as rand:
+        rand.return_value = 0.0
+        assert policy.delay(1) == 10.0
+        rand.return_value = 1.0
+        assert policy.delay(1) == 5.0
+
+
+def test_stabilize_polls_in_process(request_):
+    probe = probe_returning("CREATING", "CREATING", "ACTIVE")
+    context = {"other": "value"}
+    with patch(SLEEP) as mock_sleep:
+        result = stabilize(
+            probe,
+            is_active,
+            request=request_,
+            callback_context=context,
+            policy=NO_JITTER,
+        )
+    assert result == "ACTIVE"
+    assert mock_sleep.call_args_list == [call(1.0), call(2.0)]
+    assert context == {"other": "value"}
+    polls, milliseconds = request_.metrics.publish_stabilization_metrics.call_args.args
+    assert polls == 3
+    assert milliseconds >= 0.0
+
+
+def test_stabilize_checkpoints_and_resumes(request_):
+    request_.deadline = Deadline(1500)
+    context = {}
+    with patch(SLEEP) as mock_sleep, pytest.raises(DeadlineExceeded) as excinfo:
+        stabilize(
+            probe_returning("CREATING", "CREATING"),
+            is_active,
+            request=request_,
+            callback_context=context,
+            policy=NO_JITTER,
+        )
+    # slept 1s in-process, but the 2s delay no longer fits the budget
+    mock_sleep.assert_called_once_with(1.0)
+    assert excinfo.value.callback_context is context
+    assert excinfo.value.callback_delay_seconds == 2
+    assert context["stabilization"]["attempts"] == 2
+    request_.metrics.publish_stabilization_metrics.assert_not_called()
+
+    request_.deadline = Deadline(60000)
+    with patch(SLEEP):
+        stabilize(
+            probe_returning("CREATING", "ACTIVE"),
+            is_active,
+            request=request_,
+            callback_context=context,
+            policy=NO_JITTER,
+        )
+    assert not context
+    polls, _milliseconds = request_.metrics.publish_stabilization_metrics.call_args.args
+    assert polls == 4
+
+
+def test_stabilize_failure_predicate(request_):
+    context = {}
+    with patch(SLEEP), pytest.raises(NotStabilized) as excinfo:
+        stabilize(
+            probe_returning("CREATING", "FAILED"),
+            is_active,
+            is_failed=is_failed,
+            request=request_,
+            callback_context=context,
+            key="cluster",
+        )
+    assert str(excinfo.value) == "Stabilization failed after 2 polls"
+    assert not context
+    request_.metrics.publish_stabilization_metrics.assert_called_once()
+
+
+def test_stabilize_runs_out_of_attempts(request_):
+    request_.metrics = None
+    context = {"cluster": {"attempts": 2, "startedAt": 0.0}}
+    with patch(SLEEP), pytest.raises(NotStabilized) as excinfo:
+        stabilize(
+            probe_returning("CREATING"),
+            is_active,
+            is_failed=is_failed,
+            request=request_,
+            callback_context=context,
+            policy=BackoffPolicy(max_attempts=3),
+            key="cluster",
+        )
+    assert str(excinfo.value) == "Not stabilized after 3 polls"
+    assert not context
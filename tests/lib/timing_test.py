@@ -0,0 +1,109 @@
+from cloudformation_cli_python_lib.timing import (
+    NULL_PHASE_TIMER,
+    PhaseTimer,
+    current_phase_timer,
+    start_phase_timer,
+    take_phase_timer,
+)
+
+import json
+import logging
+from unittest.mock import Mock, patch
+
+PERF_COUNTER = "cloudformation_cli_python_lib.timing.time.perf_counter"
+
+
+def test_phases_add_up():
+    with patch(
+        PERF_COUNTER, side_effect=[10.0, 10.0, 10.5, 10.5, 10.75, 11.0, 11.25, 12.0]
+    ):
+        timer = PhaseTimer()
+        with timer.phase("parse_request"):
+            pass
+        with timer.phase("handler"):
+            pass
+        with timer.phase("parse_request"):
+            pass
+        assert timer.elapsed() == 2000.0
+    assert timer.phases == {"parse_request": 750.0, "handler": 250.0}
+
+
+def test_phase_records_on_error():
+    timer = PhaseTimer()
+    try:
+        with timer.phase("handler"):
+            raise ValueError()
+    except ValueError:
+        pass
+    assert list(timer.phases) == ["handler"]
+
+
+def test_finish_logs_one_line(caplog):
+    timer = PhaseTimer()
+    timer.record("handler", 12.5)
+    timer.annotate(action="CREATE")
+    with caplog.at_level(logging.INFO, "cloudformation_cli_python_lib.timing"):
+        timer.finish()
+    (record,) = caplog.records
+    line = json.loads(record.getMessage().split(" ", 2)[2])
+    assert line["action"] == "CREATE"
+    assert line["phasesMs"] == {"handler": 12.5}
+    assert line["totalMs"] >= 0.0
+
+
+def test_finish_publishes_phases():
+    metrics = Mock()
+    timer = PhaseTimer()
+    timer.record("handler", 12.5)
+    timer.publish_to(metrics)
+    timer.finish()
+    metrics.publish_phase_metrics.assert_called_once_with({"handler": 12.5})
+
+
+def test_null_timer_records_nothing(caplog):
+    metrics = Mock()
+    timer = NULL_PHASE_TIMER
+    with patch(PERF_COUNTER) as mock_clock:
+        with timer.phase("handler"):
+            pass
+        timer.record("handler", 1.0)
+        timer.annotate(action="CREATE")
+        timer.publish_to(metrics)
+        timer.finish()
+        assert not timer.phases
+        assert timer.elapsed() == 0.0
+    mock_clock.assert_not_called()
+    metrics.publish_phase_metrics.assert_not_called()
+    assert not caplog.records
+
+
+def test_start_and_take_timer():
+    assert take_phase_timer() is NULL_PHASE_TIMER
+    assert start_phase_timer(False) is NULL_PHASE_TIMER
+    timer = start_phase_timer(True)
+    assert isinstance(timer, PhaseTimer)
+    assert current_phase_timer() is timer
+    assert take_phase_timer() is timer
+    assert current_phase_timer() is NULL_PHASE_TIMER
+
+
+def test_timing_line_logged_under_default_logging(caplog):
+    logger = logging.getLogger("cloudformation_cli_python_lib.timing")
+    level = logger.level
+    logger.setLevel(logging.NOTSET)
+    try:
+        # as in the Lambda runtime
+        assert logging.getLogger().level == logging.WARNING
+        take_phase_timer()
+        start_phase_timer(False)
+        assert logger.level == logging.NOTSET
+        start_phase_timer(True)
+        take_phase_timer().finish()
+        assert "Invocation timing" in caplog.text
+        # a level set for the logger is kept
+        logger.setLevel(logging.ERROR)
+        start_phase_timer(True)
+        take_phase_timer()
+        assert logger.level == logging.ERROR
+    finally:
+        logger.setLevel(level)
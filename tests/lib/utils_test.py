@@ -1,17 +1,34 @@
 # pylint: disable=protected-access,line-too-long
+from dataclasses import dataclass
+
 import pytest
 from cloudformation_cli_python_lib.exceptions import InvalidRequest
-from cloudformation_cli_python_lib.interface import BaseModel
+from cloudformation_cli_python_lib.interface import (
+    Action,
+    BaseModel,
+    HandlerErrorCode,
+    HookProgressEvent,
+    HookStatus,
+    OperationStatus,
+    ProgressEvent,
+)
 from cloudformation_cli_python_lib.utils import (
     HandlerRequest,
     HookInvocationRequest,
     KitchenSinkEncoder,
     UnmodelledRequest,
+    _ContainerEventLoop,
     deserialize_list,
+    kitchen_sink_serialize,
+    resolve_awaitable,
 )
 
+import asyncio
 import hypothesis.strategies as s  # pylint: disable=C0411
 import json
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, time
+from enum import IntEnum
 from hypothesis import given  # pylint: disable=C0411
 from unittest.mock import Mock, call, sentinel
 
@@ -53,6 +70,169 @@ def test_default_unsupported_type_goes_to_base_class():
         json.dumps(Unserializable(), cls=KitchenSinkEncoder)
 
 
+@dataclass
+class NestedModel(BaseModel):
+    when: datetime
+    values: list
+
+    @classmethod
+    def _deserialize(cls, json_data):  # pragma: no cover
+        return None
+
+
+@dataclass
+class ParentModel(BaseModel):
+    name: str
+    child: NestedModel
+    children: list
+    action: Action
+
+    @classmethod
+    def _deserialize(cls, json_data):  # pragma: no cover
+        return None
+
+
+def assert_same_tree(actual, expected):
+    # plain equality would allow e.g. enum members where json produces str
+    assert type(actual) is type(expected)
+    if isinstance(expected, dict):
+        assert list(actual) == list(expected)
+        for key, value in expected.items():
+            assert_same_tree(actual[key], value)
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected)
+        for actual_item, expected_item in zip(actual, expected):
+            assert_same_tree(actual_item, expected_item)
+    else:
+        assert actual == expected
+
+
+def assert_parity(value):
+    assert_same_tree(kitchen_sink_serialize(value), roundtrip(value))
+
+
+json_leaves = (
+    s.none()
+    | s.booleans()
+    | s.integers()
+    | s.floats(allow_nan=False)
+    | s.text()
+    | s.dates()
+    | s.datetimes()
+    | s.times()
+    | s.sampled_from(Action)
+    | s.sampled_from(HandlerErrorCode)
+)
+json_keys = (
+    s.text()
+    | s.integers()
+    | s.floats(allow_nan=False)
+    | s.booleans()
+    | s.none()
+    | s.sampled_from(OperationStatus)
+)
+json_trees = s.recursive(
+    json_leaves,
+    lambda children: s.lists(children, max_size=5)
+    | s.tuples(children, children)
+    | s.dictionaries(json_keys, children, max_size=5),
+    max_leaves=20,
+)
+
+
+@given(json_trees)
+def test_kitchen_sink_serialize_matches_encoder(value):
+    assert_parity(value)
+
+
+@given(s.dictionaries(s.text(), json_trees), s.text(), s.integers(0, 60))
+def test_kitchen_sink_serialize_progress_event_matches_encoder(context, msg, delay):
+    model = ParentModel(
+        name=msg,
+        child=NestedModel(when=datetime(2020, 1, 1), values=[1, None, "a"]),
+        children=[NestedModel(when=datetime(2021, 2, 2), values=[])],
+        action=Action.CREATE,
+    )
+    event = ProgressEvent(
+        status=OperationStatus.IN_PROGRESS,
+        message=msg,
+        callbackContext=context,
+        callbackDelaySeconds=delay,
+        resourceModel=model,
+        resourceModels=[model, model],
+    )
+    assert_parity(event)
+    assert_parity(event._serialize())
+    assert_parity(ProgressEvent.failed(HandlerErrorCode.NotFound, msg))
+
+
+@given(s.dictionaries(s.text(), json_trees), s.text())
+def test_kitchen_sink_serialize_hook_progress_event_matches_encoder(context, msg):
+    event = HookProgressEvent(
+        hookStatus=HookStatus.IN_PROGRESS,
+        message=msg,
+        callbackContext=context,
+        clientRequestToken=msg,
+    )
+    assert_parity(event)
+    assert_parity(HookProgressEvent.failed(HandlerErrorCode.NonCompliant, msg))
+
+
+def test_kitchen_sink_serialize_respects_custom_model_serialize():
+    @dataclass
+    class CustomModel(BaseModel):
+        secret: str
+
+        def _serialize(self):
+            return {"redacted": True, "when": date(2020, 1, 1)}
+
+        @classmethod
+        def _deserialize(cls, json_data):  # pragma: no cover
+            return None
+
+    model = CustomModel(secret="hunter2")
+    event = ProgressEvent(
+        status=OperationStatus.SUCCESS, resourceModel=model, resourceModels=[model]
+    )
+    assert_parity(event)
+    assert kitchen_sink_serialize(model) == {"redacted": True, "when": "2020-01-01"}
+
+
+def test_kitchen_sink_serialize_invalid_resource_models_match_encoder():
+    event = ProgressEvent(status=OperationStatus.SUCCESS, resourceModels=[{"a": 1}])
+    # both refuse the event, which the entrypoints turn into an InternalFailure
+    with pytest.raises(TypeError):
+        json.dumps(event, cls=KitchenSinkEncoder)
+    with pytest.raises(AttributeError):
+        kitchen_sink_serialize(event)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        float("inf"),
+        {float("-inf"): 1.0},
+        {1: "a", "1": "b"},
+        [date(2020, 1, 1), time(12, 30), ("a", ("b",))],
+        OrderedDict(b=1, a=HookStatus.SUCCESS),
+        namedtuple("Pair", "left right")(1, True),
+        [IntEnum("Level", "LOW HIGH").HIGH, type("Ratio", (float,), {})(0.5)],
+    ],
+)
+def test_kitchen_sink_serialize_edge_cases_match_encoder(value):
+    assert_parity(value)
+
+
+@pytest.mark.parametrize(
+    "value", [{"foo": {1, 2}}, {(1, 2): "tuple-key"}, [object()], {"a": b"bytes"}]
+)
+def test_kitchen_sink_serialize_rejects_what_encoder_rejects(value):
+    with pytest.raises(TypeError):
+        json.dumps(value, cls=KitchenSinkEncoder)
+    with pytest.raises(TypeError):
+        kitchen_sink_serialize(value)
+
+
 def test_handler_request_serde_roundtrip():
     payload = {
         "awsAccountId": "123456789012",
@@ -196,3 +376,27 @@ def test_deserialize_list_empty():
 def test_deserialize_list_invalid():
     with pytest.raises(InvalidRequest):
         deserialize_list([(1, 2)], BaseModel)
+
+
+def test_resolve_awaitable_passes_values_through():
+    assert resolve_awaitable(sentinel.value) is sentinel.value
+
+
+def test_resolve_awaitable_runs_coroutines():
+    async def coro():
+        await asyncio.sleep(0)
+        return sentinel.value
+
+    assert resolve_awaitable(coro()) is sentinel.value
+
+
+def test_container_event_loop_is_reused():
+    loop = _ContainerEventLoop()
+
+    async def running_loop():
+        return asyncio.get_running_loop()
+
+    first = loop.run(running_loop())
+    assert loop.run(running_loop()) is first
+    first.close()
+    assert loop.run(running_loop()) is not first